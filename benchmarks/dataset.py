@@ -0,0 +1,174 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from books.fixtures import iter_json_array
+from books.models import Book
+from borrowings.models import Borrowing
+from payments.models import Payment
+
+
+BENCHMARK_DOMAIN = "@bench.local"
+BENCHMARK_EMAIL = "bench{}" + BENCHMARK_DOMAIN
+BENCHMARK_PASSWORD = "benchpass"
+RETURNED_SHARE = 0.7
+PAID_SHARE = 0.8
+
+
+def check_benchmark_database() -> None:
+    if not settings.BENCHMARK_DATABASE:
+        raise ValueError(
+            "Benchmarks write to the database, set BENCHMARK_DATABASE=True "
+            "only on a database dedicated to them"
+        )
+
+
+def insert_in_batches(model, objects: Iterable, batch_size: int) -> int:
+    """Insert lazily built objects, one transaction per batch.
+
+    Rows conflicting with existing ones are skipped, so the number inserted
+    is counted in the table rather than taken from the batches.
+    """
+    objects = iter(objects)
+    before = model.objects.count()
+
+    while batch := list(islice(objects, batch_size)):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    return model.objects.count() - before
+
+
+def load_fixture_books(path: str | Path) -> list[dict]:
+    with open(path, encoding="utf-8") as fixture:
+        return [
+            item["fields"]
+            for item in iter_json_array(fixture)
+            if item.get("model") == "books.book"
+        ]
+
+
+def generate_books(fixture: str | Path, count: int) -> Iterator[Book]:
+    """Cycle through the fixture, numbering the titles of every new round"""
+    templates = load_fixture_books(fixture)
+
+    for index in range(count):
+        fields = templates[index % len(templates)]
+        round_number = index // len(templates)
+        title = fields["title"]
+        if round_number:
+            title = f"{title} {round_number + 1}"
+
+        yield Book(
+            title=title,
+            author=fields["author"],
+            cover=fields["cover"],
+            inventory=fields["inventory"],
+            daily_fee=Decimal(fields["daily_fee"]),
+        )
+
+
+def generate_users(count: int) -> Iterator:
+    # Hashing is deliberately slow, every user shares one hash.
+    password = make_password(BENCHMARK_PASSWORD)
+    User = get_user_model()
+
+    for index in range(count):
+        yield User(email=BENCHMARK_EMAIL.format(index), password=password)
+
+
+def generate_borrowings(
+    user_ids: list[int],
+    book_ids: list[int],
+    count: int,
+    rng: random.Random,
+) -> Iterator[Borrowing]:
+    today = date.today()
+
+    for _ in range(count):
+        returned = rng.random() < RETURNED_SHARE
+
+        yield Borrowing(
+            user_id=rng.choice(user_ids),
+            book_id=rng.choice(book_ids),
+            expected_return_date=today + timedelta(days=rng.randint(-30, 30)),
+            actual_return_date=today if returned else None,
+        )
+
+
+def generate_payments(
+    borrowings: Iterable[Borrowing], rng: random.Random
+) -> Iterator[Payment]:
+    for borrowing in borrowings:
+        paid = rng.random() < PAID_SHARE
+
+        yield Payment(
+            borrowing_id=borrowing.id,
+            type=Payment.TypeChoices.PAYMENT,
+            status=(
+                Payment.StatusChoices.PAID
+                if paid
+                else Payment.StatusChoices.PENDING
+            ),
+            session_id=f"cs_bench_{borrowing.id}",
+            session_url="https://checkout.stripe.test/bench",
+            money_to_pay=Decimal(rng.randint(100, 5000)) / 100,
+        )
+
+
+def generate_dataset(
+    fixture: str | Path,
+    books: int,
+    users: int,
+    borrowings: int,
+    batch_size: int = 5000,
+    seed: int = 0,
+) -> dict:
+    """Fill the database with a synthetic library of the given size.
+
+    Rows are built lazily and inserted in batches, so memory is bounded by
+    the batch size plus the user and book ids borrowings are drawn from.
+    Every borrowing gets one payment.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+
+    created = {
+        "books": insert_in_batches(
+            Book, generate_books(fixture, books), batch_size
+        ),
+        "users": insert_in_batches(User, generate_users(users), batch_size),
+        "borrowings": 0,
+        "payments": 0,
+    }
+
+    user_ids = list(
+        User.objects.filter(
+            email__endswith=BENCHMARK_DOMAIN
+        ).values_list("id", flat=True)
+    )
+    book_ids = list(Book.objects.values_list("id", flat=True))
+    if borrowings and not (user_ids and book_ids):
+        return created
+
+    rows = generate_borrowings(user_ids, book_ids, borrowings, rng)
+
+    while batch := list(islice(rows, batch_size)):
+        with transaction.atomic():
+            Borrowing.objects.bulk_create(batch)
+            payments = Payment.objects.bulk_create(
+                generate_payments(batch, rng)
+            )
+
+        created["borrowings"] += len(batch)
+        created["payments"] += len(payments)
+
+    return created
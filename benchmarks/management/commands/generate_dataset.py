@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.dataset import check_benchmark_database, generate_dataset
+from books.cache import bump_catalog_version
+from books.search import invalidate_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic library for benchmarks: books derived from a "
+        "fixture, users, and borrowings with one payment each"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fixture", default="books.json")
+        parser.add_argument("--books", type=int, default=10_000)
+        parser.add_argument("--users", type=int, default=1_000)
+        parser.add_argument("--borrowings", type=int, default=10_000)
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            check_benchmark_database()
+        except ValueError as error:
+            raise CommandError(error)
+
+        if not Path(options["fixture"]).is_file():
+            raise CommandError(f"Fixture '{options['fixture']}' not found")
+
+        created = generate_dataset(
+            options["fixture"],
+            books=options["books"],
+            users=options["users"],
+            borrowings=options["borrowings"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+        )
+
+        invalidate_search_index()
+        bump_catalog_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                ", ".join(
+                    f"{count} {name}" for name, count in created.items()
+                ) + " created."
+            )
+        )
@@ -0,0 +1,128 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from benchmarks.dataset import check_benchmark_database
+from benchmarks.runner import (
+    SCENARIOS,
+    WEBHOOK_SECRET,
+    BenchmarkContext,
+    run_scenario,
+)
+from benchmarks.stubs import ServiceStubs
+from books.models import Book
+from borrowings.models import Borrowing
+from library_api.celery import app as celery_app
+from payments.models import Payment
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency percentiles of every API endpoint, one request at "
+        "a time, "
+        "against the configured database, with Stripe and the Telegram bot "
+        "stubbed, and print the results as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            help="Run only these scenarios, e.g. books:list (repeatable)",
+        )
+        parser.add_argument("--output", help="Write the JSON to this file")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if (
+                scenario.name in options["scenarios"]
+                if options["scenarios"]
+                else scenario.default
+            )
+        ]
+        if not scenarios:
+            raise CommandError("No scenario matches")
+
+        try:
+            check_benchmark_database()
+        except ValueError as error:
+            raise CommandError(error)
+
+        results = {}
+        eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+
+        try:
+            with ServiceStubs(), override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                STRIPE_SECRET_KEY="sk_test_bench",
+                ENDPOINT_SECRET_WEBHOOK=WEBHOOK_SECRET,
+                QUERY_BUDGET_STRICT=False,
+            ):
+                context = BenchmarkContext(options["seed"])
+
+                for scenario in scenarios:
+                    self.stderr.write(f"Running {scenario.name}")
+                    results[scenario.name] = run_scenario(
+                        context,
+                        scenario,
+                        options["requests"],
+                        options["warmup"],
+                    )
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            celery_app.conf.task_always_eager = eager
+
+        report = json.dumps(
+            {"meta": self.get_meta(options), "results": results}, indent=2
+        )
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
+
+    @staticmethod
+    def get_revision() -> str | None:
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def get_meta(self, options: dict) -> dict:
+        return {
+            "started_at": timezone.now().isoformat(),
+            "revision": self.get_revision(),
+            "database": connection.vendor,
+            "debug": bool(settings.DEBUG),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "requests": options["requests"],
+            "warmup": options["warmup"],
+            "dataset": {
+                "books": Book.objects.count(),
+                "users": get_user_model().objects.count(),
+                "borrowings": Borrowing.objects.count(),
+                "payments": Payment.objects.count(),
+            },
+        }
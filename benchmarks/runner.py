@@ -0,0 +1,368 @@
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable
+
+from django.contrib.auth import get_user_model
+from django.test import Client
+from django.urls import reverse
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from benchmarks.dataset import BENCHMARK_EMAIL, BENCHMARK_PASSWORD
+from books.models import Book
+from borrowings.models import Borrowing
+from payments.models import Payment
+
+
+BENCHMARK_ADMIN_EMAIL = "admin@bench.local"
+WEBHOOK_SECRET = "whsec_bench"
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    build: Callable[["BenchmarkContext", int], tuple[str, dict | None]]
+    role: str | None = "user"
+    default: bool = True
+
+
+class BenchmarkContext:
+    """Users, tokens and sample rows the scenarios send requests about"""
+
+    def __init__(self, seed: int = 0) -> None:
+        self.rng = random.Random(seed)
+        User = get_user_model()
+
+        self.user = User.objects.filter(
+            email=BENCHMARK_EMAIL.format(0)
+        ).first() or User.objects.create_user(
+            BENCHMARK_EMAIL.format(0), BENCHMARK_PASSWORD
+        )
+        self.admin = User.objects.filter(
+            email=BENCHMARK_ADMIN_EMAIL
+        ).first() or User.objects.create_superuser(
+            BENCHMARK_ADMIN_EMAIL, BENCHMARK_PASSWORD
+        )
+
+        self.refresh_token = RefreshToken.for_user(self.user)
+        self.tokens = {
+            "user": str(self.refresh_token.access_token),
+            "admin": str(RefreshToken.for_user(self.admin).access_token),
+        }
+
+        self.book = Book.objects.filter(inventory_shards=0).first()
+        if self.book is None:
+            raise ValueError("Generate a dataset before running benchmarks")
+        # The create scenario borrows this book on every request.
+        Book.objects.filter(pk=self.book.pk).update(inventory=10 ** 6)
+
+        self.book_ids = list(
+            Book.objects.order_by("?").values_list("id", flat=True)[:1000]
+        )
+        self.borrowing = self.make_borrowing()
+        self.payment = self.make_payment(self.borrowing)
+
+    def make_borrowing(self) -> Borrowing:
+        return Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=date.today() + timedelta(days=7),
+        )
+
+    def make_payment(self, borrowing: Borrowing) -> Payment:
+        return Payment.objects.create(
+            borrowing=borrowing,
+            type=Payment.TypeChoices.PAYMENT,
+            session_id=f"cs_bench_ctx_{borrowing.id}",
+            session_url="https://checkout.stripe.test/bench",
+            money_to_pay=borrowing.calculate_money_to_pay(),
+        )
+
+    def random_book_id(self) -> int:
+        return self.rng.choice(self.book_ids)
+
+
+def signed_webhook(payload: str) -> dict:
+    timestamp = int(time.time())
+    signature = hmac.new(
+        WEBHOOK_SECRET.encode(),
+        f"{timestamp}.{payload}".encode(),
+        hashlib.sha256,
+    ).hexdigest()
+
+    return {"HTTP_STRIPE_SIGNATURE": f"t={timestamp},v1={signature}"}
+
+
+def webhook_event(context: BenchmarkContext) -> str:
+    return json.dumps({
+        "id": f"evt_bench_{uuid.uuid4().hex}",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": {"id": context.payment.session_id}},
+    })
+
+
+def get(path: str, **params) -> Callable:
+    def build(context: BenchmarkContext, index: int):
+        return path, params
+
+    return build
+
+
+SCENARIOS = [
+    Scenario("books:list", "GET", get(reverse("books:book-list")), None),
+    Scenario(
+        "books:list-keyset",
+        "GET",
+        get(reverse("books:book-list"), pagination="keyset"),
+        None,
+    ),
+    Scenario(
+        "books:search",
+        "GET",
+        get(reverse("books:book-list"), title="Stu"),
+        None,
+    ),
+    Scenario(
+        "books:detail",
+        "GET",
+        lambda context, index: (
+            reverse("books:book-detail", args=[context.random_book_id()]),
+            {},
+        ),
+        None,
+    ),
+    Scenario(
+        "books:export",
+        "GET",
+        get(reverse("books:book-export"), export_format="ndjson"),
+        "admin",
+        default=False,
+    ),
+    Scenario(
+        "borrowings:list", "GET", get(reverse("borrowings:borrowings-list"))
+    ),
+    Scenario(
+        "borrowings:list-active-keyset",
+        "GET",
+        get(
+            reverse("borrowings:borrowings-list"),
+            is_active="true",
+            pagination="keyset",
+        ),
+    ),
+    Scenario(
+        "borrowings:list-admin",
+        "GET",
+        get(reverse("borrowings:borrowings-list")),
+        "admin",
+    ),
+    Scenario(
+        "borrowings:detail",
+        "GET",
+        lambda context, index: (
+            reverse(
+                "borrowings:borrowings-detail", args=[context.borrowing.id]
+            ),
+            {},
+        ),
+    ),
+    Scenario(
+        "borrowings:create",
+        "POST",
+        lambda context, index: (
+            reverse("borrowings:borrowings-list"),
+            {
+                "book": context.book.id,
+                "expected_return_date": str(
+                    date.today() + timedelta(days=7)
+                ),
+            },
+        ),
+    ),
+    Scenario(
+        "borrowings:return",
+        "POST",
+        lambda context, index: (
+            reverse(
+                "borrowings:borrowings-return-borrowings",
+                args=[context.make_borrowing().id],
+            ),
+            {},
+        ),
+    ),
+    Scenario("payments:list", "GET", get(reverse("payments:payment-list"))),
+    Scenario(
+        "payments:detail",
+        "GET",
+        lambda context, index: (
+            reverse("payments:payment-detail", args=[context.payment.id]),
+            {},
+        ),
+    ),
+    Scenario(
+        "payments:success",
+        "GET",
+        lambda context, index: (
+            reverse("payments:payment-success", args=[context.payment.id]),
+            {},
+        ),
+    ),
+    Scenario(
+        "payments:cancel",
+        "GET",
+        lambda context, index: (
+            reverse("payments:payment-cancel", args=[context.payment.id]),
+            {},
+        ),
+    ),
+    Scenario(
+        "payments:checkout",
+        "POST",
+        lambda context, index: (
+            reverse("payments:payment-checkout", args=[context.payment.id]),
+            {},
+        ),
+    ),
+    Scenario(
+        "payments:stripe-stats",
+        "GET",
+        get(reverse("payments:payment-stripe-stats")),
+        "admin",
+    ),
+    Scenario(
+        "payments:stripe-webhook",
+        "WEBHOOK",
+        lambda context, index: (
+            reverse("payments:stripe-webhook"),
+            webhook_event(context),
+        ),
+        None,
+    ),
+    Scenario(
+        "user:register",
+        "POST",
+        lambda context, index: (
+            reverse("user:create"),
+            {
+                "email": f"register-{uuid.uuid4().hex}@bench.local",
+                "password": BENCHMARK_PASSWORD,
+            },
+        ),
+        None,
+    ),
+    Scenario(
+        "user:token",
+        "POST",
+        lambda context, index: (
+            reverse("user:token_obtain_pair"),
+            {
+                "email": context.user.email,
+                "password": BENCHMARK_PASSWORD,
+            },
+        ),
+        None,
+    ),
+    Scenario(
+        "user:token-refresh",
+        "POST",
+        lambda context, index: (
+            reverse("user:token_refresh"),
+            {"refresh": str(context.refresh_token)},
+        ),
+        None,
+    ),
+    Scenario(
+        "user:token-verify",
+        "POST",
+        lambda context, index: (
+            reverse("user:token_verify"),
+            {"token": context.tokens["user"]},
+        ),
+        None,
+    ),
+    Scenario("user:me", "GET", get(reverse("user:manage"))),
+    Scenario("schema", "GET", get(reverse("schema")), None),
+]
+
+
+def send(client: Client, context: BenchmarkContext, scenario, index: int):
+    path, data = scenario.build(context, index)
+    headers = {}
+    if scenario.role:
+        headers[jwt_settings.AUTH_HEADER_NAME] = (
+            f"{jwt_settings.AUTH_HEADER_TYPES[0]} "
+            f"{context.tokens[scenario.role]}"
+        )
+
+    started = time.perf_counter()
+
+    if scenario.method == "GET":
+        response = client.get(path, data, **headers)
+    elif scenario.method == "WEBHOOK":
+        response = client.post(
+            path,
+            data,
+            content_type="application/json",
+            **signed_webhook(data),
+        )
+    else:
+        response = client.post(
+            path, data, content_type="application/json", **headers
+        )
+
+    if response.streaming:
+        b"".join(response.streaming_content)
+
+    return time.perf_counter() - started, response.status_code
+
+
+def summarize(latencies: list[float], statuses: dict) -> dict:
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0]
+
+    return {
+        "requests": len(latencies),
+        "statuses": statuses,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": p50 * 1000,
+        "p95_ms": p95 * 1000,
+        "p99_ms": p99 * 1000,
+        "max_ms": max(latencies) * 1000,
+        # Requests are sent one after another, this is the inverse of the
+        # mean latency rather than the capacity of a concurrent server.
+        "sequential_requests_per_second": len(latencies) / sum(latencies),
+    }
+
+
+def run_scenario(
+    context: BenchmarkContext,
+    scenario: Scenario,
+    requests: int,
+    warmup: int,
+) -> dict:
+    """Send ``warmup`` untimed requests, then time ``requests`` more"""
+    client = Client()
+    latencies = []
+    statuses = {}
+
+    for index in range(warmup):
+        send(client, context, scenario, index)
+
+    for index in range(requests):
+        elapsed, status = send(client, context, scenario, warmup + index)
+        latencies.append(elapsed)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return summarize(latencies, statuses)
@@ -0,0 +1,102 @@
+import itertools
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import stripe
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, body: dict) -> None:
+        content = json.dumps(body).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def read_body(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        session_id = self.path.rstrip("/").rsplit("/", 1)[1]
+        self.send_json(self.server.stubs.session(session_id))
+
+    def do_POST(self):
+        self.read_body()
+
+        if self.path.startswith("/v1/checkout/sessions"):
+            session_id = f"cs_stub_{next(self.server.stubs.counter)}"
+            return self.send_json(self.server.stubs.session(session_id))
+
+        self.send_json({"status": "queued"})
+
+
+class ServiceStubs:
+    """Local stand-ins for Stripe and the Telegram bot service.
+
+    Stripe Checkout sessions are created and retrieved with canned
+    responses and every bot notification is accepted. Used as a context
+    manager, it points the Stripe client and the bot settings at itself.
+    """
+
+    def __init__(self) -> None:
+        self.counter = itertools.count(1)
+
+    @staticmethod
+    def session(session_id: str) -> dict:
+        return {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.stripe.test/{session_id}",
+            "payment_status": "paid",
+            "status": "complete",
+            "customer_details": {
+                "name": "Benchmark Reader",
+                "email": "reader@bench.local",
+            },
+        }
+
+    def __enter__(self) -> "ServiceStubs":
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.stubs = self
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+
+        port = self.server.server_port
+        self.previous = (
+            stripe.api_base,
+            os.environ.get("TELEGRAM_BOT_HOST"),
+            os.environ.get("TELEGRAM_BOT_PORT"),
+        )
+        stripe.api_base = f"http://127.0.0.1:{port}"
+        os.environ["TELEGRAM_BOT_HOST"] = "127.0.0.1"
+        os.environ["TELEGRAM_BOT_PORT"] = str(port)
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        api_base, bot_host, bot_port = self.previous
+        stripe.api_base = api_base
+
+        for name, value in (
+            ("TELEGRAM_BOT_HOST", bot_host),
+            ("TELEGRAM_BOT_PORT", bot_port),
+        ):
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
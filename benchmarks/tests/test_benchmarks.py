@@ -0,0 +1,85 @@
+import json
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from benchmarks.dataset import generate_dataset
+from books.models import Book
+from borrowings.models import Borrowing
+from payments.models import Payment
+
+
+FIXTURE = settings.BASE_DIR / "books.json"
+
+
+@override_settings(BENCHMARK_DATABASE=True)
+class GenerateDatasetTests(TestCase):
+    def test_dataset_scales_beyond_the_fixture(self):
+        created = generate_dataset(
+            FIXTURE, books=1200, users=20, borrowings=50, batch_size=100
+        )
+
+        self.assertEqual(
+            created,
+            {"books": 1200, "users": 20, "borrowings": 50, "payments": 50},
+        )
+        self.assertEqual(Book.objects.count(), 1200)
+        self.assertEqual(
+            Book.objects.filter(title__endswith=" 2").count(), 201
+        )
+        self.assertEqual(Payment.objects.count(), Borrowing.objects.count())
+
+    def test_generation_is_repeatable(self):
+        generate_dataset(FIXTURE, books=10, users=5, borrowings=0)
+        created = generate_dataset(FIXTURE, books=0, users=5, borrowings=0)
+
+        self.assertEqual(created["users"], 0)
+        self.assertEqual(get_user_model().objects.count(), 5)
+
+    @override_settings(BENCHMARK_DATABASE=False)
+    def test_refuses_a_database_not_dedicated_to_benchmarks(self):
+        for command in ("generate_dataset", "run_benchmarks"):
+            with self.assertRaises(CommandError):
+                call_command(command, stdout=StringIO(), stderr=StringIO())
+
+        self.assertFalse(Book.objects.exists())
+
+
+@override_settings(BENCHMARK_DATABASE=True)
+class RunBenchmarksTests(TestCase):
+    def setUp(self):
+        generate_dataset(FIXTURE, books=20, users=5, borrowings=20)
+
+    def test_report(self):
+        out = StringIO()
+        scenarios = [
+            "books:list",
+            "borrowings:create",
+            "payments:success",
+            "payments:stripe-webhook",
+            "user:me",
+        ]
+
+        call_command(
+            "run_benchmarks",
+            "--requests", "3",
+            "--warmup", "1",
+            *[f"--scenario={name}" for name in scenarios],
+            stdout=out,
+            stderr=StringIO(),
+        )
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report["meta"]["dataset"]["books"], 20)
+        self.assertEqual(list(report["results"]), scenarios)
+        for name, result in report["results"].items():
+            self.assertEqual(result["requests"], 3)
+            self.assertTrue(
+                all(status.startswith("2") for status in result["statuses"]),
+                f"{name}: {result['statuses']}"
+            )
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
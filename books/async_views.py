@@ -0,0 +1,47 @@
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import NotFound
+
+from books.filters import CustomBookSearchFilter
+from books.inventory import annotate_current_inventory
+from books.models import Book
+from books.serializers import BookListSerializer, BookRetrieveSerializer
+from books.views import BookViewSet
+from common.async_views import async_read_view, json_response
+from library_api.paginations import get_paginator
+
+
+@async_read_view(authentication_required=False)
+async def book_list(request):
+    """Async twin of ``BookViewSet.list``"""
+    queryset = BookViewSet.queryset.all()
+
+    search_fields = CustomBookSearchFilter.search_fields
+    if any(request.query_params.get(field) for field in search_fields):
+        # The first search loads the in-memory index from the database.
+        queryset = await sync_to_async(
+            CustomBookSearchFilter().filter_queryset
+        )(request, queryset, None)
+
+    paginator = get_paginator(request, BookViewSet.keyset_ordering)
+    page = await paginator.apaginate_queryset(queryset, request)
+    serializer = BookListSerializer(
+        page, many=True, context={"request": request}
+    )
+
+    response = paginator.get_paginated_response(serializer.data)
+    return json_response(response.data)
+
+
+@async_read_view(authentication_required=False)
+async def book_detail(request, pk: int):
+    """Async twin of ``BookViewSet.retrieve``"""
+    try:
+        book = await annotate_current_inventory(
+            BookViewSet.queryset
+        ).aget(pk=pk)
+    except Book.DoesNotExist:
+        raise NotFound("No Book matches the given query.")
+
+    serializer = BookRetrieveSerializer(book, context={"request": request})
+
+    return json_response(serializer.data)
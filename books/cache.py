@@ -0,0 +1,26 @@
+from common.cache import bump_version, get_version, invalidate_version
+
+
+CATALOG_VERSION_KEY = "books:catalog:version"
+BOOK_VERSION_KEY = "books:book:{}:version"
+
+
+def get_catalog_version() -> int:
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version() -> None:
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_catalog() -> None:
+    invalidate_version(CATALOG_VERSION_KEY)
+
+
+def get_book_version(book_id: int) -> int:
+    return get_version(BOOK_VERSION_KEY.format(book_id))
+
+
+def invalidate_book(book_id: int) -> None:
+    """Drop cached details of one book, leaving the catalog pages cached"""
+    invalidate_version(BOOK_VERSION_KEY.format(book_id))
@@ -0,0 +1,60 @@
+import csv
+import json
+from typing import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from books.inventory import annotate_current_inventory
+from books.models import Book
+
+
+EXPORT_FIELDS = ("id", "title", "author", "cover", "inventory", "daily_fee")
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class Echo:
+    """File-like object that hands written rows straight back"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_book_rows(
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[tuple]:
+    columns = [
+        "current_inventory" if field == "inventory" else field
+        for field in EXPORT_FIELDS
+    ]
+
+    return (
+        annotate_current_inventory(Book.objects.order_by("id"))
+        .values_list(*columns)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def iter_ndjson(rows: Iterable[tuple]) -> Iterator[str]:
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+    for row in rows:
+        yield encoder.encode(dict(zip(EXPORT_FIELDS, row))) + "\n"
+
+
+def iter_csv(rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+EXPORT_WRITERS = {
+    "ndjson": iter_ndjson,
+    "csv": iter_csv,
+}
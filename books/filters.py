@@ -1,15 +1,37 @@
+from django.conf import settings
 from rest_framework import filters
 
+from books.search import book_search_index
+
+
+MAX_INDEX_CANDIDATES = 1000
+
 
 class CustomBookSearchFilter(filters.BaseFilterBackend):
-    def filter_queryset(self, request, queryset, view):
-        title = request.query_params.get("title")
-        author = request.query_params.get("author")
+    search_fields = ("title", "author")
 
-        if title:
-            queryset = queryset.filter(title__icontains=title)
+    def filter_queryset(self, request, queryset, view):
+        for field in self.search_fields:
+            value = request.query_params.get(field)
 
-        if author:
-            queryset = queryset.filter(author__icontains=author)
+            if value:
+                queryset = self.filter_field(queryset, field, value)
 
         return queryset
+
+    def filter_field(self, queryset, field: str, value: str):
+        # The index narrows the scan down to primary keys, the lookup itself
+        # is kept so ids the index still holds for changed rows are dropped.
+        # Missing ids can't be recovered that way, so a possibly stale index
+        # is skipped altogether.
+        queryset = queryset.filter(**{f"{field}__icontains": value})
+
+        if not settings.BOOK_SEARCH_INDEX:
+            return queryset
+
+        book_ids = book_search_index.search(field, value)
+
+        if book_ids is None or len(book_ids) > MAX_INDEX_CANDIDATES:
+            return queryset
+
+        return queryset.filter(id__in=book_ids)
@@ -0,0 +1,64 @@
+import hashlib
+import json
+from typing import IO, Iterator
+
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def file_checksum(path: str, chunk_size: int = READ_CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as fixture:
+        while chunk := fixture.read(chunk_size):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def iter_json_array(
+    stream: IO[str],
+    chunk_size: int = READ_CHUNK_SIZE
+) -> Iterator[dict]:
+    """Yield the objects of a top level JSON array one at a time.
+
+    Only the current read chunk is held in memory, so fixtures of any size
+    can be streamed.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Fixture must be a JSON array")
+                started = True
+                position += 1
+                continue
+
+            if buffer[position] == "]":
+                return
+
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                continue
+
+        if eof:
+            raise ValueError("Unexpected end of fixture")
+
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
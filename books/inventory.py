@@ -0,0 +1,214 @@
+import random
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case,
+    F,
+    OuterRef,
+    QuerySet,
+    Subquery,
+    Sum,
+    When,
+)
+
+from books.cache import invalidate_book
+from books.models import Book, BookInventoryShard
+
+
+INVENTORY_CACHE_KEY = "books:inventory:{}"
+INVENTORY_CACHE_TIMEOUT = 30
+# A switch between the column and the counter rows can race a borrower
+# holding the old representation at most once per shard_inventory run.
+INVENTORY_SWITCH_RETRIES = 3
+
+
+def reserve_book(book: Book) -> bool:
+    """Take one copy of ``book`` if any is left.
+
+    The availability check and the decrement run as one conditional
+    ``UPDATE``, so concurrent borrowers can never oversell a title.
+    Sharded books spread those updates over their counter rows. The column
+    is only updated while the book is unsharded, so a ``book`` read before
+    ``shard_inventory`` switched it is reloaded instead of changing a total
+    nobody reads.
+    """
+    for _ in range(INVENTORY_SWITCH_RETRIES):
+        if book.inventory_shards:
+            reserved = _reserve_shard(book)
+        else:
+            reserved = Book.objects.filter(
+                pk=book.pk, inventory_shards=0, inventory__gt=0
+            ).update(inventory=F("inventory") - 1)
+
+        if reserved:
+            _inventory_changed(book)
+            return True
+
+        if not _reload_shards(book):
+            return False
+
+    return False
+
+
+def release_book(book: Book) -> None:
+    for _ in range(INVENTORY_SWITCH_RETRIES):
+        if book.inventory_shards:
+            released = BookInventoryShard.objects.filter(
+                book_id=book.pk, shard=random.randrange(book.inventory_shards)
+            ).update(count=F("count") + 1)
+        else:
+            released = Book.objects.filter(
+                pk=book.pk, inventory_shards=0
+            ).update(inventory=F("inventory") + 1)
+
+        if released:
+            _inventory_changed(book)
+            return
+
+        if not _reload_shards(book):
+            return
+
+
+def _reload_shards(book: Book) -> bool:
+    """Refresh ``book.inventory_shards``, whether a switch changed it"""
+    shards = (
+        Book.objects.filter(pk=book.pk)
+        .values_list("inventory_shards", flat=True)
+        .first()
+    )
+
+    if shards is None or shards == book.inventory_shards:
+        return False
+
+    book.inventory_shards = shards
+    return True
+
+
+def _reserve_shard(book: Book) -> int:
+    counters = BookInventoryShard.objects.filter(book_id=book.pk)
+    shard = random.randrange(book.inventory_shards)
+
+    reserved = counters.filter(shard=shard, count__gt=0).update(
+        count=F("count") - 1
+    )
+    if reserved:
+        return reserved
+
+    # The random shard ran dry, fall back to the ones that still have
+    # copies instead of probing every counter row.
+    available = list(
+        counters.filter(count__gt=0).values_list("shard", flat=True)
+    )
+    random.shuffle(available)
+
+    for shard in available:
+        reserved = counters.filter(shard=shard, count__gt=0).update(
+            count=F("count") - 1
+        )
+        if reserved:
+            return reserved
+
+    return 0
+
+
+def _inventory_changed(book: Book) -> None:
+    if book.inventory_shards:
+        cache.delete(INVENTORY_CACHE_KEY.format(book.pk))
+
+    invalidate_book(book.pk)
+
+
+def get_inventory(book: Book) -> int:
+    if not book.inventory_shards:
+        return book.inventory
+
+    cache_key = INVENTORY_CACHE_KEY.format(book.pk)
+    total = cache.get(cache_key)
+
+    if total is None:
+        total = _sum_shards(book)
+        cache.set(cache_key, total, INVENTORY_CACHE_TIMEOUT)
+
+    return total
+
+
+def _sum_shards(book: Book) -> int:
+    return BookInventoryShard.objects.filter(book_id=book.pk).aggregate(
+        total=Sum("count", default=0)
+    )["total"]
+
+
+def annotate_current_inventory(queryset: QuerySet) -> QuerySet:
+    shard_total = (
+        BookInventoryShard.objects.filter(book=OuterRef("pk"))
+        .values("book")
+        .annotate(total=Sum("count"))
+        .values("total")
+    )
+
+    return queryset.annotate(
+        current_inventory=Case(
+            When(inventory_shards__gt=0, then=Subquery(shard_total)),
+            default=F("inventory"),
+        )
+    )
+
+
+def _lock_shards(book: Book) -> int:
+    """Total of the counter rows of ``book``, locked for the transaction.
+
+    Borrowers never lock the book row, so summing before locking would
+    miss a change they have not committed yet and later overwrite it.
+    """
+    counters = BookInventoryShard.objects.select_for_update().filter(
+        book_id=book.pk
+    )
+    return sum(counter.count for counter in counters)
+
+
+def _distribute(book: Book, total: int, shards: int) -> None:
+    BookInventoryShard.objects.filter(book_id=book.pk).delete()
+
+    per_shard, remainder = divmod(total, shards)
+    BookInventoryShard.objects.bulk_create(
+        BookInventoryShard(
+            book_id=book.pk,
+            shard=shard,
+            count=per_shard + (shard < remainder),
+        )
+        for shard in range(shards)
+    )
+
+
+def set_inventory(book: Book, total: int) -> None:
+    """Overwrite the available copies, keeping the current representation"""
+    with transaction.atomic():
+        book = Book.objects.select_for_update().get(pk=book.pk)
+
+        if book.inventory_shards:
+            _distribute(book, total, book.inventory_shards)
+        Book.objects.filter(pk=book.pk).update(inventory=total)
+
+        _inventory_changed(book)
+
+
+def shard_inventory(book: Book, shards: int) -> None:
+    """Switch ``book`` to ``shards`` counter rows, or back with ``0``"""
+    with transaction.atomic():
+        book = Book.objects.select_for_update().get(pk=book.pk)
+        total = (
+            _lock_shards(book) if book.inventory_shards else book.inventory
+        )
+
+        if shards:
+            _distribute(book, total, shards)
+        else:
+            BookInventoryShard.objects.filter(book_id=book.pk).delete()
+
+        Book.objects.filter(pk=book.pk).update(
+            inventory=total, inventory_shards=shards
+        )
+
+        cache.delete(INVENTORY_CACHE_KEY.format(book.pk))
+        invalidate_book(book.pk)
@@ -0,0 +1,100 @@
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from books.cache import bump_catalog_version
+from books.fixtures import file_checksum, iter_json_array
+from books.models import Book, FixtureChecksum
+from books.search import invalidate_search_index
+
+
+BOOK_MODEL_LABEL = "books.book"
+UPDATE_FIELDS = ("title", "author", "cover", "inventory", "daily_fee")
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert books from a JSON fixture in batches, "
+        "skipping the load when the fixture has not changed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixture", nargs="?", default="books.json")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Load the fixture even if its checksum is unchanged",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["fixture"])
+
+        if not path.is_file():
+            raise CommandError(f"Fixture '{path}' does not exist")
+
+        checksum = file_checksum(path)
+        source = path.name
+
+        if not options["force"] and FixtureChecksum.objects.filter(
+            source=source, checksum=checksum
+        ).exists():
+            self.stdout.write(f"Fixture '{source}' is up to date, skipping.")
+            return
+
+        with transaction.atomic():
+            with open(path, encoding="utf-8") as fixture:
+                loaded = self.load(fixture, options["batch_size"])
+
+            self.reset_sequences()
+            FixtureChecksum.objects.update_or_create(
+                source=source, defaults={"checksum": checksum}
+            )
+
+        invalidate_search_index()
+        bump_catalog_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Upserted {loaded} books from '{source}'.")
+        )
+
+    @staticmethod
+    def build_book(item: dict) -> Book:
+        return Book(
+            id=item["pk"],
+            **{
+                name: Book._meta.get_field(name).to_python(value)
+                for name, value in item["fields"].items()
+            }
+        )
+
+    def load(self, fixture, batch_size: int) -> int:
+        books = (
+            self.build_book(item)
+            for item in iter_json_array(fixture)
+            if item.get("model") == BOOK_MODEL_LABEL
+        )
+        loaded = 0
+
+        while batch := list(islice(books, batch_size)):
+            Book.objects.bulk_create(
+                batch,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=UPDATE_FIELDS,
+            )
+            loaded += len(batch)
+
+        return loaded
+
+    @staticmethod
+    def reset_sequences() -> None:
+        statements = connection.ops.sequence_reset_sql(no_style(), [Book])
+
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
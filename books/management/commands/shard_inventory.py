@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from books.inventory import get_inventory, shard_inventory
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        "Spread the inventory of hot books over several counter rows, "
+        "or merge it back with --shards 0"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("book_ids", nargs="+", type=int)
+        parser.add_argument("--shards", type=int, default=8)
+
+    def handle(self, *args, **options):
+        shards = options["shards"]
+
+        if not 0 <= shards <= 256:
+            raise CommandError("--shards must be between 0 and 256")
+
+        for book_id in options["book_ids"]:
+            try:
+                book = Book.objects.get(pk=book_id)
+            except Book.DoesNotExist:
+                raise CommandError(f"Book {book_id} does not exist")
+
+            shard_inventory(book, shards)
+            book.refresh_from_db()
+
+            self.stdout.write(
+                f"Book {book_id}: {get_inventory(book)} copies "
+                f"in {shards or 'no'} shards."
+            )
@@ -11,7 +11,43 @@ class Book(models.Model):
     author = models.CharField(max_length=255)
     cover = models.CharField(max_length=4, choices=Cover)
     inventory = models.PositiveIntegerField()
+    inventory_shards = models.PositiveSmallIntegerField(default=0)
     daily_fee = models.DecimalField(max_digits=3, decimal_places=2)
 
     def __str__(self):
         return f"{self.title}, {self.author}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["title", "id"], name="book_title_id_idx"),
+        ]
+
+
+class BookInventoryShard(models.Model):
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="inventory_counters"
+    )
+    shard = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "shard"],
+                name="unique_book_inventory_shard"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.book_id}#{self.shard}: {self.count}"
+
+
+class FixtureChecksum(models.Model):
+    source = models.CharField(max_length=255, unique=True)
+    checksum = models.CharField(max_length=64)
+    loaded_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} ({self.checksum[:12]})"
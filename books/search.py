@@ -0,0 +1,240 @@
+import threading
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Max
+
+from books.models import Book
+from common.cache import bump_version, get_version
+
+
+NGRAM_SIZE = 3
+SEARCH_FIELDS = ("title", "author")
+SEARCH_VERSION_KEY = "books:search:version"
+
+
+def normalize(value: str) -> str:
+    return value.lower()
+
+
+def ngrams(value: str) -> set[str]:
+    return {
+        value[index:index + NGRAM_SIZE]
+        for index in range(len(value) - NGRAM_SIZE + 1)
+    }
+
+
+def get_max_book_id() -> int:
+    return Book.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+
+
+class BookSearchIndex:
+    """In-memory trigram inverted index over book titles and authors.
+
+    Every process holds its own copy, so the index records the shared
+    ``SEARCH_VERSION_KEY`` and the highest book id it was built from.
+    Saves and deletes in any process bump that version after commit and
+    ``bulk_create`` raises the highest id; while either differs from what
+    the index saw, ``search`` returns ``None`` and callers scan the table
+    instead. One caller rebuilds the index without blocking the others.
+    """
+
+    def __init__(self, fields: tuple[str, ...] = SEARCH_FIELDS) -> None:
+        self.fields = fields
+        self._lock = threading.RLock()
+        self._building = False
+        self._version = None
+        self._max_id = 0
+        self._documents: dict[str, dict[int, str]] = {}
+        self._postings: dict[str, dict[str, set[int]]] = {}
+        self._documents, self._postings = self._empty_storage()
+
+    def _empty_storage(self) -> tuple[dict, dict]:
+        return (
+            {field: {} for field in self.fields},
+            {field: defaultdict(set) for field in self.fields},
+        )
+
+    def build(self) -> None:
+        # The version is read first, so a change committed while the rows
+        # are loaded leaves the new index stale instead of missing it.
+        version = get_version(SEARCH_VERSION_KEY)
+        max_id = 0
+        documents, postings = self._empty_storage()
+        rows = Book.objects.values_list("id", *self.fields)
+
+        for book_id, *values in rows.iterator(chunk_size=2000):
+            max_id = max(max_id, book_id)
+            self._add(
+                documents, postings, book_id, dict(zip(self.fields, values))
+            )
+
+        with self._lock:
+            self._documents, self._postings = documents, postings
+            self._version = version
+            self._max_id = max_id
+
+    def reset(self) -> None:
+        """Drop the index so that it is rebuilt on the next search"""
+        with self._lock:
+            self._documents, self._postings = self._empty_storage()
+            self._version = None
+            self._max_id = 0
+
+    def is_fresh(self) -> bool:
+        return (
+            self._version is not None
+            and self._version == get_version(SEARCH_VERSION_KEY)
+            and self._max_id >= get_max_book_id()
+        )
+
+    def _claim_build(self) -> bool:
+        with self._lock:
+            if self._building:
+                return False
+
+            self._building = True
+            return True
+
+    def ensure_fresh(self) -> bool:
+        """Rebuild a stale index, unless another thread is already on it"""
+        if self.is_fresh():
+            return True
+
+        if not self._claim_build():
+            return False
+
+        try:
+            self.build()
+        finally:
+            with self._lock:
+                self._building = False
+
+        return True
+
+    def _add(
+        self, documents: dict, postings: dict, book_id: int, values: dict
+    ) -> None:
+        for field in self.fields:
+            text = normalize(values[field])
+            documents[field][book_id] = text
+
+            for gram in ngrams(text):
+                postings[field][gram].add(book_id)
+
+    def _remove(self, book_id: int) -> None:
+        for field in self.fields:
+            text = self._documents[field].pop(book_id, None)
+
+            if text is None:
+                continue
+
+            postings = self._postings[field]
+            for gram in ngrams(text):
+                ids = postings.get(gram)
+                if ids is not None:
+                    ids.discard(book_id)
+                    if not ids:
+                        del postings[gram]
+
+    def update(self, book_id: int, values: dict) -> None:
+        with self._lock:
+            if self._version is None:
+                return
+
+            self._remove(book_id)
+            self._add(self._documents, self._postings, book_id, values)
+
+            # A gap in the ids may be a row another process bulk created.
+            if book_id == self._max_id + 1:
+                self._max_id = book_id
+
+    def remove(self, book_id: int) -> None:
+        with self._lock:
+            if self._version is not None:
+                self._remove(book_id)
+
+    def follow(self, version: int) -> None:
+        """Accept a version bump made for a change already applied here"""
+        with self._lock:
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+
+    def search(self, field: str, query: str) -> set[int] | None:
+        """Ids of books whose ``field`` contains ``query``.
+
+        ``None`` means the index may be missing recent changes.
+        """
+        query = normalize(query)
+
+        if not self.ensure_fresh():
+            return None
+
+        with self._lock:
+            documents = self._documents[field]
+
+            if len(query) < NGRAM_SIZE:
+                return {
+                    book_id
+                    for book_id, text in documents.items()
+                    if query in text
+                }
+
+            postings = self._postings[field]
+            grams = sorted(
+                ngrams(query),
+                key=lambda gram: len(postings.get(gram, ()))
+            )
+            candidates = set(postings.get(grams[0], ()))
+
+            for gram in grams[1:]:
+                if not candidates:
+                    break
+                candidates &= postings.get(gram, set())
+
+            return {
+                book_id
+                for book_id in candidates
+                if query in documents[book_id]
+            }
+
+
+book_search_index = BookSearchIndex()
+
+
+def bump_search_version(follow: bool = False) -> None:
+    version = bump_version(SEARCH_VERSION_KEY)
+
+    if follow:
+        book_search_index.follow(version)
+
+
+def invalidate_search_index() -> None:
+    """Mark every process' index stale once the transaction commits.
+
+    Code changing titles or authors with ``QuerySet.update`` or upserts
+    must call this, as those bypass the ``Book`` signals.
+    """
+    transaction.on_commit(bump_search_version)
+
+
+def apply_book_change(book_id: int, values: dict | None) -> None:
+    if values is None:
+        book_search_index.remove(book_id)
+    else:
+        book_search_index.update(book_id, values)
+
+    bump_search_version(follow=True)
+
+
+def index_book_change(book: Book, deleted: bool = False) -> None:
+    """Apply a saved or deleted book to this process' index on commit.
+
+    Other processes see the version bump and rebuild, a rolled back
+    change touches neither.
+    """
+    values = None if deleted else {
+        field: getattr(book, field) for field in book_search_index.fields
+    }
+    transaction.on_commit(partial(apply_book_change, book.id, values))
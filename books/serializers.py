@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from books.inventory import get_inventory, set_inventory
 from books.models import Book
 
 
@@ -8,6 +9,33 @@ class BookSerializer(serializers.ModelSerializer):
         model = Book
         fields = ("id", "title", "author", "cover", "inventory", "daily_fee")
 
+    def to_representation(self, instance: Book) -> dict:
+        data = super().to_representation(instance)
+
+        if instance.inventory_shards:
+            # Views annotate the shard total, so a page of books does not
+            # sum the counters of each one separately.
+            current = getattr(instance, "current_inventory", None)
+            data["inventory"] = (
+                get_inventory(instance) if current is None else current
+            )
+
+        return data
+
+    def update(self, instance: Book, validated_data: dict) -> Book:
+        inventory = None
+        if instance.inventory_shards:
+            inventory = validated_data.pop("inventory", None)
+
+        instance = super().update(instance, validated_data)
+
+        if inventory is not None:
+            set_inventory(instance, inventory)
+            instance.inventory = inventory
+            instance.current_inventory = inventory
+
+        return instance
+
 
 class BookRetrieveSerializer(BookSerializer):
     cover = serializers.SerializerMethodField()
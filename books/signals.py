@@ -0,0 +1,29 @@
+from typing import Type
+
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from books.cache import invalidate_catalog
+from books.models import Book
+from books.search import index_book_change
+
+
+@receiver(post_save, sender=Book)
+def book_saved(
+    sender: Type[Model],
+    instance: Book,
+    **kwargs
+) -> None:
+    index_book_change(instance)
+    invalidate_catalog()
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(
+    sender: Type[Model],
+    instance: Book,
+    **kwargs
+) -> None:
+    index_book_change(instance, deleted=True)
+    invalidate_catalog()
@@ -1,12 +1,18 @@
+import csv
+import io
+import json
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from books.inventory import reserve_book
 from books.models import Book
+from common.testing import QueryBudgetTestMixin
 from books.serializers import (
     BookListSerializer,
     BookRetrieveSerializer,
@@ -14,6 +20,7 @@ from books.serializers import (
 
 
 BOOK_URL = reverse("books:book-list")
+BOOK_EXPORT_URL = reverse("books:book-export")
 
 
 def sample_book(**additional) -> Book:
@@ -162,3 +169,198 @@ class AdminBookAPITests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         self.assertNotIn(book, Book.objects.all())
+
+
+class KeysetPaginationBookAPITests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        for index in range(7):
+            sample_book(title=f"Title {index % 3}")
+
+    def test_pages_follow_title_id_ordering(self) -> None:
+        expected = list(
+            Book.objects.order_by("title", "id").values_list("id", flat=True)
+        )
+
+        ids = []
+        response = self.client.get(
+            BOOK_URL, {"pagination": "keyset", "limit": 3}
+        )
+        self.assertIsNone(response.data["previous"])
+
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(book["id"] for book in response.data["results"])
+
+            if not response.data["next"]:
+                break
+            last_page = response
+            response = self.client.get(response.data["next"])
+
+        self.assertEqual(ids, expected)
+
+        previous = self.client.get(response.data["previous"])
+        self.assertEqual(
+            previous.data["results"], last_page.data["results"]
+        )
+
+    def test_invalid_cursor(self) -> None:
+        response = self.client.get(
+            BOOK_URL, {"pagination": "keyset", "cursor": "broken"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CatalogCacheBookAPITests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.book = sample_book()
+
+    def test_list_is_served_from_cache(self) -> None:
+        response = self.client.get(BOOK_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(BOOK_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached["ETag"], response["ETag"])
+
+    def test_not_modified_with_matching_etag(self) -> None:
+        response = self.client.get(get_detail(self.book.id))
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(
+                get_detail(self.book.id),
+                HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+
+        self.assertEqual(
+            not_modified.status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_borrow_invalidates_only_that_book(self) -> None:
+        other = sample_book(title="Other")
+        self.client.get(BOOK_URL)
+        self.client.get(get_detail(other.id))
+        response = self.client.get(get_detail(self.book.id))
+
+        reserve_book(self.book)
+
+        with self.assertNumQueries(0):
+            self.client.get(BOOK_URL)
+            self.client.get(get_detail(other.id))
+
+        updated = self.client.get(get_detail(self.book.id))
+        self.assertEqual(updated.data["inventory"], 9)
+        self.assertNotEqual(updated["ETag"], response["ETag"])
+
+    def test_book_write_invalidates_cache(self) -> None:
+        response = self.client.get(get_detail(self.book.id))
+
+        self.book.inventory = 3
+        self.book.save()
+
+        updated = self.client.get(
+            get_detail(self.book.id), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+
+        self.assertEqual(updated.status_code, status.HTTP_200_OK)
+        self.assertEqual(updated.data["inventory"], 3)
+        self.assertNotEqual(updated["ETag"], response["ETag"])
+
+
+class ExportBookAPITests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@test.com",
+            password="test"
+        )
+        self.books = [
+            sample_book(title=f"Title, {index}") for index in range(3)
+        ]
+
+    def export(self, **params) -> bytes:
+        response = self.client.get(BOOK_EXPORT_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_export_requires_admin(self) -> None:
+        response = self.client.get(BOOK_EXPORT_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="user@test.com", password="test"
+            )
+        )
+        response = self.client.get(BOOK_EXPORT_URL)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_ndjson(self) -> None:
+        self.client.force_authenticate(self.admin)
+
+        rows = [json.loads(line) for line in self.export().splitlines()]
+
+        self.assertEqual([row["id"] for row in rows], [
+            book.id for book in self.books
+        ])
+        self.assertEqual(rows[0]["title"], "Title, 0")
+        self.assertEqual(rows[0]["daily_fee"], "1.04")
+
+    def test_export_csv(self) -> None:
+        self.client.force_authenticate(self.admin)
+
+        rows = list(csv.reader(io.StringIO(self.export(export_format="csv"))))
+
+        self.assertEqual(rows[0], [
+            "id", "title", "author", "cover", "inventory", "daily_fee"
+        ])
+        self.assertEqual(rows[1][1], "Title, 0")
+        self.assertEqual(len(rows), 4)
+
+    def test_export_unknown_format(self) -> None:
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.get(BOOK_EXPORT_URL, {"export_format": "xml"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class BookQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        sample_book()
+
+    def add_books(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(5):
+                sample_book(title=f"Book {index}")
+
+    def test_list(self):
+        self.assertQueryCountIsConstant(BOOK_URL, self.add_books)
+
+    def test_keyset_list(self):
+        self.assertQueryCountIsConstant(
+            BOOK_URL, self.add_books, {"pagination": "keyset"}
+        )
+
+    def test_search(self):
+        # Load the search index so that only the page queries are compared
+        self.client.get(BOOK_URL, {"title": "Book"})
+
+        self.assertQueryCountIsConstant(
+            BOOK_URL, self.add_books, {"title": "Book"}
+        )
+
+    def test_retrieve(self):
+        book = sample_book()
+
+        self.assertWithinQueryBudget(self.client.get(get_detail(book.id)))
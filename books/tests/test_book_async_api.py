@@ -0,0 +1,84 @@
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from books.inventory import shard_inventory
+from books.tests.test_book_api import sample_book
+
+
+BOOK_URL = reverse("books:book-list")
+ASYNC_BOOK_URL = reverse("async:book-list")
+
+
+def get_async_detail(book_id: int) -> str:
+    return reverse("async:book-detail", args=[book_id])
+
+
+class AsyncBookAPITests(TestCase):
+    def setUp(self):
+        self.books = [
+            sample_book(title=f"Title {index}", author=f"Author {index}")
+            for index in range(7)
+        ]
+
+    def assertSameAsSync(self, async_url: str, sync_url: str, params=None):
+        response = self.client.get(async_url, params)
+        expected = self.client.get(sync_url, params)
+
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response["Content-Type"], "application/json")
+        # Pagination links point back at the view that was called.
+        self.assertEqual(
+            response.json(),
+            json.loads(
+                expected.content.decode().replace(sync_url, async_url)
+            ),
+        )
+
+    def test_list_matches_sync_view(self):
+        self.assertSameAsSync(ASYNC_BOOK_URL, BOOK_URL, {"offset": 5})
+
+    def test_search_matches_sync_view(self):
+        self.assertSameAsSync(ASYNC_BOOK_URL, BOOK_URL, {"title": "Title 3"})
+
+    def test_keyset_pages_match_sync_view(self):
+        params = {"pagination": "keyset", "limit": 3}
+        response = self.client.get(ASYNC_BOOK_URL, params).json()
+        expected = self.client.get(BOOK_URL, params).json()
+        self.assertEqual(response["results"], expected["results"])
+
+        next_page = self.client.get(response["next"]).json()
+        expected_next = self.client.get(expected["next"]).json()
+        self.assertEqual(next_page["results"], expected_next["results"])
+
+    def test_retrieve_matches_sync_view(self):
+        book = self.books[0]
+        shard_inventory(book, 4)
+
+        self.assertSameAsSync(
+            get_async_detail(book.id),
+            reverse("books:book-detail", args=[book.id]),
+        )
+
+    def test_retrieve_missing_book(self):
+        self.assertSameAsSync(
+            get_async_detail(0), reverse("books:book-detail", args=[0])
+        )
+
+    def test_invalid_token_is_rejected(self):
+        response = self.client.get(
+            ASYNC_BOOK_URL, HTTP_AUTHORIZE="Bearer broken"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()["code"], "token_not_valid")
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+
+    def test_write_methods_are_not_allowed(self):
+        response = self.client.post(ASYNC_BOOK_URL, {"title": "New"})
+
+        self.assertEqual(
+            response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
@@ -0,0 +1,195 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.models import Book
+from books.search import (
+    BookSearchIndex,
+    book_search_index,
+    bump_search_version,
+)
+
+
+BOOK_URL = reverse("books:book-list")
+
+
+def sample_book(**additional) -> Book:
+    defaults = {
+        "title": "Book title",
+        "author": "Author Sample",
+        "cover": "SOFT",
+        "inventory": 10,
+        "daily_fee": Decimal("1.04")
+    }
+    defaults.update(additional)
+
+    return Book.objects.create(**defaults)
+
+
+class BookSearchIndexTests(TestCase):
+    def setUp(self) -> None:
+        self.index = BookSearchIndex()
+        self.first = sample_book(title="Study Eat Window", author="Harvey")
+        self.second = sample_book(title="Card Ask Away", author="Dawson")
+
+    def test_search_by_substring(self) -> None:
+        self.assertEqual(self.index.search("title", "eat win"), {
+            self.first.id
+        })
+        self.assertEqual(self.index.search("author", "AWS"), {
+            self.second.id
+        })
+        self.assertEqual(self.index.search("title", "missing"), set())
+
+    def test_search_short_query(self) -> None:
+        self.assertEqual(
+            self.index.search("title", "a"),
+            {self.first.id, self.second.id}
+        )
+
+    def test_update_and_remove(self) -> None:
+        self.index.build()
+
+        self.index.update(
+            self.first.id, {"title": "Renamed", "author": "Harvey"}
+        )
+        self.index.remove(self.second.id)
+
+        self.assertEqual(self.index.search("title", "window"), set())
+        self.assertEqual(self.index.search("title", "renamed"), {
+            self.first.id
+        })
+        self.assertEqual(self.index.search("title", "away"), set())
+
+    def test_bulk_created_books_trigger_rebuild(self) -> None:
+        self.index.build()
+        created = Book.objects.bulk_create([
+            Book(
+                title="Window Seat",
+                author="Bulk",
+                cover="SOFT",
+                inventory=1,
+                daily_fee=Decimal("1.00"),
+            )
+        ])[0]
+
+        self.assertEqual(
+            self.index.search("title", "window"),
+            {self.first.id, created.id}
+        )
+
+    def test_version_bump_from_other_process_triggers_rebuild(self) -> None:
+        self.index.build()
+        Book.objects.filter(pk=self.second.pk).update(title="Bay Window")
+        bump_search_version()
+
+        self.assertEqual(
+            self.index.search("title", "window"),
+            {self.first.id, self.second.id}
+        )
+
+    def test_stale_index_is_skipped_while_rebuilding(self) -> None:
+        self.index.build()
+        bump_search_version()
+        self.index._building = True
+
+        self.assertIsNone(self.index.search("title", "window"))
+
+
+class BookSearchSignalsTests(TestCase):
+    def setUp(self) -> None:
+        book_search_index.reset()
+        self.client = APIClient()
+        self.book = sample_book(title="Still Reflect Involve")
+
+    def test_index_follows_book_changes(self) -> None:
+        self.assertEqual(
+            book_search_index.search("title", "reflect"), {self.book.id}
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.title = "Free Window"
+            self.book.save()
+            created = sample_book(title="Reflect Again")
+
+        self.assertEqual(
+            book_search_index.search("title", "reflect"), {created.id}
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created.delete()
+
+        self.assertEqual(book_search_index.search("title", "reflect"), set())
+
+    def test_own_changes_keep_index_fresh(self) -> None:
+        book_search_index.build()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.title = "Reflect Anew"
+            self.book.save()
+
+        self.assertTrue(book_search_index.is_fresh())
+        self.assertEqual(
+            book_search_index.search("title", "anew"), {self.book.id}
+        )
+
+    def test_filter_scans_table_while_index_is_stale(self) -> None:
+        book_search_index.build()
+        Book.objects.filter(pk=self.book.pk).update(title="Quiet Garden")
+        bump_search_version()
+        book_search_index._building = True
+
+        try:
+            response = self.client.get(BOOK_URL, {"title": "garden"})
+        finally:
+            book_search_index._building = False
+
+        self.assertEqual(
+            [book["id"] for book in response.data["results"]],
+            [self.book.id]
+        )
+
+    def test_filter_uses_index(self) -> None:
+        sample_book(title="Other")
+
+        response = self.client.get(BOOK_URL, {"title": "REFLECT"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [book["id"] for book in response.data["results"]],
+            [self.book.id]
+        )
+
+    @override_settings(BOOK_SEARCH_INDEX=False)
+    def test_filter_without_index(self) -> None:
+        response = self.client.get(BOOK_URL, {"title": "reflect"})
+
+        self.assertEqual(len(response.data["results"]), 1)
+
+
+class BookSearchRollbackTests(TransactionTestCase):
+    def setUp(self) -> None:
+        book_search_index.reset()
+        self.client = APIClient()
+        self.book = sample_book(title="Alpha Centauri")
+
+    def test_rolled_back_change_leaves_index_untouched(self) -> None:
+        book_search_index.build()
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.book.title = "Zeta"
+                self.book.save()
+                raise RuntimeError
+
+        self.assertTrue(book_search_index.is_fresh())
+        response = self.client.get(BOOK_URL, {"title": "Alpha"})
+
+        self.assertEqual(
+            [book["id"] for book in response.data["results"]],
+            [self.book.id]
+        )
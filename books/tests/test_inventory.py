@@ -0,0 +1,140 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.inventory import (
+    annotate_current_inventory,
+    get_inventory,
+    release_book,
+    reserve_book,
+    shard_inventory,
+)
+from books.models import Book, BookInventoryShard
+from books.serializers import BookSerializer
+
+
+def sample_book(**additional) -> Book:
+    defaults = {
+        "title": "Book title",
+        "author": "Author Sample",
+        "cover": "SOFT",
+        "inventory": 10,
+        "daily_fee": Decimal("1.04")
+    }
+    defaults.update(additional)
+
+    return Book.objects.create(**defaults)
+
+
+class ShardedInventoryTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.book = sample_book(inventory=10)
+        shard_inventory(self.book, 4)
+        self.book.refresh_from_db()
+
+    def test_inventory_is_spread_over_shards(self) -> None:
+        counts = list(
+            BookInventoryShard.objects.filter(book=self.book)
+            .order_by("shard")
+            .values_list("count", flat=True)
+        )
+
+        self.assertEqual(self.book.inventory_shards, 4)
+        self.assertEqual(counts, [3, 3, 2, 2])
+        self.assertEqual(get_inventory(self.book), 10)
+
+    def test_reserve_until_exhausted(self) -> None:
+        for _ in range(10):
+            self.assertTrue(reserve_book(self.book))
+
+        self.assertFalse(reserve_book(self.book))
+        self.assertEqual(get_inventory(self.book), 0)
+
+        release_book(self.book)
+
+        self.assertEqual(get_inventory(self.book), 1)
+
+    def test_serializer_reads_and_writes_shards(self) -> None:
+        reserve_book(self.book)
+
+        self.assertEqual(BookSerializer(self.book).data["inventory"], 9)
+
+        serializer = BookSerializer(
+            self.book, data={"inventory": 20}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(get_inventory(self.book), 20)
+        self.assertEqual(
+            BookInventoryShard.objects.filter(book=self.book).count(), 4
+        )
+
+    def test_unshard_restores_column(self) -> None:
+        reserve_book(self.book)
+
+        call_command(
+            "shard_inventory", self.book.id, "--shards", "0", stdout=StringIO()
+        )
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory_shards, 0)
+        self.assertEqual(self.book.inventory, 9)
+        self.assertFalse(
+            BookInventoryShard.objects.filter(book=self.book).exists()
+        )
+
+    def test_serializer_uses_annotated_totals(self) -> None:
+        for _ in range(3):
+            shard_inventory(sample_book(inventory=5), 2)
+        books = annotate_current_inventory(Book.objects.order_by("id"))
+
+        with self.assertNumQueries(1):
+            data = BookSerializer(books, many=True).data
+
+        self.assertEqual(
+            [book["inventory"] for book in data], [10, 5, 5, 5]
+        )
+
+    def test_reserve_with_book_read_before_sharding(self) -> None:
+        book = sample_book(inventory=3)
+        stale = Book.objects.get(pk=book.pk)
+        shard_inventory(book, 2)
+
+        self.assertTrue(reserve_book(stale))
+
+        self.assertEqual(stale.inventory_shards, 2)
+        self.assertEqual(get_inventory(stale), 2)
+        self.assertEqual(Book.objects.get(pk=book.pk).inventory, 3)
+
+    def test_release_with_book_read_before_unsharding(self) -> None:
+        stale = Book.objects.get(pk=self.book.pk)
+        shard_inventory(self.book, 0)
+
+        release_book(stale)
+
+        self.assertEqual(stale.inventory_shards, 0)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 11)
+
+    def test_book_detail_reports_shard_total(self) -> None:
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                email="admin@test.com", password="test"
+            )
+        )
+
+        response = client.get(
+            reverse("books:book-detail", args=[self.book.id])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["inventory"], 10)
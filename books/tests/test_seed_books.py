@@ -0,0 +1,89 @@
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from books.fixtures import iter_json_array
+from books.models import Book, FixtureChecksum
+
+
+def fixture_item(pk: int, **fields) -> dict:
+    defaults = {
+        "title": f"Book {pk}",
+        "author": "Author Sample",
+        "cover": "HARD",
+        "inventory": 10,
+        "daily_fee": "1.12",
+    }
+    defaults.update(fields)
+
+    return {"model": "books.book", "pk": pk, "fields": defaults}
+
+
+class IterJsonArrayTests(TestCase):
+    def test_objects_are_streamed_across_chunks(self) -> None:
+        items = [fixture_item(pk) for pk in range(1, 30)]
+        stream = io.StringIO(json.dumps(items, indent=2))
+
+        self.assertEqual(list(iter_json_array(stream, chunk_size=7)), items)
+
+    def test_invalid_fixture(self) -> None:
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('{"pk": 1}')))
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"pk": 1}, {"pk"')))
+
+
+class SeedBooksCommandTests(TestCase):
+    def setUp(self) -> None:
+        descriptor, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(descriptor)
+        self.write_fixture([fixture_item(1), fixture_item(2)])
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+
+    def write_fixture(self, items: list[dict]) -> None:
+        with open(self.path, "w", encoding="utf-8") as fixture:
+            json.dump(items, fixture)
+
+    def seed(self, *args) -> str:
+        output = io.StringIO()
+        call_command("seed_books", self.path, *args, stdout=output)
+        return output.getvalue()
+
+    def test_seed_creates_books(self) -> None:
+        self.seed("--batch-size", "1")
+
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertEqual(Book.objects.get(pk=2).daily_fee, Decimal("1.12"))
+        self.assertEqual(FixtureChecksum.objects.count(), 1)
+
+    def test_unchanged_fixture_is_skipped(self) -> None:
+        self.seed()
+        Book.objects.filter(pk=1).update(title="Changed locally")
+
+        with self.assertNumQueries(1):
+            output = self.seed()
+
+        self.assertIn("up to date", output)
+        self.assertEqual(Book.objects.get(pk=1).title, "Changed locally")
+
+    def test_changed_fixture_is_upserted(self) -> None:
+        self.seed()
+        self.write_fixture([
+            fixture_item(1, title="New title", inventory=3),
+            fixture_item(3),
+        ])
+
+        self.seed()
+
+        self.assertEqual(Book.objects.count(), 3)
+        book = Book.objects.get(pk=1)
+        self.assertEqual(book.title, "New title")
+        self.assertEqual(book.inventory, 3)
@@ -1,8 +1,21 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
 from rest_framework.serializers import ModelSerializer
 
+from books.cache import CATALOG_VERSION_KEY, get_book_version
+from books.export import (
+    EXPORT_CONTENT_TYPES,
+    EXPORT_WRITERS,
+    iter_book_rows,
+)
 from books.filters import CustomBookSearchFilter
+from books.inventory import annotate_current_inventory
 from books.models import Book
 from books.permissions import IsAdminOrReadOnly
 from books.serializers import (
@@ -10,13 +23,47 @@ from books.serializers import (
     BookListSerializer,
     BookRetrieveSerializer,
 )
+from common.cache import VersionedResponseCacheMixin
+from common.query_budget import QueryBudgetMixin
+from library_api.paginations import SelectablePaginationMixin
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(
+    QueryBudgetMixin,
+    VersionedResponseCacheMixin,
+    SelectablePaginationMixin,
+    viewsets.ModelViewSet
+):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (CustomBookSearchFilter,)
+    keyset_ordering = ("title", "id")
+    cache_prefix = "books"
+    cache_timeout = settings.CATALOG_CACHE_TIMEOUT
+    cache_version_key = CATALOG_VERSION_KEY
+    # The first search also loads the in-memory index.
+    query_budgets = {"list": 3, "retrieve": 1}
+
+    def get_cache_version(self) -> str:
+        version = super().get_cache_version()
+
+        if self.action == "retrieve":
+            # Only details show the inventory, borrows and returns bump
+            # the version of that one book.
+            book_id = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            return f"{version}.{get_book_version(book_id)}"
+
+        return version
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if self.action != "list":
+            # Sharded books sum their counters in the same query.
+            queryset = annotate_current_inventory(queryset)
+
+        return queryset
 
     def get_serializer_class(self) -> ModelSerializer:
         serializer = super().get_serializer_class()
@@ -43,8 +90,50 @@ class BookViewSet(viewsets.ModelViewSet):
                 description="Find book with this author",
                 enum=["peter", "Ma"]
             ),
+            OpenApiParameter(
+                name="pagination",
+                type=str,
+                description="Pagination mode, keyset returns opaque cursors",
+                enum=["offset", "keyset"]
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
         """List of books with pagination and searching"""
         return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="export_format",
+                type=str,
+                description="Format of the exported catalog",
+                enum=["ndjson", "csv"]
+            ),
+        ]
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="export",
+        url_name="export",
+        permission_classes=(IsAdminUser,),
+    )
+    def export(self, request: Request) -> StreamingHttpResponse:
+        """Stream the whole catalog as NDJSON or CSV (admin only)"""
+        export_format = request.query_params.get("export_format", "ndjson")
+
+        if export_format not in EXPORT_WRITERS:
+            return Response(
+                {"detail": f"Unsupported export format '{export_format}'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(
+            EXPORT_WRITERS[export_format](iter_book_rows()),
+            content_type=EXPORT_CONTENT_TYPES[export_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="books.{export_format}"'
+        )
+        return response
@@ -1,5 +1,11 @@
 from django.contrib import admin
 
-from borrowings.models import Borrowing
+from borrowings.models import Borrowing, BorrowingOutbox
 
-admin.site.register(Borrowing)
+
+@admin.register(Borrowing)
+class BorrowingAdmin(admin.ModelAdmin):
+    list_select_related = ("user", "book")
+
+
+admin.site.register(BorrowingOutbox)
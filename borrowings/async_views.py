@@ -0,0 +1,27 @@
+from borrowings.serializers import (
+    BorrowingListAdminSerializer,
+    BorrowingListSerializer,
+)
+from borrowings.views import BorrowingViewSet, filter_borrowings
+from common.async_views import async_read_view, json_response
+from library_api.paginations import get_paginator
+
+
+@async_read_view()
+async def borrowing_list(request):
+    """Async twin of ``BorrowingViewSet.list``"""
+    queryset = filter_borrowings(
+        BorrowingViewSet.queryset.prefetch_related("payments"), request
+    )
+    serializer_class = BorrowingListSerializer
+    if request.user.is_staff:
+        serializer_class = BorrowingListAdminSerializer
+
+    paginator = get_paginator(request, BorrowingViewSet.keyset_ordering)
+    page = await paginator.apaginate_queryset(queryset, request)
+    serializer = serializer_class(
+        page, many=True, context={"request": request}
+    )
+
+    response = paginator.get_paginated_response(serializer.data)
+    return json_response(response.data)
@@ -0,0 +1,22 @@
+from django.db.models import QuerySet
+
+from common.cache import get_version, invalidate_version
+
+
+USER_BORROWINGS_VERSION_KEY = "borrowings:user:{}:version"
+
+
+def get_user_borrowings_version(user_id: int) -> int:
+    return get_version(USER_BORROWINGS_VERSION_KEY.format(user_id))
+
+
+def invalidate_user_borrowings(user_ids) -> None:
+    for user_id in set(user_ids):
+        invalidate_version(USER_BORROWINGS_VERSION_KEY.format(user_id))
+
+
+def invalidate_payment_owners(payments: QuerySet) -> None:
+    """Invalidate the borrowings of the users these payments belong to"""
+    invalidate_user_borrowings(
+        payments.values_list("borrowing__user_id", flat=True)
+    )
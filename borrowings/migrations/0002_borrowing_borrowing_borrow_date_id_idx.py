@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['borrow_date', 'id'], name='borrowing_borrow_date_id_idx'),
+        ),
+    ]
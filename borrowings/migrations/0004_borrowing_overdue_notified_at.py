@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowings', '0003_borrowingoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowing',
+            name='overdue_notified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
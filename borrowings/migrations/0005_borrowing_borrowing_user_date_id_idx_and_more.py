@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-18 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowings', '0004_borrowing_overdue_notified_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['user', '-borrow_date', '-id'], name='borrowing_user_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('actual_return_date__isnull', True)), fields=['user', '-borrow_date', '-id'], name='borrowing_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('actual_return_date__isnull', True)), fields=['expected_return_date', 'id'], name='borrowing_active_due_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.2 on 2026-10-18 05:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_inventory_shards_bookinventoryshard'),
+        ('borrowings', '0006_alter_borrowing_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('actual_return_date__isnull', True), ('overdue_notified_at__isnull', True)), fields=['expected_return_date', 'id'], name='borrowing_overdue_new_idx'),
+        ),
+    ]
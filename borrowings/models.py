@@ -5,15 +5,20 @@ from datetime import date
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from books.models import Book
 from borrowings.validation import validate_borrowing
 
 
 class Borrowing(models.Model):
+    # Lookups by user, including cascades, use borrowing_user_date_id_idx,
+    # which starts with this column.
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="borrowings",
+        db_index=False,
     )
     book = models.ForeignKey(
         Book,
@@ -23,6 +28,37 @@ class Borrowing(models.Model):
     borrow_date = models.DateField(auto_now_add=True)
     expected_return_date = models.DateField()
     actual_return_date = models.DateField(null=True, blank=True)
+    overdue_notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["borrow_date", "id"],
+                name="borrowing_borrow_date_id_idx"
+            ),
+            models.Index(
+                fields=["user", "-borrow_date", "-id"],
+                name="borrowing_user_date_id_idx"
+            ),
+            models.Index(
+                fields=["user", "-borrow_date", "-id"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_user_active_idx"
+            ),
+            models.Index(
+                fields=["expected_return_date", "id"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_active_due_idx"
+            ),
+            models.Index(
+                fields=["expected_return_date", "id"],
+                condition=models.Q(
+                    actual_return_date__isnull=True,
+                    overdue_notified_at__isnull=True,
+                ),
+                name="borrowing_overdue_new_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user.email} borrowed {self.book.title}"
@@ -53,3 +89,46 @@ class Borrowing(models.Model):
     def save(self, *args, **kwargs) -> None:
         self.full_clean()
         return super().save(*args, **kwargs)
+
+
+class BorrowingOutbox(models.Model):
+    """Pending side effect of a borrowing, delivered by a Celery relay"""
+
+    class KindChoices(models.TextChoices):
+        PAYMENT = "PAYMENT", _("Payment")
+        NOTIFICATION = "NOTIFY", _("Notification")
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "PENDING", _("Pending")
+        DONE = "DONE", _("Done")
+        FAILED = "FAILED", _("Failed")
+
+    borrowing = models.ForeignKey(
+        Borrowing,
+        on_delete=models.CASCADE,
+        related_name="outbox_messages"
+    )
+    kind = models.CharField(max_length=7, choices=KindChoices.choices)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=7,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["available_at", "id"],
+                condition=models.Q(status="PENDING"),
+                name="outbox_pending_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} for borrowing {self.borrowing_id} - {self.status}"
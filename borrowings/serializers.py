@@ -1,11 +1,10 @@
 import datetime
 
 from django.db import transaction
-from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from books.models import Book
+from books.inventory import reserve_book
 from borrowings.validation import validate_borrowing
 from payments.serializers import (
     PaymentReadListSerializer,
@@ -55,16 +54,11 @@ class BorrowingSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data) -> Borrowing:
-        book_data = validated_data.pop("book")
-        book = get_object_or_404(Book, id=book_data.id)
-        if book.inventory < 1:
-            raise ValidationError("The following book is not available")
         with transaction.atomic():
-            borrowing = Borrowing.objects.create(
-                **validated_data, book=book
-            )
-            book.inventory -= 1
-            book.save()
+            if not reserve_book(validated_data["book"]):
+                raise ValidationError("The following book is not available")
+
+            borrowing = Borrowing.objects.create(**validated_data)
         return borrowing
 
     class Meta:
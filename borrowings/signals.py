@@ -1,18 +1,16 @@
-import os
-import asyncio
 from typing import Type
 
-import httpx
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Model
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from dotenv import load_dotenv
 
-from borrowings.models import Borrowing
-from payments.utils import create_payment_with_session
-
-
-load_dotenv()
+from borrowings.cache import invalidate_user_borrowings
+from borrowings.models import Borrowing, BorrowingOutbox
+from borrowings.tasks import relay_borrowing_outbox
+from payments.models import Payment
+from payments.utils import create_payment
 
 
 @receiver(post_save, sender=Borrowing)
@@ -23,8 +21,6 @@ def borrowing_created(
     **kwargs
 ) -> None:
     if created:
-        create_payment_with_session(instance)
-
         borrowing_data = {
             "user_email": instance.user.email,
             "book_title": instance.book.title,
@@ -32,12 +28,54 @@ def borrowing_created(
             "expected_return_date": str(instance.expected_return_date)
         }
 
-        async def send_notification():
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    f"http://{os.getenv('TELEGRAM_BOT_HOST')}:"
-                    f"{os.getenv('TELEGRAM_BOT_PORT')}/notify/",
-                    json=borrowing_data
+        messages = [
+            BorrowingOutbox(
+                borrowing=instance,
+                kind=BorrowingOutbox.KindChoices.NOTIFICATION,
+                payload=borrowing_data,
+            ),
+        ]
+
+        if settings.STRIPE_LAZY_CHECKOUT:
+            create_payment(instance)
+        else:
+            messages.append(
+                BorrowingOutbox(
+                    borrowing=instance,
+                    kind=BorrowingOutbox.KindChoices.PAYMENT,
+                    payload={"borrowing_type": "Payment"},
                 )
+            )
+
+        BorrowingOutbox.objects.bulk_create(messages)
+
+        transaction.on_commit(relay_borrowing_outbox.delay, robust=True)
+
+
+@receiver(post_save, sender=Borrowing)
+@receiver(post_delete, sender=Borrowing)
+def borrowing_changed(
+    sender: Type[Model],
+    instance: Borrowing,
+    **kwargs
+) -> None:
+    invalidate_user_borrowings([instance.user_id])
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def payment_changed(
+    sender: Type[Model],
+    instance: Payment,
+    **kwargs
+) -> None:
+    if Payment.borrowing.is_cached(instance):
+        user_ids = [instance.borrowing.user_id]
+    else:
+        # After a cascade delete the borrowing is gone, its own signal
+        # has invalidated the list already.
+        user_ids = Borrowing.objects.filter(
+            pk=instance.borrowing_id
+        ).values_list("user_id", flat=True)
 
-        asyncio.run(send_notification())
+    invalidate_user_borrowings(user_ids)
@@ -1,42 +1,226 @@
-import asyncio
-import os
-from datetime import date
+from datetime import date, timedelta
+from typing import Iterable, Iterator
 
-import httpx
 from celery import shared_task
-from dotenv import load_dotenv
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
-from borrowings.models import Borrowing
+from borrowings.models import Borrowing, BorrowingOutbox
+from common.notifications import send_bot_message
+from payments.utils import create_payment_with_session
 
 
-load_dotenv()
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_DELAY = timedelta(seconds=10)
+OUTBOX_MAX_RETRY_DELAY = timedelta(hours=1)
+OUTBOX_LEASE = timedelta(minutes=5)
+
+OVERDUE_CHUNK_SIZE = 2000
+# Leaves headroom under Telegram's 4096 character limit per message.
+OVERDUE_PAGE_SIZE = 4000
+
+
+def deliver_outbox_message(message: BorrowingOutbox) -> None:
+    if message.kind == BorrowingOutbox.KindChoices.PAYMENT:
+        create_payment_with_session(
+            message.borrowing,
+            borrowing_type=message.payload["borrowing_type"]
+        )
+    elif message.kind == BorrowingOutbox.KindChoices.NOTIFICATION:
+        send_bot_message("notify", message.payload)
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    return min(
+        OUTBOX_RETRY_DELAY * 2 ** (attempts - 1), OUTBOX_MAX_RETRY_DELAY
+    )
+
+
+def claim_outbox_batch(batch_size: int) -> list[BorrowingOutbox]:
+    """Lease due messages to this worker for ``OUTBOX_LEASE``.
+
+    The lease is committed before anything is delivered, so no lock is held
+    during external calls. Messages of a worker that died mid-delivery are
+    due again once their lease runs out.
+    """
+    with transaction.atomic():
+        messages = list(
+            BorrowingOutbox.objects.select_for_update(
+                skip_locked=True, of=("self",)
+            )
+            .select_related("borrowing__book", "borrowing__user")
+            .filter(
+                status=BorrowingOutbox.StatusChoices.PENDING,
+                available_at__lte=timezone.now(),
+            )
+            .order_by("available_at", "id")[:batch_size]
+        )
+        leased_until = timezone.now() + OUTBOX_LEASE
+        BorrowingOutbox.objects.filter(
+            pk__in=[message.pk for message in messages]
+        ).update(available_at=leased_until)
+
+    for message in messages:
+        message.available_at = leased_until
+
+    return messages
+
+
+def record_outbox_result(message: BorrowingOutbox, **fields) -> None:
+    # Matching the lease skips the write if it expired and another worker
+    # took the message over.
+    BorrowingOutbox.objects.filter(
+        pk=message.pk,
+        status=BorrowingOutbox.StatusChoices.PENDING,
+        available_at=message.available_at,
+    ).update(**fields)
+
+
+def relay_outbox_message(message: BorrowingOutbox) -> None:
+    try:
+        with transaction.atomic():
+            deliver_outbox_message(message)
+            record_outbox_result(
+                message,
+                status=BorrowingOutbox.StatusChoices.DONE,
+                processed_at=timezone.now(),
+            )
+    except Exception as error:
+        attempts = message.attempts + 1
+        fields = {
+            "attempts": attempts,
+            "last_error": repr(error),
+            "available_at": timezone.now() + get_retry_delay(attempts),
+        }
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            fields["status"] = BorrowingOutbox.StatusChoices.FAILED
+
+        record_outbox_result(message, **fields)
+
+
+def relay_outbox_batch(batch_size: int) -> int:
+    messages = claim_outbox_batch(batch_size)
+
+    for message in messages:
+        relay_outbox_message(message)
+
+    return len(messages)
+
+
+@shared_task
+def relay_borrowing_outbox(batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Deliver pending borrowing side effects (Stripe session, bot message)"""
+    relayed = 0
+
+    while True:
+        batch = relay_outbox_batch(batch_size)
+        relayed += batch
+
+        if batch < batch_size:
+            return relayed
+
+
+def format_overdue_borrowing(
+    email: str, title: str, borrow_date: date, expected_return_date: date
+) -> str:
+    return (
+        f"User: {email} has an overdue book!\n"
+        f"Book Title: {title}\n"
+        f"Borrow Date: {borrow_date}\n"
+        f"Expected Return Date: {expected_return_date}\n"
+    )
+
+
+def paginate_messages(
+    entries: Iterable[tuple[int, str]], limit: int = OVERDUE_PAGE_SIZE
+) -> Iterator[tuple[str, list[int]]]:
+    """Join ``(borrowing_id, message)`` pairs into pages of at most
+    ``limit`` characters, yielding each page with its borrowing ids"""
+    page = ""
+    ids = []
+
+    for borrowing_id, message in entries:
+        if page and len(page) + len(message) + 1 > limit:
+            yield page, ids
+            page = ""
+            ids = []
+
+        page = f"{page}\n{message}" if page else message
+        ids.append(borrowing_id)
+
+    if page:
+        yield page, ids
+
+
+def send_overdue_summary(count: int) -> None:
+    send_bot_message(
+        "overdue",
+        {"message": f"{count} borrowings reported earlier are still overdue."}
+    )
 
 
 @shared_task
-def check_overdue_borrowings() -> None:
+def check_overdue_borrowings(
+    chunk_size: int = OVERDUE_CHUNK_SIZE, incremental: bool = None
+) -> int:
+    """Send a digest of overdue borrowings, page by page.
+
+    In incremental mode only borrowings that were not reported yet are
+    listed, the rest are summed up in a single count.
+    """
+    if incremental is None:
+        incremental = settings.OVERDUE_INCREMENTAL
+    started_at = timezone.now()
+
     overdue_borrowings = Borrowing.objects.filter(
         expected_return_date__lte=date.today(),
         actual_return_date__isnull=True
     )
+    new_borrowings = overdue_borrowings
+    if incremental:
+        new_borrowings = new_borrowings.filter(
+            overdue_notified_at__isnull=True
+        )
 
-    message = ""
-    if overdue_borrowings.exists():
-        for borrowing in overdue_borrowings:
-            message = (
-                f"User: {borrowing.user.email} has an overdue book!\n"
-                f"Book Title: {borrowing.book.title}\n"
-                f"Borrow Date: {borrowing.borrow_date}\n"
-                f"Expected Return Date: {borrowing.expected_return_date}\n"
-            )
-    else:
-        message = "There are no borrowings overdue today!"
-
-    async def send_overdue():
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                f"http://{os.getenv('TELEGRAM_BOT_HOST')}:"
-                f"{os.getenv('TELEGRAM_BOT_PORT')}/overdue/",
-                json={"message": message}
+    rows = (
+        new_borrowings.order_by("expected_return_date", "id")
+        .values_list(
+            "id",
+            "user__email",
+            "book__title",
+            "borrow_date",
+            "expected_return_date",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    entries = (
+        (borrowing_id, format_overdue_borrowing(*fields))
+        for borrowing_id, *fields in rows
+    )
+
+    pages = 0
+    for page, ids in paginate_messages(entries):
+        send_bot_message("overdue", {"message": page})
+        pages += 1
+
+        if incremental:
+            Borrowing.objects.filter(pk__in=ids).update(
+                overdue_notified_at=started_at
             )
 
-    asyncio.run(send_overdue())
+    reported_earlier = 0
+    if incremental:
+        reported_earlier = overdue_borrowings.filter(
+            overdue_notified_at__lt=started_at
+        ).count()
+
+    if reported_earlier:
+        send_overdue_summary(reported_earlier)
+    elif not pages:
+        send_bot_message(
+            "overdue", {"message": "There are no borrowings overdue today!"}
+        )
+
+    return pages
@@ -1,18 +1,31 @@
 import os
 from datetime import date, timedelta
 from decimal import Decimal
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from django.core.exceptions import ValidationError
 from rest_framework.test import APIClient
 
+from books.inventory import reserve_book
 from books.models import Book
-from borrowings.models import Borrowing
+from borrowings.cache import invalidate_user_borrowings
+from borrowings.models import Borrowing, BorrowingOutbox
+from borrowings.tasks import (
+    check_overdue_borrowings,
+    claim_outbox_batch,
+    paginate_messages,
+    relay_borrowing_outbox,
+    relay_outbox_message,
+)
+from common.testing import QueryBudgetTestMixin, jwt_headers
 from payments.models import Payment
+from payments.views import handle_successful_payment
 
 
 BORROWINGS_URL = reverse("borrowings:borrowings-list")
@@ -46,7 +59,7 @@ def sample_book(**additional) -> Book:
 
 
 @patch("stripe.checkout.Session.create")
-@patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+@patch("httpx.Client.post")
 def sample_borrowing(
     mocked_notify,
     mock_create_session,
@@ -64,7 +77,10 @@ def sample_borrowing(
     }
     defaults.update(additional)
 
-    return Borrowing.objects.create(**defaults)
+    borrowing = Borrowing.objects.create(**defaults)
+    relay_borrowing_outbox()
+
+    return borrowing
 
 
 class SessionStripe:
@@ -90,7 +106,7 @@ class BorrowingTests(TestCase):
         self.borrowing = sample_borrowing(user=self.user, book=self.book)
 
     @patch("stripe.checkout.Session.create")
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def test_create_borrowing(self, mocked_notify, mock_create_session):
         data = {
             "book": self.book.id,
@@ -106,21 +122,21 @@ class BorrowingTests(TestCase):
         self.assertEqual(Borrowing.objects.count(), 2)
         self.assertEqual(Borrowing.objects.first().user, self.user)
 
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def test_list_borrowings(self, mocked_notify):
 
         response = self.client.get(BORROWINGS_URL)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data["results"]), 1)
 
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def test_borrowing_detail(self, mocked_notify):
 
         response = self.client.get(get_detail(self.borrowing.id))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["id"], self.borrowing.id)
 
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def test_return_borrowing(self, mocked_notify):
         borrowing = sample_borrowing(
             user=self.user,
@@ -139,7 +155,7 @@ class BorrowingTests(TestCase):
         self.assertEqual(borrowing.actual_return_date, date.today())
 
     @patch("stripe.checkout.Session.create")
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def test_inventory_decrease_on_borrow(
         self, mocked_notify, mock_create_session
     ):
@@ -163,6 +179,35 @@ class BorrowingTests(TestCase):
         self.assertEqual(self.book.inventory, initial_inventory - 1)
 
 
+    def test_borrow_unavailable_book(self):
+        book = sample_book(inventory=0)
+
+        response = self.client.post(
+            BORROWINGS_URL,
+            {
+                "book": book.id,
+                "expected_return_date": (
+                    date.today() + timedelta(days=7)
+                ).isoformat(),
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Borrowing.objects.filter(book=book).exists())
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 0)
+
+    def test_reserve_book_is_conditional(self):
+        book = sample_book(inventory=1)
+
+        self.assertTrue(reserve_book(book))
+        self.assertFalse(reserve_book(book))
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 0)
+
+
 class UnAuthenticatedBorrowingTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -173,7 +218,7 @@ class UnAuthenticatedBorrowingTests(TestCase):
 
 
 class AuthenticatedBorrowingTests(TestCase):
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def setUp(self, mocked_notify):
         self.user = sample_user(email="test@test.com", password="password")
         self.user_2 = sample_user(email="test1@test1.com", password="password")
@@ -204,7 +249,7 @@ class AuthenticatedBorrowingTests(TestCase):
         self.assertIsNone(response.data.get("user"))
 
     @patch("stripe.checkout.Session.create")
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def test_create_user_borrowings_and_notification_send(
         self, mocked_notify, mock_create_session
     ):
@@ -219,6 +264,7 @@ class AuthenticatedBorrowingTests(TestCase):
         response = self.client.post(
             BORROWINGS_URL, data=payload, format="json"
         )
+        relay_borrowing_outbox()
 
         borrowing = Borrowing.objects.get(pk=response.data["id"])
 
@@ -243,7 +289,7 @@ class AuthenticatedBorrowingTests(TestCase):
 
 
 class AdminBorrowingTests(TestCase):
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def setUp(self, mocked_notify):
         self.user = get_user_model().objects.create_superuser(
             email="test@test.com", password="password"
@@ -268,7 +314,7 @@ class AdminBorrowingTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def test_list_filter_is_active_borrowings(self, mocked_notify):
         sample_borrowing(
             user=self.user_2,
@@ -291,6 +337,28 @@ class AdminBorrowingTests(TestCase):
             Borrowing.objects.filter(user_id=self.user_2.id).count(),
         )
 
+    def test_list_keyset_pagination(self):
+        response = self.client.get(
+            BORROWINGS_URL, {"pagination": "keyset", "limit": 1}
+        )
+        next_response = self.client.get(response.data["next"])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertEqual(
+            [
+                item["id"]
+                for item in response.data["results"]
+                + next_response.data["results"]
+            ],
+            list(
+                Borrowing.objects.order_by(
+                    "-borrow_date", "-id"
+                ).values_list("id", flat=True)
+            ),
+        )
+        self.assertIsNone(next_response.data["next"])
+
 
 class ReturnBorrowingsTest(TestCase):
     def setUp(self):
@@ -352,3 +420,411 @@ class ReturnBorrowingsTest(TestCase):
 
         with self.assertRaises(ValidationError):
             self.client.post(get_return_url(borrowing.id))
+
+
+class BorrowingOutboxTests(TestCase):
+    def setUp(self):
+        self.user = sample_user(email="test@test.com", password="password")
+        self.book = sample_book()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_borrowing(self):
+        response = self.client.post(
+            BORROWINGS_URL,
+            {
+                "book": self.book.id,
+                "expected_return_date": (
+                    date.today() + timedelta(days=7)
+                ).isoformat(),
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Borrowing.objects.get(pk=response.data["id"])
+
+    @patch("stripe.checkout.Session.create")
+    @patch("httpx.Client.post")
+    def test_side_effects_are_deferred_to_outbox(
+        self, mocked_notify, mock_create_session
+    ):
+        borrowing = self.create_borrowing()
+
+        mock_create_session.assert_not_called()
+        mocked_notify.assert_not_called()
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(
+            set(borrowing.outbox_messages.values_list("kind", flat=True)),
+            {
+                BorrowingOutbox.KindChoices.PAYMENT,
+                BorrowingOutbox.KindChoices.NOTIFICATION,
+            },
+        )
+
+        mock_create_session.return_value = SessionStripe(
+            id="fake_session_id", url="https://fake-stripe-url.com"
+        )
+        self.assertEqual(relay_borrowing_outbox(), 2)
+
+        self.assertEqual(borrowing.payments.count(), 1)
+        mocked_notify.assert_called_once()
+        self.assertFalse(
+            BorrowingOutbox.objects.exclude(
+                status=BorrowingOutbox.StatusChoices.DONE
+            ).exists()
+        )
+        self.assertEqual(relay_borrowing_outbox(), 0)
+
+    @patch("stripe.checkout.Session.create")
+    @patch("httpx.Client.post")
+    def test_failed_delivery_is_retried_later(
+        self, mocked_notify, mock_create_session
+    ):
+        borrowing = self.create_borrowing()
+        mock_create_session.side_effect = Exception("Stripe is down")
+
+        relay_borrowing_outbox()
+
+        message = borrowing.outbox_messages.get(
+            kind=BorrowingOutbox.KindChoices.PAYMENT
+        )
+        self.assertEqual(message.status, BorrowingOutbox.StatusChoices.PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertIn("Stripe is down", message.last_error)
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(relay_borrowing_outbox(), 0)
+
+    @patch("stripe.checkout.Session.create")
+    @patch("httpx.Client.post")
+    def test_fine_is_deferred_to_outbox(
+        self, mocked_notify, mock_create_session
+    ):
+        borrowing = self.create_borrowing()
+        Borrowing.objects.filter(pk=borrowing.pk).update(
+            borrow_date=date.today() - timedelta(days=10),
+            expected_return_date=date.today() - timedelta(days=3),
+        )
+        mock_create_session.return_value = SessionStripe(
+            id="fake_session_id", url="https://fake-stripe-url.com"
+        )
+        relay_borrowing_outbox()
+        mock_create_session.reset_mock()
+
+        response = self.client.post(get_return_url(borrowing.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_create_session.assert_not_called()
+        message = borrowing.outbox_messages.get(
+            status=BorrowingOutbox.StatusChoices.PENDING
+        )
+        self.assertEqual(message.payload, {"borrowing_type": "Fine"})
+
+        mock_create_session.return_value = SessionStripe(
+            id="fine_session_id", url="https://fake-stripe-url.com"
+        )
+        self.assertEqual(relay_borrowing_outbox(), 1)
+
+        fine = borrowing.payments.get(type="Fine")
+        self.assertEqual(fine.session_id, "fine_session_id")
+
+    @patch("borrowings.tasks.deliver_outbox_message")
+    def test_claimed_messages_are_leased(self, deliver):
+        borrowing = self.create_borrowing()
+
+        messages = claim_outbox_batch(10)
+
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(claim_outbox_batch(10), [])
+        deliver.assert_not_called()
+
+        leased = borrowing.outbox_messages.get(pk=messages[0].pk)
+        self.assertEqual(leased.status, BorrowingOutbox.StatusChoices.PENDING)
+        self.assertGreater(leased.available_at, timezone.now())
+
+    @patch("borrowings.tasks.deliver_outbox_message")
+    def test_expired_lease_is_not_overwritten(self, deliver):
+        self.create_borrowing()
+        message = claim_outbox_batch(1)[0]
+        BorrowingOutbox.objects.filter(pk=message.pk).update(
+            available_at=timezone.now()
+        )
+
+        relay_outbox_message(message)
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, BorrowingOutbox.StatusChoices.PENDING)
+
+
+class OverdueBorrowingsTests(TestCase):
+    def setUp(self):
+        self.user = sample_user(email="test@test.com", password="password")
+        self.book = sample_book()
+
+    def make_overdue(self, count):
+        for _ in range(count):
+            sample_borrowing(user=self.user, book=self.book)
+
+        Borrowing.objects.update(
+            borrow_date=date.today() - timedelta(days=10),
+            expected_return_date=date.today() - timedelta(days=1),
+        )
+
+    def test_paginate_messages_respects_limit(self):
+        entries = [(index, "a" * 40) for index in range(10)]
+        pages = list(paginate_messages(entries, limit=100))
+
+        self.assertEqual(len(pages), 5)
+        self.assertTrue(all(len(page) <= 100 for page, _ in pages))
+        self.assertEqual(
+            [index for _, ids in pages for index in ids], list(range(10))
+        )
+
+    @patch("httpx.Client.post")
+    def test_no_overdue_borrowings(self, mocked_post):
+        self.assertEqual(check_overdue_borrowings(incremental=False), 0)
+
+        mocked_post.assert_called_once()
+        self.assertEqual(
+            mocked_post.call_args.kwargs["json"],
+            {"message": "There are no borrowings overdue today!"},
+        )
+
+    @patch("httpx.Client.post")
+    def test_every_overdue_borrowing_is_reported(self, mocked_post):
+        self.make_overdue(3)
+        sample_borrowing(user=self.user, book=self.book)
+
+        with self.assertNumQueries(1):
+            pages = check_overdue_borrowings(incremental=False)
+
+        self.assertEqual(pages, 1)
+        message = mocked_post.call_args.kwargs["json"]["message"]
+        self.assertEqual(message.count("has an overdue book!"), 3)
+
+    @patch("httpx.Client.post")
+    def test_long_digest_is_split_into_pages(self, mocked_post):
+        self.make_overdue(60)
+
+        pages = check_overdue_borrowings(chunk_size=7, incremental=False)
+
+        self.assertGreater(pages, 1)
+        self.assertEqual(mocked_post.call_count, pages)
+        messages = [
+            call.kwargs["json"]["message"]
+            for call in mocked_post.call_args_list
+        ]
+        self.assertTrue(all(len(message) <= 4096 for message in messages))
+        self.assertEqual(
+            sum(message.count("has an overdue book!") for message in messages),
+            60,
+        )
+
+    @patch("httpx.Client.post")
+    def test_full_scan_reports_the_same_borrowings_again(self, mocked_post):
+        self.make_overdue(2)
+
+        check_overdue_borrowings(incremental=False)
+        check_overdue_borrowings(incremental=False)
+
+        self.assertEqual(mocked_post.call_count, 2)
+        self.assertFalse(
+            Borrowing.objects.filter(overdue_notified_at__isnull=False)
+            .exists()
+        )
+
+    @patch("httpx.Client.post")
+    def test_incremental_scan_reports_only_new_borrowings(self, mocked_post):
+        self.make_overdue(2)
+
+        self.assertEqual(check_overdue_borrowings(incremental=True), 1)
+        message = mocked_post.call_args.kwargs["json"]["message"]
+        self.assertEqual(message.count("has an overdue book!"), 2)
+        self.assertFalse(
+            Borrowing.objects.filter(overdue_notified_at__isnull=True)
+            .exists()
+        )
+
+        borrowing = sample_borrowing(user=self.user, book=self.book)
+        Borrowing.objects.filter(pk=borrowing.pk).update(
+            borrow_date=date.today() - timedelta(days=5),
+            expected_return_date=date.today(),
+        )
+        mocked_post.reset_mock()
+
+        self.assertEqual(check_overdue_borrowings(incremental=True), 1)
+        messages = [
+            call.kwargs["json"]["message"]
+            for call in mocked_post.call_args_list
+        ]
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(messages[0].count("has an overdue book!"), 1)
+        self.assertIn(borrowing.user.email, messages[0])
+        self.assertEqual(
+            messages[1], "2 borrowings reported earlier are still overdue."
+        )
+
+    @patch("httpx.Client.post")
+    def test_incremental_scan_without_new_borrowings(self, mocked_post):
+        self.make_overdue(2)
+        check_overdue_borrowings(incremental=True)
+        Borrowing.objects.filter(
+            pk=Borrowing.objects.first().pk
+        ).update(actual_return_date=date.today())
+        mocked_post.reset_mock()
+
+        self.assertEqual(check_overdue_borrowings(incremental=True), 0)
+        mocked_post.assert_called_once()
+        self.assertEqual(
+            mocked_post.call_args.kwargs["json"],
+            {"message": "1 borrowings reported earlier are still overdue."},
+        )
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class BorrowingQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.user = sample_user(email="test@test.com", password="password")
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@test.com", password="password"
+        )
+        self.book = sample_book()
+        self.client = APIClient()
+        self.add_borrowings(1)
+
+    def add_borrowings(self, count=5):
+        borrowings = Borrowing.objects.bulk_create(
+            Borrowing(
+                user=self.user,
+                book=self.book,
+                expected_return_date=date.today() + timedelta(days=7),
+            )
+            for _ in range(count)
+        )
+        Payment.objects.bulk_create(
+            Payment(
+                borrowing=borrowing,
+                type=Payment.TypeChoices.PAYMENT,
+                money_to_pay=Decimal("7.28"),
+            )
+            for borrowing in borrowings
+        )
+        # bulk_create sends no signals.
+        invalidate_user_borrowings([self.user.id])
+
+    def test_user_list(self):
+        self.client.credentials(**jwt_headers(self.user))
+
+        self.assertQueryCountIsConstant(BORROWINGS_URL, self.add_borrowings)
+
+    def test_user_active_keyset_list(self):
+        self.client.credentials(**jwt_headers(self.user))
+
+        self.assertQueryCountIsConstant(
+            BORROWINGS_URL,
+            self.add_borrowings,
+            {"is_active": "true", "pagination": "keyset"},
+        )
+
+    def test_admin_list(self):
+        self.client.credentials(**jwt_headers(self.admin))
+
+        self.assertQueryCountIsConstant(BORROWINGS_URL, self.add_borrowings)
+
+    def test_retrieve(self):
+        self.client.credentials(**jwt_headers(self.admin))
+        borrowing = Borrowing.objects.first()
+
+        self.assertWithinQueryBudget(
+            self.client.get(get_detail(borrowing.id))
+        )
+
+
+class BorrowingResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = sample_user(email="test@test.com", password="password")
+        self.other = sample_user(email="other@test.com", password="password")
+        self.book = sample_book()
+        self.borrowing = self.make_borrowing(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_borrowing(self, user) -> Borrowing:
+        return Borrowing.objects.create(
+            user=user,
+            book=self.book,
+            expected_return_date=date.today() + timedelta(days=7),
+        )
+
+    def assertServedFromCache(self, url: str) -> None:
+        first = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_list_and_retrieve_are_cached_per_user(self):
+        self.assertServedFromCache(BORROWINGS_URL)
+        self.assertServedFromCache(get_detail(self.borrowing.id))
+
+    def test_other_users_changes_keep_the_cache(self):
+        self.client.get(BORROWINGS_URL)
+        self.make_borrowing(self.other)
+
+        with self.assertNumQueries(0):
+            self.client.get(BORROWINGS_URL)
+
+    def test_borrowing_changes_invalidate_the_list(self):
+        self.client.get(BORROWINGS_URL)
+        self.make_borrowing(self.user)
+
+        response = self.client.get(BORROWINGS_URL)
+
+        self.assertEqual(response.data["count"], 2)
+
+    def test_payment_changes_invalidate_the_list(self):
+        self.client.get(BORROWINGS_URL)
+        payment = Payment.objects.create(
+            borrowing=self.borrowing,
+            type=Payment.TypeChoices.PAYMENT,
+            session_id="cs_cache",
+            money_to_pay=Decimal("7.28"),
+        )
+
+        response = self.client.get(BORROWINGS_URL)
+        self.assertEqual(len(response.data["results"][0]["payments"]), 1)
+
+        handle_successful_payment({"id": payment.session_id})
+
+        response = self.client.get(BORROWINGS_URL)
+        self.assertEqual(
+            response.data["results"][0]["payments"][0]["status"],
+            Payment.StatusChoices.PAID,
+        )
+
+        payment.delete()
+
+        response = self.client.get(BORROWINGS_URL)
+        self.assertEqual(response.data["results"][0]["payments"], [])
+
+    def test_book_changes_invalidate_the_list(self):
+        self.client.get(BORROWINGS_URL)
+        self.book.title = "Renamed title"
+        self.book.save()
+
+        response = self.client.get(BORROWINGS_URL)
+
+        self.assertEqual(response.data["results"][0]["book"], "Renamed title")
+
+    def test_admin_lists_are_not_cached(self):
+        admin = get_user_model().objects.create_superuser(
+            email="admin@test.com", password="password"
+        )
+        self.client.force_authenticate(admin)
+        self.client.get(BORROWINGS_URL)
+
+        response = self.client.get(BORROWINGS_URL)
+
+        self.assertFalse(response.has_header("ETag"))
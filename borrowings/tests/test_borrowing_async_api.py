@@ -0,0 +1,77 @@
+import json
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from borrowings.models import Borrowing
+from borrowings.tests.test_borrowing_api import sample_book
+from common.testing import jwt_headers
+from payments.models import Payment
+
+
+BORROWINGS_URL = reverse("borrowings:borrowings-list")
+ASYNC_BORROWINGS_URL = reverse("async:borrowing-list")
+
+
+class AsyncBorrowingAPITests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user("reader@test.com", "testpass")
+        self.admin = User.objects.create_superuser(
+            "admin@test.com", "testpass"
+        )
+        other = User.objects.create_user("other@test.com", "testpass")
+        book = sample_book()
+
+        for index, user in enumerate([self.user] * 6 + [other] * 2):
+            borrowing = Borrowing.objects.create(
+                user=user,
+                book=book,
+                expected_return_date=date.today() + timedelta(days=7),
+                actual_return_date=date.today() if index % 3 else None,
+            )
+            Payment.objects.create(
+                borrowing=borrowing,
+                type=Payment.TypeChoices.PAYMENT,
+                session_id=f"cs_async_{index}",
+                session_url="https://checkout.stripe.test/async",
+                money_to_pay=borrowing.calculate_money_to_pay(),
+            )
+
+    def assertSameAsSync(self, user, params=None):
+        headers = jwt_headers(user)
+        response = self.client.get(ASYNC_BORROWINGS_URL, params, **headers)
+        expected = self.client.get(BORROWINGS_URL, params, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            json.loads(
+                expected.content.decode().replace(
+                    BORROWINGS_URL, ASYNC_BORROWINGS_URL
+                )
+            ),
+        )
+
+    def test_user_sees_own_borrowings(self):
+        self.assertSameAsSync(self.user, {"limit": 25})
+
+    def test_admin_filters_match_sync_view(self):
+        self.assertSameAsSync(
+            self.admin, {"user_id": self.user.id, "is_active": "true"}
+        )
+
+    def test_keyset_pagination_matches_sync_view(self):
+        self.assertSameAsSync(self.user, {"pagination": "keyset"})
+
+    def test_authentication_is_required(self):
+        response = self.client.get(ASYNC_BORROWINGS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            response.json(),
+            {"detail": "Authentication credentials were not provided."},
+        )
@@ -0,0 +1,135 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import Q
+from django.test import TestCase
+from django.utils import timezone
+
+from books.models import Book
+from borrowings.models import Borrowing
+
+
+class BorrowingIndexDefinitionTests(TestCase):
+    def setUp(self):
+        state = MigrationLoader(connection).project_state()
+        self.model_state = state.models["borrowings", "borrowing"]
+
+    def test_migrations_define_indexes(self):
+        indexes = {
+            index.name: (index.fields, index.condition)
+            for index in self.model_state.options["indexes"]
+        }
+
+        self.assertEqual(indexes, {
+            "borrowing_borrow_date_id_idx": (["borrow_date", "id"], None),
+            "borrowing_user_date_id_idx": (
+                ["user", "-borrow_date", "-id"], None
+            ),
+            "borrowing_user_active_idx": (
+                ["user", "-borrow_date", "-id"],
+                Q(actual_return_date__isnull=True),
+            ),
+            "borrowing_active_due_idx": (
+                ["expected_return_date", "id"],
+                Q(actual_return_date__isnull=True),
+            ),
+            "borrowing_overdue_new_idx": (
+                ["expected_return_date", "id"],
+                Q(
+                    actual_return_date__isnull=True,
+                    overdue_notified_at__isnull=True,
+                ),
+            ),
+        })
+
+    def test_user_column_has_no_separate_index(self):
+        self.assertFalse(self.model_state.fields["user"].db_index)
+
+
+class BorrowingQueryPlanMixin:
+    @classmethod
+    def setUpTestData(cls):
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f"user{index}@test.com")
+            for index in range(20)
+        )
+        book = Book.objects.create(
+            title="Book title",
+            author="Author Sample",
+            cover="SOFT",
+            inventory=10,
+            daily_fee=Decimal("1.04"),
+        )
+        today = date.today()
+
+        Borrowing.objects.bulk_create(
+            Borrowing(
+                user=users[index % len(users)],
+                book=book,
+                expected_return_date=today + timedelta(days=index % 30),
+                actual_return_date=today if index % 10 else None,
+                overdue_notified_at=None if index % 20 else timezone.now(),
+            )
+            for index in range(2000)
+        )
+        cls.user = users[0]
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertUsesIndex(self, queryset, index_name):
+        self.assertIn(index_name, queryset.explain())
+
+    def test_user_listing_uses_composite_index(self):
+        self.assertUsesIndex(
+            Borrowing.objects.filter(user=self.user)
+            .order_by("-borrow_date", "-id"),
+            "borrowing_user_date_id_idx",
+        )
+
+    def test_active_user_listing_uses_partial_index(self):
+        self.assertUsesIndex(
+            Borrowing.objects.filter(
+                user=self.user, actual_return_date__isnull=True
+            ).order_by("-borrow_date", "-id"),
+            "borrowing_user_active_idx",
+        )
+
+    def test_overdue_scan_uses_partial_index(self):
+        self.assertUsesIndex(
+            Borrowing.objects.filter(
+                expected_return_date__lte=date.today(),
+                actual_return_date__isnull=True,
+            ).order_by("expected_return_date", "id"),
+            "borrowing_active_due_idx",
+        )
+
+    def test_incremental_overdue_scan_uses_partial_index(self):
+        self.assertUsesIndex(
+            Borrowing.objects.filter(
+                expected_return_date__lte=date.today(),
+                actual_return_date__isnull=True,
+                overdue_notified_at__isnull=True,
+            ).order_by("expected_return_date", "id"),
+            "borrowing_overdue_new_idx",
+        )
+
+
+@skipUnless(connection.vendor == "sqlite", "Asserts SQLite query plans")
+class SQLiteBorrowingQueryPlanTests(BorrowingQueryPlanMixin, TestCase):
+    pass
+
+
+@skipUnless(
+    connection.vendor == "postgresql", "Asserts PostgreSQL query plans"
+)
+class PostgreSQLBorrowingQueryPlanTests(BorrowingQueryPlanMixin, TestCase):
+    def setUp(self):
+        # A few thousand rows fit in a handful of pages, where the planner
+        # would rightly prefer a sequential scan over any index.
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
@@ -7,10 +7,18 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from django.db import transaction
 from datetime import date
+from django.conf import settings
 
+from books.cache import get_catalog_version
+from books.inventory import release_book
+from borrowings.cache import get_user_borrowings_version
+from common.cache import VersionedResponseCacheMixin
+from common.query_budget import QueryBudgetMixin
 from common.serializers import BorrowingListRetrieveSerializer
-from payments.utils import create_payment_with_session
-from .models import Borrowing
+from library_api.paginations import SelectablePaginationMixin
+from payments.utils import create_payment
+from .models import Borrowing, BorrowingOutbox
+from .tasks import relay_borrowing_outbox
 from .serializers import (
     BorrowingSerializer,
     BorrowingRetrieveAdminSerializer,
@@ -20,28 +28,60 @@ from .serializers import (
 )
 
 
-class BorrowingViewSet(viewsets.ModelViewSet):
+def filter_borrowings(queryset, request: Request):
+    """Borrowings the user may see, narrowed by the query parameters"""
+    is_active = request.query_params.get("is_active")
+    user_id = request.query_params.get("user_id")
+    user = request.user
+
+    if not user.is_staff:
+        queryset = queryset.filter(user=user)
+    elif user_id and user.is_staff:
+        queryset = queryset.filter(user_id=user_id)
+
+    if is_active and is_active == "true":
+        queryset = queryset.filter(actual_return_date__isnull=True)
+
+    return queryset
+
+
+class BorrowingViewSet(
+    QueryBudgetMixin,
+    VersionedResponseCacheMixin,
+    SelectablePaginationMixin,
+    viewsets.ModelViewSet
+):
     queryset = Borrowing.objects.select_related("book", "user")
     serializer_class = BorrowingSerializer
+    keyset_ordering = ("-borrow_date", "-id")
+    query_budgets = {"list": 3, "retrieve": 2}
+    cache_prefix = "borrowings"
+    cache_timeout = settings.BORROWING_CACHE_TIMEOUT
+
+    def is_response_cacheable(self, request: Request) -> bool:
+        # Admin lists span every user, only per-user pages are cached.
+        return (
+            not request.user.is_staff
+            and super().is_response_cacheable(request)
+        )
+
+    def get_cache_scope(self) -> str:
+        return f"user:{self.request.user.id}"
+
+    def get_cache_version(self) -> str:
+        # Borrowings embed book titles, which change with the catalog.
+        return (
+            f"{get_user_borrowings_version(self.request.user.id)}."
+            f"{get_catalog_version()}"
+        )
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        is_active = self.request.query_params.get("is_active")
-        user_id = self.request.query_params.get("user_id")
-        user = self.request.user
 
         if self.action in ("list", "retrieve"):
             queryset = queryset.prefetch_related("payments")
 
-        if not user.is_staff:
-            queryset = queryset.filter(user=self.request.user)
-        elif user_id and user.is_staff:
-            queryset = queryset.filter(user_id=user_id)
-
-        if is_active and is_active == "true":
-            queryset = queryset.filter(actual_return_date__isnull=True)
-
-        return queryset
+        return filter_borrowings(queryset, self.request)
 
     def get_serializer_class(self):
         serializer = super().get_serializer_class()
@@ -61,6 +101,21 @@ class BorrowingViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer) -> None:
         serializer.save(user=self.request.user)
 
+    @staticmethod
+    def create_fine(borrowing: Borrowing) -> None:
+        # The Stripe session is created later, on checkout in lazy mode or
+        # by the outbox relay, so no row stays locked during the call.
+        if settings.STRIPE_LAZY_CHECKOUT:
+            create_payment(borrowing, borrowing_type="Fine")
+            return
+
+        BorrowingOutbox.objects.create(
+            borrowing=borrowing,
+            kind=BorrowingOutbox.KindChoices.PAYMENT,
+            payload={"borrowing_type": "Fine"},
+        )
+        transaction.on_commit(relay_borrowing_outbox.delay, robust=True)
+
     @action(
         methods=["POST"],
         detail=True,
@@ -69,31 +124,34 @@ class BorrowingViewSet(viewsets.ModelViewSet):
     )
     def return_borrowing(self, request: Request, pk: int = None) -> Response:
         """Endpoint for returning borrowing"""
-        borrowing = get_object_or_404(Borrowing, pk=pk)
-
-        if borrowing.actual_return_date:
-            return Response(
-                {"detail": "This borrowing has already been returned."},
-                status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic():
+            borrowing = get_object_or_404(
+                Borrowing.objects.select_for_update(of=("self",))
+                .select_related("book"),
+                pk=pk
             )
 
-        if borrowing.user_id != self.request.user.id:
-            return Response(
-                {"detail": "This is not your borrowing."},
-                status=status.HTTP_403_FORBIDDEN
-            )
+            if borrowing.actual_return_date:
+                return Response(
+                    {"detail": "This borrowing has already been returned."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        with transaction.atomic():
-            borrowing.book.inventory += 1
-            borrowing.book.save()
+            if borrowing.user_id != self.request.user.id:
+                return Response(
+                    {"detail": "This is not your borrowing."},
+                    status=status.HTTP_403_FORBIDDEN
+                )
 
             borrowing.actual_return_date = date.today()
             borrowing.save()
 
+            release_book(borrowing.book)
+
             if (
                 borrowing.actual_return_date - borrowing.expected_return_date
             ).days > 0:
-                create_payment_with_session(borrowing, borrowing_type="Fine")
+                self.create_fine(borrowing)
 
         serializer = self.get_serializer(borrowing)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -112,6 +170,12 @@ class BorrowingViewSet(viewsets.ModelViewSet):
                 description="Only admin feature, find borrowings by user id",
                 enum=[1, 3, 4]
             ),
+            OpenApiParameter(
+                name="pagination",
+                type=str,
+                description="Pagination mode, keyset returns opaque cursors",
+                enum=["offset", "keyset"]
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "common"
+
+    def ready(self):
+        from celery.signals import task_postrun, task_prerun
+        from django.db.backends.signals import connection_created
+
+        from common import db  # noqa: F401
+        from common.metrics import task_finished, task_started
+        from common.queries import install_query_observer
+
+        task_prerun.connect(task_started, weak=False)
+        task_postrun.connect(task_finished, weak=False)
+        connection_created.connect(install_query_observer)
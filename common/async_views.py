@@ -0,0 +1,76 @@
+from functools import wraps
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    MethodNotAllowed,
+    NotAuthenticated,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from user.authentication import AsyncJWTAuthentication
+
+
+SAFE_METHODS = ("GET", "HEAD")
+
+
+def json_response(data, status_code: int = status.HTTP_200_OK):
+    """Render like DRF's ``JSONRenderer`` so both paths return equal bodies"""
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type="application/json",
+        status=status_code,
+    )
+
+
+def error_response(exc: APIException, authenticator) -> HttpResponse:
+    data = exc.detail
+    if not isinstance(data, (list, dict)):
+        data = {"detail": data}
+
+    response = json_response(data, exc.status_code)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response["WWW-Authenticate"] = authenticator.authenticate_header(
+            None
+        )
+
+    return response
+
+
+def async_read_view(authentication_required: bool = True):
+    """Turn an async function into a read-only JSON endpoint.
+
+    The wrapped view gets a DRF ``Request`` with ``user`` set from the
+    JWT, and raised ``APIException`` are answered like DRF answers them.
+    """
+
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            authenticator = AsyncJWTAuthentication()
+
+            try:
+                if request.method not in SAFE_METHODS:
+                    raise MethodNotAllowed(request.method)
+
+                authenticated = await authenticator.aauthenticate(request)
+                user, token = authenticated or (AnonymousUser(), None)
+                if authentication_required and not user.is_authenticated:
+                    raise NotAuthenticated()
+
+                api_request = Request(request)
+                api_request.user = user
+                api_request.auth = token
+
+                return await view(api_request, *args, **kwargs)
+            except APIException as exc:
+                return error_response(exc, authenticator)
+
+        return wrapper
+
+    return decorator
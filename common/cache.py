@@ -0,0 +1,137 @@
+import hashlib
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.request import Request
+
+
+def get_version(key: str) -> int:
+    version = cache.get(key)
+
+    if version is None:
+        # A time based seed keeps versions unique even if the key was
+        # evicted, so stale responses of an older version are never reused.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_version(key: str) -> int:
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, None)
+        return version
+
+
+def invalidate_version(key: str) -> None:
+    bump_version(key)
+    # Bump once more after commit, so a response rendered from pre-commit
+    # data in the meantime is not served under the new version.
+    transaction.on_commit(partial(bump_version, key))
+
+
+class VersionedResponseCacheMixin:
+    """Cache rendered JSON responses of safe actions under a data version.
+
+    The version is read from ``cache_version_key``, or views override
+    ``get_cache_version``; bumping that version makes every stored
+    response unreachable, so entries never need explicit deletion.
+    Clients sending a matching ``If-None-Match`` get ``304 Not Modified``
+    without the view touching the database.
+    """
+
+    cached_actions = ("list", "retrieve")
+    cache_prefix = "response"
+    cache_timeout = 60 * 15
+    cache_version_key = None
+
+    def get_cache_version(self) -> str:
+        assert self.cache_version_key is not None, (
+            f"'{self.__class__.__name__}' should either include a "
+            "`cache_version_key` attribute, or override the "
+            "`get_cache_version()` method."
+        )
+
+        return get_version(self.cache_version_key)
+
+    def get_cache_scope(self) -> str:
+        return "public"
+
+    def is_response_cacheable(self, request: Request) -> bool:
+        renderer = getattr(request, "accepted_renderer", None)
+
+        return (
+            request.method == "GET"
+            and self.action in self.cached_actions
+            and renderer is not None
+            and renderer.format == "json"
+        )
+
+    def get_response_cache_key(self, request: Request) -> str:
+        path = hashlib.md5(
+            f"{request.accepted_media_type}:"
+            f"{request.build_absolute_uri()}".encode()
+        ).hexdigest()
+
+        return (
+            f"{self.cache_prefix}:{self.get_cache_scope()}:"
+            f"{self.get_cache_version()}:{path}"
+        )
+
+    @staticmethod
+    def get_etag(cache_key: str) -> str:
+        return f'"{hashlib.md5(cache_key.encode()).hexdigest()}"'
+
+    def cached_response(self, handler, request: Request, *args, **kwargs):
+        if not self.is_response_cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        cache_key = self.get_response_cache_key(request)
+        etag = self.get_etag(cache_key)
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        cached = cache.get(cache_key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response["ETag"] = etag
+            return response
+
+        self._response_cache_key = cache_key
+        return handler(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        cache_key = getattr(self, "_response_cache_key", None)
+
+        if cache_key and response.status_code == 200:
+            response.render()
+            cache.set(
+                cache_key,
+                (response.content, response["Content-Type"]),
+                self.cache_timeout,
+            )
+            response["ETag"] = self.get_etag(cache_key)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,132 @@
+import os
+
+from django.db import connections
+from django.db.backends.postgresql.base import DatabaseWrapper
+
+from common.metrics import format_labels, format_value, registry
+
+
+# Cumulative counters reported by psycopg_pool, with the metric each one
+# is exposed as and the factor converting it to the metric's unit.
+POOL_COUNTERS = {
+    "requests_num": (
+        "db_pool_requests_total",
+        "Connections requested from the pool.",
+        1,
+    ),
+    "requests_queued": (
+        "db_pool_requests_queued_total",
+        "Requests that had to wait for a free connection.",
+        1,
+    ),
+    "requests_wait_ms": (
+        "db_pool_wait_seconds_total",
+        "Time spent waiting for a free connection.",
+        0.001,
+    ),
+    "requests_errors": (
+        "db_pool_timeouts_total",
+        "Requests that gave up waiting for a connection.",
+        1,
+    ),
+    "returns_bad": (
+        "db_pool_bad_returns_total",
+        "Connections returned broken or in a transaction.",
+        1,
+    ),
+    "connections_num": (
+        "db_pool_connections_opened_total",
+        "Connections opened by the pool.",
+        1,
+    ),
+    "connections_errors": (
+        "db_pool_connection_errors_total",
+        "Failed attempts to open a connection.",
+        1,
+    ),
+    "connections_lost": (
+        "db_pool_connections_lost_total",
+        "Connections found broken by the health check.",
+        1,
+    ),
+}
+
+
+def get_pool_stats() -> dict:
+    """Usage of the connection pools of this process, by database alias"""
+    stats = {}
+
+    for connection in connections.all():
+        pool = getattr(connection, "pool", None)
+        if pool is None or pool.closed:
+            continue
+
+        pool_stats = pool.get_stats()
+        size = pool_stats.get("pool_size", 0)
+        idle = pool_stats.get("pool_available", 0)
+
+        stats[connection.alias] = {
+            "min_size": pool_stats.get("pool_min", 0),
+            "max_size": pool_stats.get("pool_max", 0),
+            "in_use": size - idle,
+            "idle": idle,
+            "waiting": pool_stats.get("requests_waiting", 0),
+            **{
+                name: pool_stats.get(name, 0)
+                for name in POOL_COUNTERS
+            },
+        }
+
+    return stats
+
+
+@registry.register_collector
+def collect_pool_metrics() -> list:
+    stats = get_pool_stats()
+    if not stats:
+        return []
+
+    pid = os.getpid()
+    gauges = {
+        "db_pool_connections": (
+            "Connections held by the pool, by state.",
+            lambda pool: [("in_use", pool["in_use"]), ("idle", pool["idle"])],
+        ),
+        "db_pool_max_connections": (
+            "Largest number of connections the pool may open.",
+            lambda pool: [(None, pool["max_size"])],
+        ),
+        "db_pool_requests_waiting": (
+            "Requests currently waiting for a free connection.",
+            lambda pool: [(None, pool["waiting"])],
+        ),
+    }
+    lines = []
+
+    for name, (documentation, values) in gauges.items():
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+
+        for alias, pool in stats.items():
+            for state, value in values(pool):
+                labels = {"alias": alias, "pid": pid}
+                if state:
+                    labels["state"] = state
+                lines.append(f"{name}{format_labels(labels)} {value}")
+
+    for key, (name, documentation, factor) in POOL_COUNTERS.items():
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} counter"]
+
+        for alias, pool in stats.items():
+            labels = format_labels({"alias": alias, "pid": pid})
+            lines.append(f"{name}{labels} {format_value(pool[key] * factor)}")
+
+    return lines
+
+
+def _forget_pools() -> None:
+    # Pools opened before a fork hold the parent's sockets and worker
+    # threads, a child builds its own on first use.
+    DatabaseWrapper._connection_pools.clear()
+
+
+os.register_at_fork(after_in_child=_forget_pools)
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from common.profiling import make_profiling_token
+
+
+class Command(BaseCommand):
+    help = "Print a signed header value that profiles the requests it is on"
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{settings.PROFILING_HEADER}: {make_profiling_token()}"
+        )
+        self.stderr.write(
+            f"Valid for {settings.PROFILING_TOKEN_MAX_AGE} seconds"
+        )
@@ -0,0 +1,408 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from common.profiling import get_view_name
+from common.queries import QueryStats, track_queries
+
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 10,
+)
+TASK_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+ARCHIVE_FILE = "metrics_archive.json"
+LOCK_FILE = "metrics.lock"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def read_dump(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace("\n", "\\n")
+            .replace('"', '\\"'),
+        )
+        for name, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+class Histogram:
+    """Cumulative histogram with a fixed set of label names"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple,
+        buckets: tuple = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.series = {}
+        self.registry = None
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+
+        with self.registry.lock:
+            counts, total = self.series.get(
+                key, ([0] * len(self.buckets), 0.0)
+            )
+            counts[bisect_left(self.buckets, value)] += 1
+            self.series[key] = counts, total + value
+
+        self.registry.changed()
+
+    def dump(self) -> list:
+        return [
+            [list(key), counts, total]
+            for key, (counts, total) in self.series.items()
+        ]
+
+    def merge(self, series: dict, dumped: list) -> None:
+        for key, counts, total in dumped:
+            key = tuple(key)
+            merged, merged_total = series.get(
+                key, ([0] * len(self.buckets), 0.0)
+            )
+            series[key] = (
+                [a + b for a, b in zip(merged, counts)],
+                merged_total + total,
+            )
+
+    def render(self, series: dict) -> list:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+
+        for key in sorted(series):
+            counts, total = series[key]
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket_labels = format_labels(
+                    {**labels, "le": format_value(bound)}
+                )
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+
+            lines.append(
+                f"{self.name}_sum{format_labels(labels)} "
+                f"{format_value(total)}"
+            )
+            lines.append(
+                f"{self.name}_count{format_labels(labels)} {cumulative}"
+            )
+
+        return lines
+
+
+class Registry:
+    """All metrics of this process, rendered in Prometheus text format.
+
+    With ``METRICS_MULTIPROCESS_DIR`` set, every process (prefork web
+    workers, Celery pool children) periodically writes its series to its
+    own file in that directory and ``render`` sums all of them, so any
+    worker can answer a scrape for the whole host. As histograms are
+    cumulative, the files of exited processes are folded into one archive
+    file rather than dropped. Liveness is checked by pid, so every process
+    writing to the directory must share one pid namespace.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.collectors = []
+        self.reset_process()
+
+    def reset_process(self) -> None:
+        self.process_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.flushed_at = 0.0
+
+        for metric in self.metrics.values():
+            metric.series = {}
+
+    def reset_after_fork(self) -> None:
+        # The child inherits the parent's counts, which the parent keeps
+        # reporting itself.
+        self.lock = threading.Lock()
+        self.reset_process()
+
+    def register(self, metric: Histogram) -> Histogram:
+        metric.registry = self
+        self.metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector):
+        """Add a callable returning exposition lines about this process"""
+        self.collectors.append(collector)
+        return collector
+
+    @staticmethod
+    def multiprocess_dir() -> Path | None:
+        directory = settings.METRICS_MULTIPROCESS_DIR
+        return Path(directory) if directory else None
+
+    def changed(self) -> None:
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if time.monotonic() - self.flushed_at >= interval:
+            self.flush()
+
+    @staticmethod
+    def write_file(path: Path, content: str) -> None:
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(content)
+        os.replace(temporary, path)
+
+    def flush(self) -> None:
+        directory = self.multiprocess_dir()
+        if directory is None:
+            return
+
+        with self.lock:
+            self.flushed_at = time.monotonic()
+            content = json.dumps({
+                name: metric.dump() for name, metric in self.metrics.items()
+            })
+
+        directory.mkdir(parents=True, exist_ok=True)
+        self.write_file(
+            directory / f"metrics_{self.process_id}.json", content
+        )
+
+    def prune(self, directory: Path) -> None:
+        """Fold the files of exited processes into the archive file"""
+        dead = []
+        for path in directory.glob("metrics_*-*.json"):
+            pid = path.stem.removeprefix("metrics_").split("-")[0]
+            if pid.isdigit() and not is_process_alive(int(pid)):
+                dead.append(path)
+
+        if not dead:
+            return
+
+        archive = directory / ARCHIVE_FILE
+        merged = {name: {} for name in self.metrics}
+        for path in [archive, *dead]:
+            for name, series in read_dump(path).items():
+                if name in self.metrics:
+                    self.metrics[name].merge(merged[name], series)
+
+        self.write_file(archive, json.dumps({
+            name: [
+                [list(key), counts, total]
+                for key, (counts, total) in series.items()
+            ]
+            for name, series in merged.items()
+        }))
+        for path in dead:
+            path.unlink(missing_ok=True)
+
+    def collect(self) -> dict:
+        directory = self.multiprocess_dir()
+
+        if directory is None:
+            with self.lock:
+                return {
+                    name: {
+                        key: (list(counts), total)
+                        for key, (counts, total) in metric.series.items()
+                    }
+                    for name, metric in self.metrics.items()
+                }
+
+        self.flush()
+        collected = {name: {} for name in self.metrics}
+
+        # Scrapes in other processes may be pruning at the same time, the
+        # lock keeps them from reading a file both archived and still there.
+        with open(directory / LOCK_FILE, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.prune(directory)
+
+            for path in sorted(directory.glob("metrics_*.json")):
+                for name, series in read_dump(path).items():
+                    if name in self.metrics:
+                        self.metrics[name].merge(collected[name], series)
+
+        return collected
+
+    def render(self) -> str:
+        collected = self.collect()
+        lines = []
+
+        for name, metric in self.metrics.items():
+            lines.extend(metric.render(collected[name]))
+
+        for collector in self.collectors:
+            lines.extend(collector())
+
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset_after_fork)
+atexit.register(registry.flush)
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Time spent answering HTTP requests.",
+    ("method", "route", "status"),
+))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request",
+    "Database queries run while answering a request.",
+    ("route",),
+    QUERY_COUNT_BUCKETS,
+))
+db_time_per_request = registry.register(Histogram(
+    "db_query_seconds_per_request",
+    "Time spent in database queries while answering a request.",
+    ("route",),
+))
+external_call_duration = registry.register(Histogram(
+    "external_call_duration_seconds",
+    "Time spent calling services outside this application.",
+    ("target", "operation", "outcome"),
+))
+celery_task_duration = registry.register(Histogram(
+    "celery_task_duration_seconds",
+    "Time spent running Celery tasks.",
+    ("task", "state"),
+    TASK_BUCKETS,
+))
+
+
+@contextmanager
+def track_external_call(target: str, operation: str):
+    started = time.perf_counter()
+    outcome = "error"
+
+    try:
+        yield
+        outcome = "success"
+    finally:
+        external_call_duration.observe(
+            time.perf_counter() - started,
+            target=target,
+            operation=operation,
+            outcome=outcome,
+        )
+
+
+class MetricsMiddleware:
+    """Record latency and database usage of every request per route"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        with self.measure(request) as measured:
+            measured.response = self.get_response(request)
+
+        return measured.response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        with self.measure(request) as measured:
+            measured.response = await self.get_response(request)
+
+        return measured.response
+
+    @contextmanager
+    def measure(self, request):
+        queries = QueryStats()
+        measured = SimpleNamespace(response=None)
+        started = time.perf_counter()
+
+        with track_queries(queries):
+            yield measured
+
+        route = get_view_name(request) or "unmatched"
+        http_request_duration.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=route,
+            status=measured.response.status_code,
+        )
+        db_queries_per_request.observe(queries.count, route=route)
+        db_time_per_request.observe(queries.total, route=route)
+
+
+_task_started = {}
+
+
+def task_started(task_id=None, **kwargs) -> None:
+    _task_started[task_id] = time.perf_counter()
+
+
+def task_finished(task_id=None, task=None, state=None, **kwargs) -> None:
+    started = _task_started.pop(task_id, None)
+    if started is None:
+        return
+
+    celery_task_duration.observe(
+        time.perf_counter() - started, task=task.name, state=state
+    )
+    # Pool children may be recycled without running exit handlers.
+    registry.flush()
@@ -0,0 +1,65 @@
+import os
+import threading
+
+import httpx
+from django.conf import settings
+
+from common.metrics import track_external_call
+
+
+_lock = threading.Lock()
+_client: httpx.Client | None = None
+_client_pid: int | None = None
+
+
+def _client_options() -> dict:
+    return {
+        "timeout": httpx.Timeout(
+            settings.BOT_NOTIFY_TIMEOUT,
+            connect=settings.BOT_NOTIFY_CONNECT_TIMEOUT,
+        ),
+        "limits": httpx.Limits(
+            max_connections=settings.BOT_NOTIFY_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.BOT_NOTIFY_MAX_CONNECTIONS,
+            keepalive_expiry=settings.BOT_NOTIFY_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_client() -> httpx.Client:
+    """Process-wide keep-alive client for the Telegram bot service"""
+    global _client, _client_pid
+
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = httpx.Client(**_client_options())
+                _client_pid = os.getpid()
+
+    return _client
+
+
+def _forget_clients() -> None:
+    # A forked child must not reuse the parent's sockets, drop the
+    # references without closing them and build new pools on demand.
+    global _lock, _client, _client_pid
+
+    _lock = threading.Lock()
+    _client = None
+    _client_pid = None
+
+
+os.register_at_fork(after_in_child=_forget_clients)
+
+
+def get_bot_url(path: str) -> str:
+    return (
+        f"http://{os.getenv('TELEGRAM_BOT_HOST')}:"
+        f"{os.getenv('TELEGRAM_BOT_PORT')}/{path}/"
+    )
+
+
+def send_bot_message(path: str, data: dict) -> None:
+    with track_external_call("telegram_bot", path):
+        response = get_client().post(get_bot_url(path), json=data)
+        response.raise_for_status()
@@ -0,0 +1,236 @@
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core import signing
+
+from common.queries import QueryStats, track_queries
+
+
+logger = logging.getLogger("library_api.profiling")
+
+PROFILING_SALT = "library_api.profiling"
+PROFILING_TOKEN_VALUE = "profile"
+MAX_RECORDED_QUERIES = 50
+MAX_SQL_LENGTH = 500
+
+
+def make_profiling_token() -> str:
+    """Value for the profiling header, valid for PROFILING_TOKEN_MAX_AGE"""
+    return signing.TimestampSigner(salt=PROFILING_SALT).sign(
+        PROFILING_TOKEN_VALUE
+    )
+
+
+def is_valid_profiling_token(token: str) -> bool:
+    try:
+        value = signing.TimestampSigner(salt=PROFILING_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+
+    return value == PROFILING_TOKEN_VALUE
+
+
+def describe_frame(frame, with_line: bool = False) -> str:
+    filename = Path(frame.f_code.co_filename)
+
+    try:
+        filename = filename.relative_to(settings.BASE_DIR)
+    except ValueError:
+        filename = Path(*filename.parts[-2:])
+
+    line = f":{frame.f_lineno}" if with_line else ""
+    return f"{filename}{line} {frame.f_code.co_name}"
+
+
+def get_view_name(request) -> str | None:
+    """URL name of the matched view, with the viewset action if any"""
+    match = request.resolver_match
+    if match is None:
+        return None
+
+    actions = getattr(match.func, "actions", None) or {}
+    action = actions.get(request.method.lower())
+
+    return f"{match.view_name}:{action}" if action else match.view_name
+
+
+class StackSampler:
+    """Sample the call stack of one thread at a fixed interval.
+
+    Functions are counted once per sample in which they appear, so their
+    share of samples approximates their share of the request's wall time.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.functions = Counter()
+        self.lines = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            self.samples += 1
+            self.lines[describe_frame(frame, with_line=True)] += 1
+
+            seen = set()
+            while frame is not None:
+                seen.add(describe_frame(frame))
+                frame = frame.f_back
+            self.functions.update(seen)
+
+    def top(self, counter: Counter, limit: int) -> list[dict]:
+        return [
+            {
+                "frame": frame,
+                "samples": samples,
+                "percent": round(100 * samples / self.samples, 1),
+            }
+            for frame, samples in counter.most_common(limit)
+        ]
+
+
+class QueryTimer(QueryStats):
+    def __init__(self) -> None:
+        super().__init__()
+        self.queries = []
+
+    def record(self, sql: str, elapsed: float) -> None:
+        super().record(sql, elapsed)
+        self.queries.append((elapsed, sql[:MAX_SQL_LENGTH]))
+
+    def slowest(self, limit: int) -> list[dict]:
+        return [
+            {"ms": round(elapsed * 1000, 3), "sql": sql}
+            for elapsed, sql in sorted(self.queries, reverse=True)[:limit]
+        ]
+
+
+class ProfilingMiddleware:
+    """Profile a sample of requests and log the slow ones.
+
+    A request is profiled when it is drawn with ``PROFILING_SAMPLE_RATE``
+    or carries a valid signed ``PROFILING_HEADER``. Profiled requests
+    slower than ``PROFILING_SLOW_MS``, and every header-triggered one, are
+    written as JSON to the ``library_api.profiling`` logger.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def get_trigger(self, request) -> str | None:
+        token = request.headers.get(settings.PROFILING_HEADER)
+        if token and is_valid_profiling_token(token):
+            return "header"
+
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return "sample"
+
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        trigger = self.get_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        with self.profile(request, trigger) as profiled:
+            profiled.response = self.get_response(request)
+
+        return profiled.response
+
+    async def __acall__(self, request):
+        trigger = self.get_trigger(request)
+        if trigger is None:
+            return await self.get_response(request)
+
+        # Only the event loop thread is sampled, ORM calls made through
+        # ``sync_to_async`` show up as time spent awaiting them. Their SQL
+        # is still recorded, as ``track_queries`` follows the context.
+        with self.profile(request, trigger) as profiled:
+            profiled.response = await self.get_response(request)
+
+        return profiled.response
+
+    @contextmanager
+    def profile(self, request, trigger: str):
+        sampler = StackSampler(
+            threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000
+        )
+        queries = QueryTimer()
+        profiled = SimpleNamespace(response=None)
+        started = time.perf_counter()
+        sampler.start()
+
+        try:
+            with track_queries(queries):
+                yield profiled
+        finally:
+            sampler.stop()
+
+        duration = (time.perf_counter() - started) * 1000
+        if trigger == "header" or duration >= settings.PROFILING_SLOW_MS:
+            self.log(
+                request, profiled.response, trigger, duration, sampler, queries
+            )
+
+    def log(self, request, response, trigger, duration, sampler, queries):
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": get_view_name(request),
+            "status": response.status_code,
+            "trigger": trigger,
+            "duration_ms": round(duration, 3),
+            "sql": {
+                "count": queries.count,
+                "time_ms": round(queries.total * 1000, 3),
+                "slowest": queries.slowest(MAX_RECORDED_QUERIES),
+            },
+            "profile": {
+                "interval_ms": settings.PROFILING_INTERVAL_MS,
+                "samples": sampler.samples,
+                "top_functions": sampler.top(
+                    sampler.functions, settings.PROFILING_TOP_FRAMES
+                ),
+                "top_lines": sampler.top(
+                    sampler.lines, settings.PROFILING_TOP_FRAMES
+                ),
+            },
+        }
+
+        logger.warning(json.dumps(record))
@@ -0,0 +1,65 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_observers = ContextVar("query_observers", default=())
+
+
+def observe_query(execute, sql, params, many, context):
+    observers = _observers.get()
+    if not observers:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+
+        for observer in observers:
+            observer(sql, elapsed)
+
+
+class QueryStats:
+    """Number and total time of the queries observed while not paused"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.paused = False
+
+    def __call__(self, sql: str, elapsed: float) -> None:
+        if not self.paused:
+            self.record(sql, elapsed)
+
+    def record(self, sql: str, elapsed: float) -> None:
+        self.count += 1
+        self.total += elapsed
+
+
+def install_query_observer(sender, connection, **kwargs) -> None:
+    """``connection_created`` receiver adding ``observe_query`` once.
+
+    Every thread has its own connection objects, so wrapping them as they
+    connect also covers the threads ``sync_to_async`` runs ORM calls in.
+    """
+    if observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, observe_query)
+
+
+@contextmanager
+def track_queries(observer):
+    """Call ``observer(sql, seconds)`` for the queries run in this context.
+
+    The observers live in a context variable, which ``sync_to_async``
+    copies into its worker thread, so an async request sees its own
+    queries wherever they run.
+    """
+    token = _observers.set(_observers.get() + (observer,))
+
+    try:
+        yield observer
+    finally:
+        _observers.reset(token)
@@ -0,0 +1,86 @@
+import logging
+
+from django.conf import settings
+
+from common.queries import QueryStats, track_queries
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit: int):
+    """Set the maximum number of queries of a view action"""
+    def decorator(func):
+        func.query_budget = limit
+        return func
+
+    return decorator
+
+
+class QueryBudgetMixin:
+    """Count the queries of every request against a per-action budget.
+
+    Budgets come from ``query_budgets`` (``{"list": 3}``) or from the
+    ``query_budget`` decorator on an action. Queries made to authenticate
+    the request (the JWT user lookup) are not counted, budgets cover the
+    work of the action itself. The count and budget are set on the
+    response for tests; going over budget raises with
+    ``QUERY_BUDGET_STRICT`` and is logged with ``QUERY_BUDGET_LOG``.
+    """
+
+    query_budgets = {}
+
+    def get_query_budget(self) -> int | None:
+        action = getattr(self, "action", None)
+        if action is None:
+            action = self.request.method.lower()
+
+        handler = getattr(self, action, None)
+
+        return getattr(
+            handler, "query_budget", self.query_budgets.get(action)
+        )
+
+    def perform_authentication(self, request) -> None:
+        counter = getattr(self, "_query_counter", None)
+        if counter is None:
+            return super().perform_authentication(request)
+
+        counter.paused = True
+        try:
+            super().perform_authentication(request)
+        finally:
+            counter.paused = False
+
+    def dispatch(self, request, *args, **kwargs):
+        counter = self._query_counter = QueryStats()
+
+        with track_queries(counter):
+            response = super().dispatch(request, *args, **kwargs)
+
+        response.query_count = counter.count
+        response.query_budget = self.get_query_budget()
+
+        if (
+            response.query_budget is not None
+            and counter.count > response.query_budget
+        ):
+            self.query_budget_exceeded(counter.count, response.query_budget)
+
+        return response
+
+    def query_budget_exceeded(self, count: int, budget: int) -> None:
+        message = (
+            f"{self.__class__.__name__} {self.request.method} "
+            f"{self.request.path} ran {count} queries, budget is {budget}"
+        )
+
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+
+        if settings.QUERY_BUDGET_LOG:
+            logger.warning(message)
@@ -0,0 +1,52 @@
+from typing import Callable
+
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def jwt_headers(user) -> dict:
+    """Request headers carrying an access token for ``user``"""
+    return {
+        api_settings.AUTH_HEADER_NAME: (
+            f"{api_settings.AUTH_HEADER_TYPES[0]} "
+            f"{AccessToken.for_user(user)}"
+        )
+    }
+
+
+class QueryBudgetTestMixin:
+    """Assertions for views using ``QueryBudgetMixin``"""
+
+    def assertWithinQueryBudget(self, response) -> None:
+        self.assertIsNotNone(
+            getattr(response, "query_budget", None),
+            "The view has no query budget for this action"
+        )
+        self.assertLessEqual(response.query_count, response.query_budget)
+
+    def assertQueryCountIsConstant(
+        self,
+        url: str,
+        add_rows: Callable[[], None],
+        params: dict = None,
+    ) -> None:
+        """Fail when adding rows to a page adds queries to the request"""
+        params = {"limit": 25, **(params or {})}
+
+        before = self.client.get(url, params)
+        self.assertWithinQueryBudget(before)
+
+        add_rows()
+
+        after = self.client.get(url, params)
+        self.assertWithinQueryBudget(after)
+        self.assertGreater(
+            len(after.data["results"]), len(before.data["results"])
+        )
+        self.assertEqual(
+            after.query_count,
+            before.query_count,
+            f"{url} ran {before.query_count} queries for "
+            f"{len(before.data['results'])} rows and {after.query_count} "
+            f"for {len(after.data['results'])}"
+        )
@@ -0,0 +1,58 @@
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase
+
+from common.db import get_pool_stats
+from common.metrics import registry
+
+
+POOL_STATS = {
+    "pool_min": 2,
+    "pool_max": 10,
+    "pool_size": 4,
+    "pool_available": 1,
+    "requests_waiting": 2,
+    "requests_num": 40,
+    "requests_wait_ms": 1500,
+    "requests_errors": 3,
+}
+
+
+def fake_connections():
+    pooled = Mock(alias="default")
+    pooled.pool.closed = False
+    pooled.pool.get_stats.return_value = POOL_STATS
+    unopened = Mock(alias="reports")
+    unopened.pool.closed = True
+    unpooled = Mock(alias="replica", pool=None)
+    return [pooled, unopened, unpooled]
+
+
+@patch("common.db.connections.all", fake_connections)
+@patch("common.db.os.getpid", Mock(return_value=42))
+class PoolStatsTests(SimpleTestCase):
+    def test_reports_pooled_aliases_only(self):
+        stats = get_pool_stats()
+
+        self.assertEqual(list(stats), ["default"])
+        self.assertEqual(stats["default"]["in_use"], 3)
+        self.assertEqual(stats["default"]["idle"], 1)
+        self.assertEqual(stats["default"]["waiting"], 2)
+        self.assertEqual(stats["default"]["requests_queued"], 0)
+
+    def test_metrics_include_pool_usage(self):
+        lines = registry.render().splitlines()
+
+        self.assertIn(
+            'db_pool_connections{alias="default",pid="42",state="in_use"} 3',
+            lines,
+        )
+        self.assertIn(
+            'db_pool_requests_waiting{alias="default",pid="42"} 2', lines
+        )
+        self.assertIn(
+            'db_pool_wait_seconds_total{alias="default",pid="42"} 1.5', lines
+        )
+        self.assertIn(
+            'db_pool_timeouts_total{alias="default",pid="42"} 3', lines
+        )
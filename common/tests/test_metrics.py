@@ -0,0 +1,172 @@
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from borrowings.tasks import check_overdue_borrowings
+from common.metrics import (
+    ARCHIVE_FILE,
+    Histogram,
+    Registry,
+    celery_task_duration,
+    external_call_duration,
+    registry,
+)
+from common.notifications import send_bot_message
+
+
+METRICS_URL = reverse("metrics")
+
+
+def make_registry() -> tuple[Registry, Histogram]:
+    local_registry = Registry()
+    histogram = local_registry.register(
+        Histogram("job_seconds", "Job time.", ("job",), (0.1, 1))
+    )
+    return local_registry, histogram
+
+
+def series_count(histogram: Histogram, **labels) -> int:
+    key = tuple(str(labels[name]) for name in histogram.labelnames)
+    counts, total = histogram.series.get(key, ([0], 0))
+    return sum(counts)
+
+
+@override_settings(METRICS_MULTIPROCESS_DIR=None)
+class HistogramTests(SimpleTestCase):
+    def test_renders_cumulative_buckets(self):
+        local_registry, histogram = make_registry()
+        histogram.observe(0.05, job="import")
+        histogram.observe(0.1, job="import")
+        histogram.observe(3, job="import")
+
+        lines = local_registry.render().splitlines()
+
+        self.assertEqual(lines[:2], [
+            "# HELP job_seconds Job time.",
+            "# TYPE job_seconds histogram",
+        ])
+        self.assertIn('job_seconds_bucket{job="import",le="0.1"} 2', lines)
+        self.assertIn('job_seconds_bucket{job="import",le="1"} 2', lines)
+        self.assertIn('job_seconds_bucket{job="import",le="+Inf"} 3', lines)
+        self.assertIn('job_seconds_sum{job="import"} 3.15', lines)
+        self.assertIn('job_seconds_count{job="import"} 3', lines)
+
+    def test_escapes_label_values(self):
+        local_registry, histogram = make_registry()
+        histogram.observe(1, job='say "hi"')
+
+        self.assertIn('{job="say \\"hi\\"",le="1"}', local_registry.render())
+
+    def test_multiprocess_mode_sums_every_process(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(METRICS_MULTIPROCESS_DIR=directory):
+                first, first_histogram = make_registry()
+                second, second_histogram = make_registry()
+
+                first_histogram.observe(0.5, job="import")
+                second_histogram.observe(0.5, job="import")
+                second.flush()
+
+                rendered = first.render()
+
+        self.assertIn('job_seconds_count{job="import"} 2', rendered)
+        self.assertIn('job_seconds_sum{job="import"} 1', rendered)
+
+    def test_files_of_exited_processes_are_archived(self):
+        exited = subprocess.Popen([sys.executable, "-c", "pass"])
+        exited.wait()
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(METRICS_MULTIPROCESS_DIR=directory):
+                live, live_histogram = make_registry()
+                dead, dead_histogram = make_registry()
+                dead.process_id = f"{exited.pid}-deadbeef"
+
+                dead_histogram.observe(0.5, job="import")
+                dead.flush()
+                live.render()
+                live_histogram.observe(0.5, job="import")
+
+                rendered = live.render()
+                files = sorted(path.name for path in Path(directory).iterdir())
+
+        self.assertIn('job_seconds_count{job="import"} 2', rendered)
+        self.assertIn(ARCHIVE_FILE, files)
+        self.assertNotIn(f"metrics_{exited.pid}-deadbeef.json", files)
+
+
+class MetricsEndpointTests(TestCase):
+    def test_exposes_request_metrics(self):
+        self.client.get(reverse("books:book-list"))
+
+        response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        content = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",'
+            'route="books:book-list:list",status="200"}',
+            content,
+        )
+        self.assertIn(
+            'db_queries_per_request_count{route="books:book-list:list"}',
+            content,
+        )
+        self.assertIn("db_query_seconds_per_request_sum", content)
+
+    def test_other_networks_are_denied_without_token(self):
+        response = self.client.get(METRICS_URL, REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, 403)
+
+        with self.settings(METRICS_ALLOWED_NETWORKS=["203.0.113.0/24"]):
+            response = self.client.get(METRICS_URL, REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN="scrape")
+    def test_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+
+        response = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION="Bearer scrape"
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class InstrumentationTests(TestCase):
+    @patch("common.notifications.get_client")
+    def test_bot_calls_are_timed_by_outcome(self, get_client):
+        labels = {"target": "telegram_bot", "operation": "overdue"}
+        errors = series_count(
+            external_call_duration, outcome="error", **labels
+        )
+        get_client.return_value.post.side_effect = httpx.ConnectError("down")
+
+        with self.assertRaises(httpx.ConnectError):
+            send_bot_message("overdue", {"message": "..."})
+
+        self.assertEqual(
+            series_count(external_call_duration, outcome="error", **labels),
+            errors + 1,
+        )
+
+    @patch("borrowings.tasks.send_bot_message")
+    def test_celery_task_duration_is_recorded(self, send_bot_message):
+        labels = {
+            "task": check_overdue_borrowings.name,
+            "state": "SUCCESS",
+        }
+        runs = series_count(celery_task_duration, **labels)
+
+        check_overdue_borrowings.apply()
+
+        self.assertEqual(series_count(celery_task_duration, **labels), runs + 1)
+        self.assertIn(
+            check_overdue_borrowings.name, registry.render()
+        )
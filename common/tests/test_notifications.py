@@ -0,0 +1,38 @@
+import os
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from common import notifications
+
+
+class BotClientTests(SimpleTestCase):
+    def setUp(self) -> None:
+        notifications._forget_clients()
+
+    def test_client_is_shared_within_process(self) -> None:
+        self.assertIs(notifications.get_client(), notifications.get_client())
+
+    @override_settings(BOT_NOTIFY_TIMEOUT=1.5, BOT_NOTIFY_MAX_CONNECTIONS=3)
+    def test_client_uses_configured_limits(self) -> None:
+        client = notifications.get_client()
+
+        self.assertEqual(client.timeout.read, 1.5)
+        self.assertEqual(
+            client._transport._pool._max_connections, 3
+        )
+
+    def test_client_is_rebuilt_after_fork(self) -> None:
+        client = notifications.get_client()
+
+        with patch("os.getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(notifications.get_client(), client)
+
+    @patch("httpx.Client.post")
+    def test_send_bot_message(self, mocked_post) -> None:
+        notifications.send_bot_message("overdue", {"message": "Hi"})
+
+        mocked_post.assert_called_once_with(
+            notifications.get_bot_url("overdue"), json={"message": "Hi"}
+        )
+        mocked_post.return_value.raise_for_status.assert_called_once()
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from books.models import Book
+from common.profiling import (
+    StackSampler,
+    is_valid_profiling_token,
+    make_profiling_token,
+)
+
+
+BOOK_LIST_URL = reverse("books:book-list")
+ASYNC_BOOK_LIST_URL = reverse("async:book-list")
+
+
+def wait_a_while():
+    time.sleep(0.05)
+
+
+class StackSamplerTests(TestCase):
+    def test_samples_the_running_thread(self):
+        sampler = StackSampler(threading.get_ident(), 0.001)
+        sampler.start()
+        wait_a_while()
+        sampler.stop()
+
+        self.assertGreater(sampler.samples, 0)
+        top = sampler.top(sampler.functions, 50)
+        self.assertIn(
+            "common/tests/test_profiling.py wait_a_while",
+            [entry["frame"] for entry in top],
+        )
+
+
+@override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_INTERVAL_MS=1)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        Book.objects.create(
+            title="Profiled",
+            author="Author",
+            cover=Book.Cover.HARD,
+            inventory=1,
+            daily_fee=1,
+        )
+
+    def get_records(self, **headers):
+        with self.assertLogs("library_api.profiling") as logs:
+            response = self.client.get(BOOK_LIST_URL, **headers)
+
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line.split(":", 2)[2]) for line in logs.output]
+
+    def test_token_round_trip(self):
+        self.assertTrue(is_valid_profiling_token(make_profiling_token()))
+        self.assertFalse(is_valid_profiling_token("profile:forged"))
+
+    def test_unprofiled_requests_are_not_logged(self):
+        with self.assertNoLogs("library_api.profiling"):
+            self.client.get(BOOK_LIST_URL, HTTP_X_PROFILE="profile:forged")
+
+    def test_signed_header_always_logs(self):
+        [record] = self.get_records(HTTP_X_PROFILE=make_profiling_token())
+
+        self.assertEqual(record["method"], "GET")
+        self.assertEqual(record["path"], BOOK_LIST_URL)
+        self.assertEqual(record["view"], "books:book-list:list")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["trigger"], "header")
+        self.assertGreater(record["sql"]["count"], 0)
+        self.assertEqual(
+            len(record["sql"]["slowest"]), record["sql"]["count"]
+        )
+        self.assertIn("samples", record["profile"])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_SLOW_MS=0)
+    def test_sampled_slow_requests_are_logged(self):
+        [record] = self.get_records()
+
+        self.assertEqual(record["trigger"], "sample")
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_SLOW_MS=60_000)
+    def test_sampled_fast_requests_are_not_logged(self):
+        with self.assertNoLogs("library_api.profiling"):
+            self.client.get(BOOK_LIST_URL)
+
+    async def test_async_views_record_their_sql(self):
+        with self.assertLogs("library_api.profiling") as logs:
+            response = await self.async_client.get(
+                ASYNC_BOOK_LIST_URL,
+                headers={"X-Profile": make_profiling_token()},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        record = json.loads(logs.output[0].split(":", 2)[2])
+        self.assertGreater(record["sql"]["count"], 0)
+
+    def test_command_prints_a_valid_header(self):
+        out = StringIO()
+        call_command("profiling_token", stdout=out, stderr=StringIO())
+
+        name, token = out.getvalue().strip().split(": ")
+        self.assertEqual(name, "X-Profile")
+        self.assertTrue(is_valid_profiling_token(token))
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework import generics
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from common.query_budget import (
+    QueryBudgetExceeded,
+    QueryBudgetMixin,
+    query_budget,
+)
+
+
+class UserCountView(QueryBudgetMixin, generics.GenericAPIView):
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+    query_budgets = {"get": 1}
+
+    def get(self, request):
+        users = get_user_model().objects
+        return Response({"count": users.count(), "any": users.exists()})
+
+    @query_budget(2)
+    def post(self, request):
+        users = get_user_model().objects
+        return Response({"count": users.count(), "any": users.exists()})
+
+
+class QueryBudgetMixinTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = UserCountView.as_view()
+
+    def test_counts_queries(self):
+        response = self.view(self.factory.post("/"))
+
+        self.assertEqual(response.query_count, 2)
+        self.assertEqual(response.query_budget, 2)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_strict_mode_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.view(self.factory.get("/"))
+
+    @override_settings(QUERY_BUDGET_STRICT=False, QUERY_BUDGET_LOG=True)
+    def test_violation_is_logged(self):
+        with self.assertLogs("common.query_budget", "WARNING") as logs:
+            response = self.view(self.factory.get("/"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ran 2 queries, budget is 1", logs.output[0])
@@ -0,0 +1,41 @@
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from common.metrics import CONTENT_TYPE, registry
+
+
+def is_allowed_address(address: str) -> bool:
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+
+    return any(
+        address in ipaddress.ip_network(network.strip(), strict=False)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+        if network.strip()
+    )
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint.
+
+    With ``METRICS_TOKEN`` set, scrapers must send it as a bearer token,
+    otherwise only clients in ``METRICS_ALLOWED_NETWORKS`` are served.
+    """
+    token = settings.METRICS_TOKEN
+
+    if token:
+        allowed = hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+    else:
+        allowed = is_allowed_address(request.META.get("REMOTE_ADDR", ""))
+
+    if not allowed:
+        return HttpResponseForbidden()
+
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
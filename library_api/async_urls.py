@@ -0,0 +1,15 @@
+from django.urls import path
+
+from books.async_views import book_detail, book_list
+from borrowings.async_views import borrowing_list
+from user.async_views import manage_user
+
+
+app_name = "async"
+
+urlpatterns = [
+    path("books/", book_list, name="book-list"),
+    path("books/<int:pk>/", book_detail, name="book-detail"),
+    path("borrowings/", borrowing_list, name="borrowing-list"),
+    path("user/me/", manage_user, name="user-manage"),
+]
@@ -1,6 +1,263 @@
-from rest_framework.pagination import LimitOffsetPagination
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    LimitOffsetPagination,
+)
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class LibraryLimitOffsetPagination(LimitOffsetPagination):
     default_limit = 5
     max_limit = 25
+
+    async def apaginate_queryset(
+        self,
+        queryset: QuerySet,
+        request: Request,
+        view=None
+    ) -> list | None:
+        """``paginate_queryset`` running the queries with the async ORM"""
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        if self.count == 0 or self.offset > self.count:
+            return []
+
+        page = queryset[self.offset:self.offset + self.limit]
+        return [obj async for obj in page.aiterator(chunk_size=self.limit)]
+
+
+class LibraryKeysetPagination(BasePagination):
+    """Cursor pagination over a stable ``(sort_key, id)`` ordering.
+
+    The cursor is an opaque token holding the sort values of the last row
+    of a page, so every page is a single index range scan with no
+    ``OFFSET`` and no ``COUNT(*)``.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    default_limit = 5
+    max_limit = 25
+    ordering = ("id",)
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering: tuple[str, ...] = None) -> None:
+        if ordering:
+            self.ordering = ordering
+
+        if self.ordering[-1].lstrip("-") != "id":
+            self.ordering = self.ordering + ("id",)
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet,
+        request: Request,
+        view=None
+    ) -> list:
+        page = self.get_page_queryset(queryset, request)
+        return self.finish_page(list(page))
+
+    async def apaginate_queryset(
+        self,
+        queryset: QuerySet,
+        request: Request,
+        view=None
+    ) -> list:
+        """``paginate_queryset`` running the query with the async ORM"""
+        page = self.get_page_queryset(queryset, request)
+        return self.finish_page([
+            obj async for obj in page.aiterator(chunk_size=self.limit + 1)
+        ])
+
+    def get_page_queryset(
+        self,
+        queryset: QuerySet,
+        request: Request
+    ) -> QuerySet:
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_limit(request)
+        self.model = queryset.model
+        self.position, self.reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.after(ordering, self.position))
+
+        return queryset[:self.limit + 1]
+
+    def finish_page(self, results: list) -> list:
+        position, reverse = self.position, self.reverse
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results:
+            if has_more or reverse:
+                self.next_position = self.get_position(results[-1])
+            if position is not None and (has_more or not reverse):
+                self.previous_position = self.get_position(results[0])
+
+        return results
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({
+            "next": self.get_link(self.next_position, reverse=False),
+            "previous": self.get_link(self.previous_position, reverse=True),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {
+                    "type": "string", "nullable": True, "format": "uri"
+                },
+                "results": schema,
+            },
+        }
+
+    def get_limit(self, request: Request) -> int:
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+
+        return min(max(limit, 1), self.max_limit)
+
+    @staticmethod
+    def invert(field: str) -> str:
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def after(ordering: tuple[str, ...], position: list) -> Q:
+        """Build ``(a, b) > (x, y)`` honouring per-field direction"""
+        condition = Q()
+        equal = Q()
+
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+
+        return condition
+
+    def get_position(self, instance) -> list:
+        return [
+            getattr(instance, field.lstrip("-")) for field in self.ordering
+        ]
+
+    def encode_cursor(self, position: list, reverse: bool) -> str:
+        payload = json.dumps(
+            {"p": position, "r": int(reverse)},
+            cls=DjangoJSONEncoder,
+            separators=(",", ":"),
+        )
+
+        return b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request: Request) -> tuple[list | None, bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None, False
+
+        try:
+            payload = json.loads(b64decode(encoded.encode(), validate=True))
+            position = [
+                self.model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(
+                    self.ordering, payload["p"], strict=True
+                )
+            ]
+        except (
+            BinasciiError,
+            ValueError,
+            KeyError,
+            TypeError,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, bool(payload.get("r"))
+
+    def get_link(self, position: list | None, reverse: bool) -> str | None:
+        if position is None:
+            return None
+
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            self.encode_cursor(position, reverse)
+        )
+
+
+class SelectablePaginationMixin:
+    """Let a viewset switch between offset and keyset pagination.
+
+    ``pagination_mode`` sets the default for the viewset, clients can
+    override it per request with ``?pagination=keyset|offset``.
+    """
+
+    pagination_mode = "offset"
+    pagination_query_param = "pagination"
+    keyset_ordering = ("id",)
+
+    def get_pagination_mode(self) -> str:
+        mode = self.request.query_params.get(self.pagination_query_param)
+
+        if mode in ("offset", "keyset"):
+            return mode
+
+        return self.pagination_mode
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.get_pagination_mode() != "keyset":
+                return super().paginator
+
+            self._paginator = LibraryKeysetPagination(
+                ordering=self.keyset_ordering
+            )
+
+        return self._paginator
+
+
+def get_paginator(request: Request, keyset_ordering: tuple[str, ...]):
+    """Paginator picked with ``?pagination=`` for views without a viewset"""
+    mode = request.query_params.get(
+        SelectablePaginationMixin.pagination_query_param
+    )
+
+    if mode == "keyset":
+        return LibraryKeysetPagination(ordering=keyset_ordering)
+
+    return LibraryLimitOffsetPagination()
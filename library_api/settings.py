@@ -59,18 +59,20 @@ INSTALLED_APPS = [
     "drf_spectacular",
     "django_celery_beat",
     "django_filters",
-    "debug_toolbar",
 
     # Custom apps
     "user",
     "books",
     "borrowings",
     "payments",
+    "benchmarks",
+    "common",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
+    "common.metrics.MetricsMiddleware",
+    "common.profiling.ProfilingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -79,6 +81,17 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# The toolbar middleware is sync only, in the middleware chain it would
+# push the async views of ``library_api.async_urls`` onto threads.
+DEBUG_TOOLBAR = os.getenv("DEBUG") == "True"
+
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("common.profiling.ProfilingMiddleware") + 1,
+        "debug_toolbar.middleware.DebugToolbarMiddleware",
+    )
+
 ROOT_URLCONF = "library_api.urls"
 
 TEMPLATES = [
@@ -116,6 +129,26 @@ if IS_PRODUCTION:
             "PORT": os.environ["POSTGRES_PORT"],
         }
     }
+
+    # Connections are checked before each use, both when they come out of
+    # the pool and when a persistent one is reused.
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+    # The pool also serves the threads ``sync_to_async`` runs ORM calls in
+    # under ASGI, where persistent connections would outlive the request.
+    if os.getenv("DATABASE_POOL", "True") == "True":
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", 2)),
+                "max_size": int(os.getenv("DATABASE_POOL_MAX_SIZE", 10)),
+                "timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", 10)),
+                "max_idle": float(os.getenv("DATABASE_POOL_MAX_IDLE", 600)),
+            },
+        }
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = int(
+            os.getenv("DATABASE_CONN_MAX_AGE", 0)
+        )
 else:
     DATABASES = {
         "default": {
@@ -203,14 +236,118 @@ SIMPLE_JWT = {
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = os.getenv("REDIS_PORT", "6379")
 
+if IS_PRODUCTION:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/1",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 CELERY_BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
 CELERY_RESULT_BACKEND = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
 CELERY_TIMEZONE = "Europe/Kiev"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
+CELERY_BEAT_SCHEDULE = {
+    "relay-borrowing-outbox": {
+        "task": "borrowings.tasks.relay_borrowing_outbox",
+        "schedule": 60.0,
+    },
+    "apply-stripe-events": {
+        "task": "payments.tasks.apply_stripe_events",
+        "schedule": 60.0,
+    },
+    "reconcile-stripe-payments": {
+        "task": "payments.tasks.reconcile_stripe_payments",
+        "schedule": 60.0 * 60,
+    },
+}
+OVERDUE_INCREMENTAL = os.getenv("OVERDUE_INCREMENTAL") == "True"
+
+BOT_NOTIFY_TIMEOUT = float(os.getenv("BOT_NOTIFY_TIMEOUT", 5))
+BOT_NOTIFY_CONNECT_TIMEOUT = float(os.getenv("BOT_NOTIFY_CONNECT_TIMEOUT", 2))
+BOT_NOTIFY_MAX_CONNECTIONS = int(os.getenv("BOT_NOTIFY_MAX_CONNECTIONS", 10))
+BOT_NOTIFY_KEEPALIVE_EXPIRY = float(
+    os.getenv("BOT_NOTIFY_KEEPALIVE_EXPIRY", 30)
+)
 
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
 ENDPOINT_SECRET_WEBHOOK = os.getenv("ENDPOINT_SECRET_WEBHOOK")
+STRIPE_LAZY_CHECKOUT = os.getenv("STRIPE_LAZY_CHECKOUT") == "True"
+STRIPE_WEBHOOK_ASYNC = os.getenv("STRIPE_WEBHOOK_ASYNC") == "True"
+STRIPE_EVENT_DRAIN_DELAY = int(os.getenv("STRIPE_EVENT_DRAIN_DELAY", 2))
+STRIPE_TIMEOUT = int(os.getenv("STRIPE_TIMEOUT", 10))
+STRIPE_SESSION_CACHE_TIMEOUT = int(
+    os.getenv("STRIPE_SESSION_CACHE_TIMEOUT", 60)
+)
+STRIPE_BREAKER_THRESHOLD = int(os.getenv("STRIPE_BREAKER_THRESHOLD", 5))
+STRIPE_BREAKER_RESET_TIMEOUT = float(
+    os.getenv("STRIPE_BREAKER_RESET_TIMEOUT", 30)
+)
 
 SITE_URL = "http://localhost:8001/"
+
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT") == "True"
+QUERY_BUDGET_LOG = (
+    os.getenv("QUERY_BUDGET_LOG", os.getenv("DEBUG", "False")) == "True"
+)
+# Benchmarks insert and modify rows, they only run against a database
+# marked as dedicated to them, or in debug mode.
+BENCHMARK_DATABASE = (
+    os.getenv("BENCHMARK_DATABASE", os.getenv("DEBUG", "False")) == "True"
+)
+
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_HEADER = "X-Profile"
+PROFILING_TOKEN_MAX_AGE = int(os.getenv("PROFILING_TOKEN_MAX_AGE", 60 * 60))
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", 5))
+PROFILING_SLOW_MS = float(os.getenv("PROFILING_SLOW_MS", 500))
+PROFILING_TOP_FRAMES = int(os.getenv("PROFILING_TOP_FRAMES", 25))
+# Profiles go to stderr unless a rotating log file is configured.
+PROFILING_LOG_FILE = os.getenv("PROFILING_LOG_FILE")
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# Without a token, only these networks may scrape the metrics.
+METRICS_ALLOWED_NETWORKS = os.getenv(
+    "METRICS_ALLOWED_NETWORKS", "127.0.0.1/32,::1/128"
+).split(",")
+METRICS_MULTIPROCESS_DIR = os.getenv("METRICS_MULTIPROCESS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "slow_requests": (
+            {
+                "class": "logging.handlers.RotatingFileHandler",
+                "filename": PROFILING_LOG_FILE,
+                "maxBytes": 10 * 1024 * 1024,
+                "backupCount": 5,
+                "delay": True,
+            }
+            if PROFILING_LOG_FILE
+            else {"class": "logging.StreamHandler"}
+        ),
+    },
+    "loggers": {
+        "library_api.profiling": {
+            "handlers": ["slow_requests"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
+BOOK_SEARCH_INDEX = os.getenv("BOOK_SEARCH_INDEX", "True") == "True"
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", 60 * 15))
+BORROWING_CACHE_TIMEOUT = int(os.getenv("BORROWING_CACHE_TIMEOUT", 60 * 5))
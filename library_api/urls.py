@@ -14,7 +14,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from debug_toolbar.toolbar import debug_toolbar_urls
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import (
@@ -23,9 +23,12 @@ from drf_spectacular.views import (
     SpectacularRedocView
 )
 
+from common.views import metrics_view
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics/", metrics_view, name="metrics"),
     path("api/v1/user/", include("user.urls", namespace="user")),
     path("api/v1/books/", include("books.urls", namespace="books")),
     path(
@@ -36,6 +39,10 @@ urlpatterns = [
         "api/v1/payments/",
         include("payments.urls", namespace="payments")
     ),
+    path(
+        "api/v1/async/",
+        include("library_api.async_urls", namespace="async")
+    ),
     path("api/v1/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
         "api/v1/schema/swagger-ui/",
@@ -47,4 +54,9 @@ urlpatterns = [
         SpectacularRedocView.as_view(url_name="schema"),
         name="redoc",
     ),
-] + debug_toolbar_urls()
+]
+
+if settings.DEBUG_TOOLBAR:
+    from debug_toolbar.toolbar import debug_toolbar_urls
+
+    urlpatterns += debug_toolbar_urls()
@@ -1,3 +1,5 @@
 from django.contrib import admin
 
-# Register your models here.
+from payments.models import StripeEvent
+
+admin.site.register(StripeEvent)
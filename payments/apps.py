@@ -1,6 +1,14 @@
+import os
+
 from django.apps import AppConfig
 
 
 class PaymentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "payments"
+
+    def ready(self) -> None:
+        from payments.gateway import configure_http_client
+
+        configure_http_client()
+        os.register_at_fork(after_in_child=configure_http_client)
@@ -0,0 +1,247 @@
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Iterator
+
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+
+from common.metrics import external_call_duration
+
+
+SESSION_CACHE_KEY = "payments:stripe-session:{}"
+LATENCY_SAMPLES = 500
+
+# Errors that say Stripe is unreachable or struggling, as opposed to
+# errors about the request itself.
+AVAILABILITY_ERRORS = (
+    stripe.error.APIConnectionError,
+    stripe.error.APIError,
+    stripe.error.RateLimitError,
+)
+
+
+class StripeUnavailable(stripe.error.StripeError):
+    pass
+
+
+class CircuitBreaker:
+    """Stop calling Stripe after repeated failures.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast for ``reset_timeout`` seconds, then a single trial call
+    is let through to decide whether to close it again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+
+            if state == "closed":
+                return True
+
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return True
+
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.reset()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+
+            if (
+                self.opened_at is not None
+                or self.failures >= self.failure_threshold
+            ):
+                self.opened_at = time.monotonic()
+
+
+class LatencyStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.samples = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+
+    def record(self, operation: str, seconds: float, failed: bool) -> None:
+        with self._lock:
+            self.calls[operation] += 1
+            self.errors[operation] += failed
+            self.samples[operation].append(seconds)
+
+    @staticmethod
+    def percentile(samples: list, percent: int) -> float:
+        index = round(percent / 100 * (len(samples) - 1))
+        return sorted(samples)[index]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = {
+                operation: list(values)
+                for operation, values in self.samples.items()
+            }
+
+            return {
+                operation: {
+                    "calls": self.calls[operation],
+                    "errors": self.errors[operation],
+                    "p50_ms": self.percentile(values, 50) * 1000,
+                    "p95_ms": self.percentile(values, 95) * 1000,
+                    "max_ms": max(values) * 1000,
+                }
+                for operation, values in samples.items()
+            }
+
+
+def configure_http_client() -> None:
+    """Share one keep-alive client with a short timeout for all calls"""
+    stripe.default_http_client = stripe.RequestsClient(
+        timeout=settings.STRIPE_TIMEOUT
+    )
+
+
+def serialize_session(session, session_id: str) -> dict:
+    customer = getattr(session, "customer_details", None)
+
+    return {
+        "id": getattr(session, "id", session_id),
+        "payment_status": getattr(session, "payment_status", None),
+        "customer": {
+            "name": getattr(customer, "name", None),
+            "email": getattr(customer, "email", None),
+        },
+    }
+
+
+class StripeGateway:
+    """Single entry point for the Stripe calls made by ``payments``"""
+
+    def __init__(self) -> None:
+        self.breaker = CircuitBreaker(
+            settings.STRIPE_BREAKER_THRESHOLD,
+            settings.STRIPE_BREAKER_RESET_TIMEOUT,
+        )
+        self.latency = LatencyStats()
+
+    def reset(self) -> None:
+        self.breaker.reset()
+        self.latency.reset()
+
+    def call(self, operation: str, method, *args, **kwargs):
+        if not self.breaker.allow():
+            raise StripeUnavailable("Stripe is temporarily unavailable")
+
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        started = time.perf_counter()
+        failed = False
+
+        try:
+            result = method(*args, **kwargs)
+        except AVAILABILITY_ERRORS as error:
+            failed = True
+            self.breaker.record_failure()
+            raise StripeUnavailable(str(error)) from error
+        except stripe.error.StripeError:
+            failed = True
+            self.breaker.record_success()
+            raise
+        else:
+            self.breaker.record_success()
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            self.latency.record(operation, elapsed, failed)
+            external_call_duration.observe(
+                elapsed,
+                target="stripe",
+                operation=operation,
+                outcome="error" if failed else "success",
+            )
+
+    def create_session(self, **params) -> stripe.checkout.Session:
+        return self.call(
+            "checkout.session.create",
+            stripe.checkout.Session.create,
+            **params
+        )
+
+    def retrieve_session(self, session_id: str) -> dict:
+        """Checkout session details, cached for a short while"""
+        cache_key = SESSION_CACHE_KEY.format(session_id)
+        session = cache.get(cache_key)
+
+        if session is None:
+            session = serialize_session(
+                self.call(
+                    "checkout.session.retrieve",
+                    stripe.checkout.Session.retrieve,
+                    session_id,
+                ),
+                session_id,
+            )
+            cache.set(
+                cache_key, session, settings.STRIPE_SESSION_CACHE_TIMEOUT
+            )
+
+        return session
+
+    def iter_sessions(self, **params) -> Iterator[stripe.checkout.Session]:
+        """Checkout sessions matching ``params``, one gateway call per page"""
+        while True:
+            page = self.call(
+                "checkout.session.list", stripe.checkout.Session.list, **params
+            )
+            yield from page.data
+
+            if not (page.has_more and page.data):
+                return
+
+            params["starting_after"] = page.data[-1].id
+
+    @staticmethod
+    def invalidate_sessions(session_ids) -> None:
+        cache.delete_many([
+            SESSION_CACHE_KEY.format(session_id)
+            for session_id in session_ids
+        ])
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "operations": self.latency.snapshot(),
+        }
+
+
+stripe_gateway = StripeGateway()
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from payments.reconciliation import (
+    RECONCILE_CHUNK_SIZE,
+    RECONCILE_DAYS,
+    reconcile_payments,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark pending payments as paid when their Stripe Checkout session "
+        "was paid but the webhook never arrived"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=datetime.fromisoformat,
+            help="Start of the session creation window (ISO 8601)",
+        )
+        parser.add_argument(
+            "--until",
+            type=datetime.fromisoformat,
+            help="End of the session creation window (ISO 8601)",
+        )
+        parser.add_argument("--days", type=int, default=RECONCILE_DAYS)
+        parser.add_argument(
+            "--chunk-size", type=int, default=RECONCILE_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        until = options["until"] or timezone.now()
+        since = options["since"] or until - timedelta(days=options["days"])
+
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        if timezone.is_naive(until):
+            until = timezone.make_aware(until)
+
+        if since >= until:
+            raise CommandError("--since must be earlier than --until")
+
+        result = reconcile_payments(since, until, options["chunk_size"])
+
+        self.stdout.write(
+            f"{result['paid_sessions']} paid sessions checked, "
+            f"{result['updated']} payments marked as paid."
+        )
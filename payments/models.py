@@ -24,7 +24,9 @@ class Payment(models.Model):
         related_name="payments"
     )
     session_url = models.URLField(max_length=511, null=True, blank=True)
-    session_id = models.CharField(max_length=511, null=True, blank=True)
+    session_id = models.CharField(
+        max_length=511, null=True, blank=True, db_index=True
+    )
     money_to_pay = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
@@ -37,3 +39,34 @@ class Payment(models.Model):
                 name="unique_borrowing_session_id"
             )
         ]
+
+
+class StripeEvent(models.Model):
+    """Stripe webhook event, stored once per event id"""
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "PENDING", _("Pending")
+        PROCESSED = "PROCESSED", _("Processed")
+
+    event_id = models.CharField(max_length=255, primary_key=True)
+    type = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=9,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PROCESSED
+    )
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["received_at"],
+                condition=models.Q(status="PENDING"),
+                name="stripe_event_pending_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.type} - {self.event_id}"
@@ -0,0 +1,65 @@
+from datetime import datetime
+from itertools import islice
+from typing import Iterator
+
+from borrowings.cache import invalidate_payment_owners
+from payments.gateway import stripe_gateway
+from payments.models import Payment
+
+
+STRIPE_PAGE_SIZE = 100
+RECONCILE_CHUNK_SIZE = 500
+RECONCILE_DAYS = 2
+
+
+def iter_paid_session_ids(
+    created_gte: datetime, created_lt: datetime
+) -> Iterator[str]:
+    """Page through Checkout sessions created in the window, newest first"""
+    sessions = stripe_gateway.iter_sessions(
+        created={
+            "gte": int(created_gte.timestamp()),
+            "lt": int(created_lt.timestamp()),
+        },
+        limit=STRIPE_PAGE_SIZE,
+    )
+
+    for session in sessions:
+        if session.payment_status == "paid":
+            yield session.id
+
+
+def mark_sessions_paid(session_ids: list[str]) -> int:
+    updated = Payment.objects.filter(
+        session_id__in=session_ids,
+        status=Payment.StatusChoices.PENDING,
+    ).update(status=Payment.StatusChoices.PAID)
+
+    if updated:
+        stripe_gateway.invalidate_sessions(session_ids)
+        invalidate_payment_owners(
+            Payment.objects.filter(session_id__in=session_ids)
+        )
+
+    return updated
+
+
+def reconcile_payments(
+    created_gte: datetime,
+    created_lt: datetime,
+    chunk_size: int = RECONCILE_CHUNK_SIZE,
+) -> dict:
+    """Mark pending payments whose Stripe session is paid as paid.
+
+    Sessions are streamed page by page and matched against our payments
+    ``chunk_size`` ids at a time, so memory stays bounded by the chunk and
+    Stripe is called once per page of sessions.
+    """
+    session_ids = iter_paid_session_ids(created_gte, created_lt)
+    paid_sessions = updated = 0
+
+    while chunk := list(islice(session_ids, chunk_size)):
+        paid_sessions += len(chunk)
+        updated += mark_sessions_paid(chunk)
+
+    return {"paid_sessions": paid_sessions, "updated": updated}
@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from borrowings.cache import invalidate_payment_owners
+from payments.gateway import stripe_gateway
+from payments.models import Payment, StripeEvent
+from payments.reconciliation import RECONCILE_DAYS, reconcile_payments
+
+
+STRIPE_EVENT_BATCH_SIZE = 500
+CHECKOUT_COMPLETED = "checkout.session.completed"
+STRIPE_EVENT_DRAIN_KEY = "payments:stripe_events:drain"
+# Lets webhooks schedule again if a queued drain was lost, beat still
+# catches up on their events meanwhile.
+STRIPE_EVENT_DRAIN_LOCK_TIMEOUT = 60
+
+
+def apply_stripe_event_batch(batch_size: int) -> int:
+    with transaction.atomic():
+        events = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=StripeEvent.StatusChoices.PENDING)
+            .order_by("received_at")[:batch_size]
+        )
+
+        session_ids = {
+            event.payload["id"]
+            for event in events
+            if event.type == CHECKOUT_COMPLETED
+        }
+        payments = list(
+            Payment.objects.select_for_update().filter(
+                session_id__in=session_ids,
+                status=Payment.StatusChoices.PENDING,
+            )
+        )
+        for payment in payments:
+            payment.status = Payment.StatusChoices.PAID
+        Payment.objects.bulk_update(payments, ["status"])
+        stripe_gateway.invalidate_sessions(session_ids)
+        if payments:
+            invalidate_payment_owners(
+                Payment.objects.filter(
+                    id__in=[payment.id for payment in payments]
+                )
+            )
+
+        processed_at = timezone.now()
+        for event in events:
+            event.status = StripeEvent.StatusChoices.PROCESSED
+            event.processed_at = processed_at
+        StripeEvent.objects.bulk_update(events, ["status", "processed_at"])
+
+    return len(events)
+
+
+@shared_task
+def apply_stripe_events(batch_size: int = STRIPE_EVENT_BATCH_SIZE) -> int:
+    """Apply queued Stripe webhook events to payments in batches"""
+    # Released before reading, so an event committed from now on schedules
+    # the next drain and one committed earlier is seen by this one.
+    cache.delete(STRIPE_EVENT_DRAIN_KEY)
+    applied = 0
+
+    while True:
+        batch = apply_stripe_event_batch(batch_size)
+        applied += batch
+
+        if batch < batch_size:
+            return applied
+
+
+def schedule_stripe_event_drain() -> bool:
+    """Queue one drain for all webhooks arriving until it starts"""
+    if not cache.add(
+        STRIPE_EVENT_DRAIN_KEY, True, STRIPE_EVENT_DRAIN_LOCK_TIMEOUT
+    ):
+        return False
+
+    apply_stripe_events.apply_async(
+        countdown=settings.STRIPE_EVENT_DRAIN_DELAY
+    )
+    return True
+
+
+@shared_task
+def reconcile_stripe_payments(days: int = RECONCILE_DAYS) -> dict:
+    """Catch up on payments whose webhook never arrived"""
+    now = timezone.now()
+
+    return reconcile_payments(now - timedelta(days=days), now)
@@ -0,0 +1,127 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import stripe
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: dict) -> None:
+        content = json.dumps(body).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {
+            key: values[0] for key, values in parse_qs(url.query).items()
+        }
+        self.server.fake.requests.append((url.path, params))
+
+        if url.path == "/v1/checkout/sessions":
+            return self.send_json(200, self.server.fake.list_sessions(params))
+
+        if url.path.startswith("/v1/checkout/sessions/"):
+            session = self.server.fake.get_session(url.path.rsplit("/", 1)[1])
+            if session:
+                return self.send_json(200, session)
+
+        self.send_json(
+            404,
+            {"error": {"type": "invalid_request_error", "message": "Not found"}}
+        )
+
+
+class FakeStripe:
+    """Minimal local Stripe API serving Checkout sessions.
+
+    Used as a context manager, it points the ``stripe`` client at itself
+    for the duration of the block.
+    """
+
+    def __init__(self) -> None:
+        self.sessions = []
+        self.requests = []
+
+    def add_session(
+        self,
+        session_id: str,
+        created: int,
+        payment_status: str = "paid",
+        **fields
+    ) -> dict:
+        session = {
+            "id": session_id,
+            "object": "checkout.session",
+            "created": created,
+            "payment_status": payment_status,
+            "status": "complete" if payment_status == "paid" else "open",
+            **fields,
+        }
+        self.sessions.append(session)
+        return session
+
+    def get_session(self, session_id: str) -> dict | None:
+        for session in self.sessions:
+            if session["id"] == session_id:
+                return session
+
+        return None
+
+    def list_sessions(self, params: dict) -> dict:
+        sessions = sorted(
+            self.sessions,
+            key=lambda session: (session["created"], session["id"]),
+            reverse=True,
+        )
+
+        if "created[gte]" in params:
+            sessions = [
+                session for session in sessions
+                if session["created"] >= int(params["created[gte]"])
+            ]
+        if "created[lt]" in params:
+            sessions = [
+                session for session in sessions
+                if session["created"] < int(params["created[lt]"])
+            ]
+        if "starting_after" in params:
+            ids = [session["id"] for session in sessions]
+            sessions = sessions[ids.index(params["starting_after"]) + 1:]
+
+        limit = int(params.get("limit", 10))
+
+        return {
+            "object": "list",
+            "url": "/v1/checkout/sessions",
+            "has_more": len(sessions) > limit,
+            "data": sessions[:limit],
+        }
+
+    def __enter__(self) -> "FakeStripe":
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStripeHandler)
+        self.server.fake = self
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+
+        self.previous = stripe.api_base, stripe.api_key
+        stripe.api_base = f"http://127.0.0.1:{self.server.server_port}"
+        stripe.api_key = "sk_test_fake"
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        stripe.api_base, stripe.api_key = self.previous
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
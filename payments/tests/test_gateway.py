@@ -0,0 +1,61 @@
+from unittest.mock import Mock, patch
+
+import stripe
+from django.test import SimpleTestCase
+
+from common.metrics import external_call_duration
+from payments.gateway import CircuitBreaker, StripeGateway, StripeUnavailable
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, "closed")
+
+    @patch("payments.gateway.time.monotonic")
+    def test_half_open_lets_one_trial_call_through(self, monotonic):
+        monotonic.return_value = 100
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+        monotonic.return_value = 131
+        self.assertEqual(self.breaker.state, "half-open")
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+
+        monotonic.return_value = 162
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, "closed")
+
+
+class StripeGatewayMetricsTests(SimpleTestCase):
+    def test_calls_are_timed_by_outcome(self):
+        gateway = StripeGateway()
+        failing = Mock(side_effect=stripe.error.APIConnectionError("down"))
+        key = ("stripe", "checkout.session.retrieve", "error")
+        counts, total = external_call_duration.series.get(key, ([0], 0))
+        calls = sum(counts)
+
+        with self.assertRaises(StripeUnavailable):
+            gateway.call("checkout.session.retrieve", failing, "cs_test")
+
+        counts, total = external_call_duration.series[key]
+        self.assertEqual(sum(counts), calls + 1)
@@ -1,21 +1,30 @@
 import datetime
 from dataclasses import dataclass
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch
 
 import stripe
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from books.models import Book
 from borrowings.models import Borrowing
-from payments.models import Payment
+from borrowings.tasks import relay_borrowing_outbox
+from common.testing import QueryBudgetTestMixin, jwt_headers
+from payments.gateway import stripe_gateway
+from payments.models import Payment, StripeEvent
 from payments.serializers import (
     PaymentListSerializer,
     PaymentRetrieveSerializer,
 )
+from payments.tasks import apply_stripe_events
+from payments.utils import attach_checkout_session
 from payments.views import PaymentViewSet
 
 
@@ -36,6 +45,22 @@ def get_cancel(payment_id: int) -> str:
     return reverse("payments:payment-cancel", args=[payment_id])
 
 
+def get_checkout(payment_id: int) -> str:
+    return reverse("payments:payment-checkout", args=[payment_id])
+
+
+WEBHOOK_URL = reverse("payments:stripe-webhook")
+STRIPE_STATS_URL = reverse("payments:payment-stripe-stats")
+
+
+def sample_event(session_id: str, event_id: str = "evt_1") -> dict:
+    return {
+        "id": event_id,
+        "type": "checkout.session.completed",
+        "data": {"object": {"id": session_id}},
+    }
+
+
 @dataclass
 class SessionStripe:
     id: str
@@ -56,8 +81,10 @@ class SuccessSessionTest:
 class PaymentAPITests(TestCase):
 
     @patch("stripe.checkout.Session.create")
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def setUp(self, mocked_notify, mock_create_session):
+        cache.clear()
+        stripe_gateway.reset()
         mock_create_session.return_value = SessionStripe(
             id="fake_session_id",
             url="https://fake-stripe-url.com"
@@ -90,6 +117,7 @@ class PaymentAPITests(TestCase):
             borrow_date="2023-10-01",
             expected_return_date="2023-10-10",
         )
+        relay_borrowing_outbox()
 
     def test_list_payments_user(self):
         self.client.force_authenticate(self.user)
@@ -132,8 +160,10 @@ class PaymentViewSetTests(TestCase):
 
 class PaymentSuccessCancelTests(TestCase):
     @patch("stripe.checkout.Session.create")
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def setUp(self, mocked_notify, mock_create_session):
+        cache.clear()
+        stripe_gateway.reset()
         mock_create_session.return_value = SessionStripe(
             id="fake_session_id",
             url="https://fake-stripe-url.com"
@@ -200,11 +230,92 @@ class PaymentSuccessCancelTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data["detail"], "Some error occurred")
 
+    @patch("stripe.checkout.Session.retrieve")
+    def test_payment_success_is_cached(self, mock_stripe_retrieve):
+        mock_stripe_retrieve.return_value = SuccessSessionTest(
+            CustomerDetailsTest(name="Maks", email="test@test.com")
+        )
+
+        self.client.get(get_success(self.payment.id))
+        response = self.client.get(get_success(self.payment.id))
+
+        self.assertEqual(response.data["customer"]["name"], "Maks")
+        mock_stripe_retrieve.assert_called_once()
+
+    @patch("stripe.checkout.Session.retrieve")
+    def test_webhook_invalidates_cached_session(self, mock_stripe_retrieve):
+        mock_stripe_retrieve.return_value = SuccessSessionTest(
+            CustomerDetailsTest(name="Maks", email="test@test.com")
+        )
+        self.client.get(get_success(self.payment.id))
+
+        with patch(
+            "stripe.Webhook.construct_event",
+            return_value=sample_event("test_session_id"),
+        ):
+            self.client.post(
+                WEBHOOK_URL,
+                data=b"{}",
+                content_type="application/json",
+                HTTP_STRIPE_SIGNATURE="signature",
+            )
+        self.client.get(get_success(self.payment.id))
+
+        self.assertEqual(mock_stripe_retrieve.call_count, 2)
+
+    @patch("stripe.checkout.Session.retrieve")
+    def test_payment_success_falls_back_when_stripe_is_down(
+        self, mock_stripe_retrieve
+    ):
+        mock_stripe_retrieve.side_effect = stripe.error.APIConnectionError(
+            "Connection refused"
+        )
+
+        for _ in range(settings.STRIPE_BREAKER_THRESHOLD + 2):
+            response = self.client.get(get_success(self.payment.id))
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                response.data["payment"],
+                {"payment_id": self.payment.id, "status": "PAID"}
+            )
+
+        self.assertEqual(
+            mock_stripe_retrieve.call_count, settings.STRIPE_BREAKER_THRESHOLD
+        )
+        self.assertEqual(stripe_gateway.stats()["circuit"], "open")
+
+    @patch("stripe.checkout.Session.retrieve")
+    def test_stripe_stats(self, mock_stripe_retrieve):
+        mock_stripe_retrieve.return_value = SuccessSessionTest(
+            CustomerDetailsTest(name="Maks", email="test@test.com")
+        )
+        self.client.get(get_success(self.payment.id))
+
+        response = self.client.get(STRIPE_STATS_URL)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(
+            User.objects.create_superuser(
+                email="admin@test.com", password="test1234"
+            )
+        )
+        response = self.client.get(STRIPE_STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["circuit"], "closed")
+        self.assertEqual(
+            response.data["operations"]["checkout.session.retrieve"]["calls"],
+            1
+        )
+
 
 class PaymentCancelTests(TestCase):
     @patch("stripe.checkout.Session.create")
-    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    @patch("httpx.Client.post")
     def setUp(self, mocked_notify, mock_create_session):
+        cache.clear()
+        stripe_gateway.reset()
         mock_create_session.return_value = SessionStripe(
             id="fake_session_id",
             url="https://fake-stripe-url.com"
@@ -284,3 +395,378 @@ class PaymentCancelTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data["detail"], "Session ID is required")
+
+
+@override_settings(STRIPE_LAZY_CHECKOUT=True)
+class LazyCheckoutTests(TestCase):
+    @patch("httpx.Client.post")
+    def setUp(self, mocked_notify):
+        cache.clear()
+        stripe_gateway.reset()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="password123",
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Author Name",
+            cover="HARD",
+            inventory=10,
+            daily_fee=5.00,
+        )
+
+        with patch("stripe.checkout.Session.create") as mock_create_session:
+            self.borrowing = Borrowing.objects.create(
+                user=self.user,
+                book=self.book,
+                expected_return_date=(
+                    datetime.date.today() + datetime.timedelta(days=3)
+                ),
+            )
+            relay_borrowing_outbox()
+
+        mock_create_session.assert_not_called()
+        self.payment = self.borrowing.payments.get()
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_payment_is_created_without_session(self):
+        self.assertIsNone(self.payment.session_id)
+        self.assertEqual(self.payment.status, "PENDING")
+
+    @patch("stripe.checkout.Session.create")
+    def test_checkout_creates_session_once(self, mock_create_session):
+        mock_create_session.return_value = SessionStripe(
+            id="lazy_session_id",
+            url="https://fake-stripe-url.com"
+        )
+
+        first = self.client.post(get_checkout(self.payment.id))
+        second = self.client.post(get_checkout(self.payment.id))
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["session_id"], "lazy_session_id")
+        self.assertEqual(second.data, first.data)
+        mock_create_session.assert_called_once()
+        self.assertEqual(
+            mock_create_session.call_args.kwargs["idempotency_key"],
+            f"payment-{self.payment.id}-checkout"
+        )
+
+    @patch("stripe.checkout.Session.create")
+    def test_retrieve_creates_session(self, mock_create_session):
+        mock_create_session.return_value = SessionStripe(
+            id="lazy_session_id",
+            url="https://fake-stripe-url.com"
+        )
+
+        response = self.client.get(get_detail(self.payment.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["session_id"], "lazy_session_id")
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.session_id, "lazy_session_id")
+
+    @patch("stripe.checkout.Session.create")
+    def test_new_session_shows_in_cached_borrowing(self, mock_create_session):
+        mock_create_session.return_value = SessionStripe(
+            id="cs_1",
+            url="https://fake-stripe-url.com"
+        )
+        borrowing_url = reverse(
+            "borrowings:borrowings-detail", args=[self.borrowing.id]
+        )
+        before = self.client.get(borrowing_url)
+
+        self.client.get(get_detail(self.payment.id))
+        after = self.client.get(borrowing_url)
+
+        self.assertIsNone(before.json()["payments"][0]["session_id"])
+        self.assertEqual(after.json()["payments"][0]["session_id"], "cs_1")
+
+    @patch("stripe.checkout.Session.create")
+    def test_concurrent_session_is_kept(self, mock_create_session):
+        stale = Payment.objects.get(pk=self.payment.pk)
+        Payment.objects.filter(pk=self.payment.pk).update(
+            session_id="first_session_id",
+            session_url="https://first-stripe-url.com",
+        )
+        mock_create_session.return_value = SessionStripe(
+            id="second_session_id",
+            url="https://second-stripe-url.com"
+        )
+
+        attach_checkout_session(stale)
+
+        self.assertEqual(stale.session_id, "first_session_id")
+        self.assertEqual(
+            Payment.objects.get(pk=self.payment.pk).session_id,
+            "first_session_id"
+        )
+
+    @patch("stripe.checkout.Session.create")
+    def test_retrieve_stays_within_budget(self, mock_create_session):
+        mock_create_session.return_value = SessionStripe(
+            id="lazy_session_id",
+            url="https://fake-stripe-url.com"
+        )
+
+        with self.settings(QUERY_BUDGET_STRICT=True):
+            response = self.client.get(get_detail(self.payment.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_checkout_of_other_user_payment(self):
+        self.client.force_authenticate(
+            User.objects.create_user(
+                email="other@example.com", password="password123"
+            )
+        )
+
+        response = self.client.post(get_checkout(self.payment.id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class StripeWebhookTests(TestCase):
+    @patch("stripe.checkout.Session.create")
+    @patch("httpx.Client.post")
+    def setUp(self, mocked_notify, mock_create_session):
+        cache.clear()
+        stripe_gateway.reset()
+        mock_create_session.return_value = SessionStripe(
+            id="webhook_session_id",
+            url="https://fake-stripe-url.com"
+        )
+        self.user = User.objects.create_user(
+            email="user@test.com", password="test1234"
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Author Name",
+            cover="HARD",
+            inventory=10,
+            daily_fee=5.00,
+        )
+        self.borrowing = Borrowing.objects.create(
+            book=self.book,
+            user=self.user,
+            expected_return_date=(
+                datetime.date.today() + datetime.timedelta(days=3)
+            ),
+        )
+        relay_borrowing_outbox()
+        self.payment = self.borrowing.payments.get()
+
+    def post_event(self, event):
+        with patch("stripe.Webhook.construct_event", return_value=event):
+            return self.client.post(
+                WEBHOOK_URL,
+                data=b"{}",
+                content_type="application/json",
+                HTTP_STRIPE_SIGNATURE="signature",
+            )
+
+    def test_completed_session_marks_payment_paid(self):
+        response = self.post_event(sample_event("webhook_session_id"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {"status": "success"})
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PAID)
+        self.assertTrue(StripeEvent.objects.filter(event_id="evt_1").exists())
+
+    def test_redelivered_event_is_skipped(self):
+        self.post_event(sample_event("webhook_session_id"))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_event(sample_event("webhook_session_id"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {"status": "duplicate"})
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        self.assertFalse(
+            any("payments_payment" in query["sql"] for query in queries)
+        )
+
+    def test_paid_payment_is_not_updated_again(self):
+        Payment.objects.filter(pk=self.payment.pk).update(
+            status=Payment.StatusChoices.PAID
+        )
+
+        response = self.post_event(
+            sample_event("webhook_session_id", event_id="evt_2")
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            Payment.objects.get(pk=self.payment.pk).status,
+            Payment.StatusChoices.PAID
+        )
+
+    def test_unknown_session_is_ignored(self):
+        response = self.post_event(sample_event("unknown_session_id"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PENDING)
+
+    def test_invalid_signature(self):
+        with patch(
+            "stripe.Webhook.construct_event",
+            side_effect=stripe.error.SignatureVerificationError(
+                "Bad signature", "signature"
+            ),
+        ):
+            response = self.client.post(
+                WEBHOOK_URL,
+                data=b"{}",
+                content_type="application/json",
+                HTTP_STRIPE_SIGNATURE="signature",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StripeEvent.objects.exists())
+
+
+@override_settings(STRIPE_WEBHOOK_ASYNC=True)
+class AsyncStripeWebhookTests(StripeWebhookTests):
+    def test_completed_session_marks_payment_paid(self):
+        with patch(
+            "payments.tasks.apply_stripe_events.apply_async"
+        ) as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.post_event(
+                    sample_event("webhook_session_id")
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {"status": "queued"})
+        apply_async.assert_called_once()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PENDING)
+        self.assertEqual(
+            StripeEvent.objects.get().status,
+            StripeEvent.StatusChoices.PENDING
+        )
+
+        self.assertEqual(apply_stripe_events(), 1)
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PAID)
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.status, StripeEvent.StatusChoices.PROCESSED)
+        self.assertIsNotNone(event.processed_at)
+        self.assertEqual(apply_stripe_events(), 0)
+
+    def test_burst_of_webhooks_schedules_one_drain(self):
+        with patch(
+            "payments.tasks.apply_stripe_events.apply_async"
+        ) as apply_async:
+            for index in range(3):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.post_event(sample_event(
+                        "webhook_session_id", event_id=f"evt_{index}"
+                    ))
+
+            apply_async.assert_called_once()
+
+            self.assertEqual(apply_stripe_events(), 3)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post_event(
+                    sample_event("webhook_session_id", event_id="evt_late")
+                )
+
+        self.assertEqual(apply_async.call_count, 2)
+
+    def test_unknown_session_is_ignored(self):
+        self.post_event(sample_event("unknown_session_id"))
+
+        self.assertEqual(apply_stripe_events(), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PENDING)
+
+    def test_events_are_applied_in_batches(self):
+        for index in range(5):
+            self.post_event(
+                sample_event("webhook_session_id", event_id=f"evt_{index}")
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(apply_stripe_events(batch_size=2), 5)
+
+        updates = [
+            query["sql"] for query in queries
+            if query["sql"].startswith('UPDATE "payments_payment"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            Payment.objects.get(pk=self.payment.pk).status,
+            Payment.StatusChoices.PAID
+        )
+        self.assertFalse(
+            StripeEvent.objects.filter(
+                status=StripeEvent.StatusChoices.PENDING
+            ).exists()
+        )
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class PaymentQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@test.com", password="test1234"
+        )
+        self.admin = User.objects.create_superuser(
+            email="admin@test.com", password="test1234"
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Author Name",
+            cover="HARD",
+            inventory=10,
+            daily_fee=5.00,
+        )
+        self.client = APIClient()
+        self.add_payments(1)
+
+    def add_payments(self, count=5):
+        borrowings = Borrowing.objects.bulk_create(
+            Borrowing(
+                user=self.user,
+                book=self.book,
+                expected_return_date=datetime.date.today(),
+            )
+            for _ in range(count)
+        )
+        Payment.objects.bulk_create(
+            Payment(
+                borrowing=borrowing,
+                type=Payment.TypeChoices.PAYMENT,
+                session_id=f"cs_{borrowing.id}",
+                money_to_pay=5,
+            )
+            for borrowing in borrowings
+        )
+
+    def test_user_list(self):
+        self.client.credentials(**jwt_headers(self.user))
+
+        self.assertQueryCountIsConstant(PAYMENT_URL, self.add_payments)
+
+    def test_admin_keyset_list(self):
+        self.client.credentials(**jwt_headers(self.admin))
+
+        self.assertQueryCountIsConstant(
+            PAYMENT_URL, self.add_payments, {"pagination": "keyset"}
+        )
+
+    def test_retrieve(self):
+        self.client.credentials(**jwt_headers(self.user))
+        payment = Payment.objects.first()
+
+        response = self.client.get(get_detail(payment.id))
+
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(response.query_count, 1)
@@ -0,0 +1,137 @@
+import datetime
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from books.models import Book
+from borrowings.models import Borrowing
+from payments.gateway import stripe_gateway
+from payments.models import Payment
+from payments.reconciliation import reconcile_payments
+from payments.tasks import reconcile_stripe_payments
+from payments.tests.fake_stripe import FakeStripe
+
+
+@override_settings(STRIPE_SECRET_KEY="sk_test_fake")
+class PaymentReconciliationTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="user@test.com", password="test1234"
+        )
+        book = Book.objects.create(
+            title="Test Book",
+            author="Author Name",
+            cover="HARD",
+            inventory=10,
+            daily_fee=5.00,
+        )
+        Borrowing.objects.bulk_create(
+            Borrowing(
+                user=user,
+                book=book,
+                expected_return_date=datetime.date.today(),
+            )
+            for _ in range(12)
+        )
+        Payment.objects.bulk_create(
+            Payment(
+                borrowing=borrowing,
+                type=Payment.TypeChoices.PAYMENT,
+                session_id=f"cs_{index}",
+                money_to_pay=5,
+            )
+            for index, borrowing in enumerate(Borrowing.objects.all())
+        )
+
+        self.now = timezone.now()
+        self.fake_stripe = FakeStripe()
+        for index in range(12):
+            self.fake_stripe.add_session(
+                f"cs_{index}",
+                created=int(self.now.timestamp()) - 60 * index,
+                payment_status="paid" if index % 3 else "unpaid",
+            )
+        self.fake_stripe.add_session(
+            "cs_foreign", created=int(self.now.timestamp())
+        )
+
+    def paid_session_ids(self):
+        return set(
+            Payment.objects.filter(
+                status=Payment.StatusChoices.PAID
+            ).values_list("session_id", flat=True)
+        )
+
+    def test_paid_sessions_are_applied(self):
+        with self.fake_stripe:
+            result = reconcile_payments(
+                self.now - datetime.timedelta(days=1),
+                self.now + datetime.timedelta(seconds=1),
+                chunk_size=3,
+            )
+
+        self.assertEqual(result, {"paid_sessions": 9, "updated": 8})
+        self.assertEqual(
+            self.paid_session_ids(),
+            {f"cs_{index}" for index in range(12) if index % 3},
+        )
+
+    @patch("payments.reconciliation.STRIPE_PAGE_SIZE", 5)
+    def test_sessions_are_listed_page_by_page(self):
+        with self.fake_stripe:
+            result = reconcile_payments(
+                self.now - datetime.timedelta(days=1),
+                self.now + datetime.timedelta(seconds=1),
+            )
+
+        pages = [
+            params for path, params in self.fake_stripe.requests
+            if path == "/v1/checkout/sessions"
+        ]
+        self.assertEqual(len(pages), 3)
+        self.assertTrue(all(page["limit"] == "5" for page in pages))
+        self.assertNotIn("starting_after", pages[0])
+        self.assertIn("starting_after", pages[1])
+        self.assertEqual(result["updated"], 8)
+
+    def test_listing_goes_through_the_gateway(self):
+        stripe_gateway.reset()
+
+        with self.fake_stripe:
+            reconcile_payments(
+                self.now - datetime.timedelta(days=1),
+                self.now + datetime.timedelta(seconds=1),
+            )
+
+        operations = stripe_gateway.stats()["operations"]
+        self.assertEqual(operations["checkout.session.list"]["calls"], 1)
+
+    def test_window_limits_sessions(self):
+        with self.fake_stripe:
+            result = reconcile_payments(
+                self.now - datetime.timedelta(minutes=4, seconds=30),
+                self.now + datetime.timedelta(seconds=1),
+            )
+
+        self.assertEqual(result["updated"], 3)
+        self.assertEqual(self.paid_session_ids(), {"cs_1", "cs_2", "cs_4"})
+
+    def test_reconciliation_is_idempotent(self):
+        with self.fake_stripe:
+            reconcile_stripe_payments()
+            result = reconcile_stripe_payments()
+
+        self.assertEqual(result["updated"], 0)
+        self.assertEqual(len(self.paid_session_ids()), 8)
+
+    def test_command(self):
+        out = StringIO()
+
+        with self.fake_stripe:
+            call_command("reconcile_payments", "--days", "1", stdout=out)
+
+        self.assertIn("8 payments marked as paid", out.getvalue())
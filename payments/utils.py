@@ -1,9 +1,12 @@
 import stripe
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Q
 from django.urls import reverse
 
+from borrowings.cache import invalidate_user_borrowings
 from borrowings.models import Borrowing
+from payments.gateway import stripe_gateway
 from payments.models import Payment
 
 
@@ -31,7 +34,7 @@ def get_url(viewname: str, payment_id: int) -> str:
 
 
 def create_stripe_session(**kwargs) -> stripe.checkout.Session:
-    return stripe.checkout.Session.create(
+    return stripe_gateway.create_session(
         payment_method_types=["card"],
         line_items=[
             {
@@ -49,30 +52,56 @@ def create_stripe_session(**kwargs) -> stripe.checkout.Session:
         mode="payment",
         success_url=get_url("payments:payment-success", kwargs["payment"].id),
         cancel_url=get_url("payments:payment-cancel", kwargs["payment"].id),
+        idempotency_key=f"payment-{kwargs["payment"].id}-checkout",
     )
 
 
-def create_payment_with_session(
+def create_payment(
     borrowing: Borrowing,
     borrowing_type: str = "Payment"
-) -> None:
-    borrowing_price = get_borrowing_price(borrowing, borrowing_type)
-    stripe.api_key = settings.STRIPE_SECRET_KEY
+) -> Payment:
+    return Payment.objects.create(
+        type=borrowing_type,
+        borrowing=borrowing,
+        money_to_pay=get_borrowing_price(borrowing, borrowing_type),
+    )
 
-    with transaction.atomic():
-        payment = Payment.objects.create(
-            type=borrowing_type,
-            borrowing=borrowing,
-            money_to_pay=borrowing_price,
-        )
 
-        session = create_stripe_session(
-            borrowing_type=borrowing_type,
-            borrowing=borrowing,
-            borrowing_price=borrowing_price,
-            payment=payment,
-        )
+def attach_checkout_session(payment: Payment) -> Payment:
+    """Create the Stripe session of ``payment`` unless it already has one.
+
+    No lock is held while Stripe is called: concurrent first accesses send
+    the same idempotency key and get the same session back, and only the
+    first of them stores it.
+    """
+    if payment.session_id:
+        return payment
+
+    session = create_stripe_session(
+        borrowing_type=payment.type,
+        borrowing=payment.borrowing,
+        borrowing_price=int(payment.money_to_pay),
+        payment=payment,
+    )
+    stored = Payment.objects.filter(
+        Q(session_id__isnull=True) | Q(session_id=""), pk=payment.pk
+    ).update(session_id=session.id, session_url=session.url)
 
+    if stored:
         payment.session_id = session.id
         payment.session_url = session.url
-        payment.save()
+        # ``update`` skips the signal invalidating cached borrowings.
+        invalidate_user_borrowings([payment.borrowing.user_id])
+    else:
+        payment.refresh_from_db(fields=["session_id", "session_url"])
+
+    return payment
+
+
+def create_payment_with_session(
+    borrowing: Borrowing,
+    borrowing_type: str = "Payment"
+) -> None:
+    with transaction.atomic():
+        payment = create_payment(borrowing, borrowing_type)
+        attach_checkout_session(payment)
@@ -1,37 +1,51 @@
 import stripe
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.http import JsonResponse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAdminUser
 from rest_framework.request import Request
 from rest_framework.response import Response
 
-from payments.models import Payment
+from borrowings.cache import invalidate_payment_owners
+from common.query_budget import QueryBudgetMixin
+from library_api.paginations import SelectablePaginationMixin
+from payments.gateway import StripeUnavailable, stripe_gateway
+from payments.models import Payment, StripeEvent
 from payments.serializers import (
     PaymentSerializer,
     PaymentListSerializer,
     PaymentRetrieveSerializer,
 )
+from payments.tasks import CHECKOUT_COMPLETED, schedule_stripe_event_drain
+from payments.utils import attach_checkout_session
 
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(
+    QueryBudgetMixin,
+    SelectablePaginationMixin,
+    viewsets.ModelViewSet
+):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    keyset_ordering = ("-id",)
+    # In lazy checkout mode the first retrieve also stores the payment's
+    # new Stripe session.
+    query_budgets = {"list": 2, "retrieve": 2}
 
     def get_queryset(self):
         queryset = self.queryset
         user = self.request.user
 
-        if self.action == "list":
-            queryset = queryset.prefetch_related(
-                "borrowing__user",
-                "borrowing__book"
-            )
+        if self.action in ("list", "retrieve"):
+            queryset = queryset.select_related("borrowing__book")
 
         if not user.is_staff:
             queryset = queryset.filter(borrowing__user=user)
@@ -47,6 +61,64 @@ class PaymentViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    @staticmethod
+    def ensure_lazy_session(payment: Payment) -> Payment:
+        if (
+            settings.STRIPE_LAZY_CHECKOUT
+            and payment.status == Payment.StatusChoices.PENDING
+        ):
+            try:
+                attach_checkout_session(payment)
+            except stripe.error.StripeError:
+                # The payment is still shown, its session is created on
+                # the next access or through the checkout endpoint.
+                pass
+
+        return payment
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        payment = self.ensure_lazy_session(self.get_object())
+        serializer = self.get_serializer(payment)
+        return Response(serializer.data)
+
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path="checkout",
+        url_name="checkout",
+    )
+    def checkout(self, request: Request, pk: int = None) -> Response:
+        """Endpoint for the Stripe session, created on first use"""
+        payment = self.get_object()
+
+        if payment.status == Payment.StatusChoices.PAID:
+            return Response(
+                {"detail": "This payment has already been paid."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            attach_checkout_session(payment)
+        except StripeUnavailable as e:
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except stripe.error.StripeError as e:
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {
+                "payment_id": payment.id,
+                "session_id": payment.session_id,
+                "session_url": payment.session_url,
+            },
+            status=status.HTTP_200_OK,
+        )
+
     @action(
         methods=["GET"],
         detail=True,
@@ -56,7 +128,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
     def payment_success(self, request: Request, pk: int = None) -> Response:
         """Endpoint for success url after payment"""
 
-        session_id = get_object_or_404(Payment, pk=pk).session_id
+        payment = get_object_or_404(Payment, pk=pk)
+        session_id = payment.session_id
 
         if not session_id:
             return Response(
@@ -65,26 +138,47 @@ class PaymentViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            session = stripe.checkout.Session.retrieve(session_id)
-            customer = session.customer_details
-
+            session = stripe_gateway.retrieve_session(session_id)
+        except StripeUnavailable:
+            # Stripe is down or the circuit is open, answer from the state
+            # kept by the webhook instead of stalling the worker.
             return Response(
                 {
-                    "detail": f"Thanks for your order, {customer.name}!",
-                    "customer": {
-                        "name": customer.name,
-                        "email": customer.email,
+                    "detail": "Thanks for your order!",
+                    "payment": {
+                        "payment_id": payment.id,
+                        "status": payment.status,
                     },
                 },
                 status=status.HTTP_200_OK,
             )
-
         except stripe.error.StripeError as e:
             return Response(
                 {"detail": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        customer = session["customer"]
+
+        return Response(
+            {
+                "detail": f"Thanks for your order, {customer['name']}!",
+                "customer": customer,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="stripe-stats",
+        url_name="stripe-stats",
+        permission_classes=[IsAdminUser],
+    )
+    def stripe_stats(self, request: Request) -> Response:
+        """Circuit state and call latency of the Stripe gateway"""
+        return Response(stripe_gateway.stats(), status=status.HTTP_200_OK)
+
     @action(
         methods=["GET"],
         detail=True,
@@ -104,6 +198,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
             )
 
         if payment.status == "PENDING":
+            self.ensure_lazy_session(payment)
+
             if not payment.session_id:
                 return Response(
                     {"detail": "Session ID is required"},
@@ -133,10 +229,62 @@ class PaymentViewSet(viewsets.ModelViewSet):
             )
 
 
-def handle_successful_payment(session):
-    payment = Payment.objects.get(session_id=session["id"])
-    payment.status = "PAID"
-    payment.save()
+def handle_successful_payment(session) -> int:
+    stripe_gateway.invalidate_sessions([session["id"]])
+
+    updated = Payment.objects.filter(
+        session_id=session["id"],
+        status=Payment.StatusChoices.PENDING,
+    ).update(status=Payment.StatusChoices.PAID)
+
+    if updated:
+        invalidate_payment_owners(
+            Payment.objects.filter(session_id=session["id"])
+        )
+
+    return updated
+
+
+def record_stripe_event(event, status: str) -> bool:
+    """Store the event, ``False`` when it was delivered before"""
+    try:
+        with transaction.atomic():
+            StripeEvent.objects.create(
+                event_id=event["id"],
+                type=event["type"],
+                payload=event["data"]["object"],
+                status=status,
+                processed_at=(
+                    timezone.now()
+                    if status == StripeEvent.StatusChoices.PROCESSED
+                    else None
+                ),
+            )
+    except IntegrityError:
+        return False
+
+    return True
+
+
+def process_stripe_event(event) -> bool:
+    with transaction.atomic():
+        if not record_stripe_event(
+            event, StripeEvent.StatusChoices.PROCESSED
+        ):
+            return False
+
+        if event["type"] == CHECKOUT_COMPLETED:
+            handle_successful_payment(event["data"]["object"])
+
+    return True
+
+
+def enqueue_stripe_event(event) -> bool:
+    if not record_stripe_event(event, StripeEvent.StatusChoices.PENDING):
+        return False
+
+    transaction.on_commit(schedule_stripe_event_drain, robust=True)
+    return True
 
 
 @csrf_exempt
@@ -156,9 +304,13 @@ def stripe_webhook(request):
     except stripe.error.SignatureVerificationError as e:
         return JsonResponse({"error": str(e)}, status=400)
 
-    if event["type"] == "checkout.session.completed":
+    if settings.STRIPE_WEBHOOK_ASYNC:
+        if not enqueue_stripe_event(event):
+            return JsonResponse({"status": "duplicate"}, status=200)
+
+        return JsonResponse({"status": "queued"}, status=200)
 
-        session = event["data"]["object"]
-        handle_successful_payment(session)
+    if not process_stripe_event(event):
+        return JsonResponse({"status": "duplicate"}, status=200)
 
     return JsonResponse({"status": "success"}, status=200)
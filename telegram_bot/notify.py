@@ -1,11 +1,14 @@
 import os
 import random
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from pydantic import BaseModel
 from telegram import Bot
 
+from telegram_bot.sender import BatchingSender
+
 
 load_dotenv()
 
@@ -70,7 +73,27 @@ Happy reading and don't miss the return date! 🔖
 
 bot = Bot(token=TOKEN)
 
-app = FastAPI()
+
+async def send_telegram_message(chat_id: str, message: str):
+    await bot.send_message(chat_id, message)
+
+
+sender = BatchingSender(
+    send_telegram_message,
+    rate=float(os.getenv("TELEGRAM_RATE_PER_SECOND", 1)),
+    burst=int(os.getenv("TELEGRAM_BURST", 3)),
+    linger=float(os.getenv("TELEGRAM_BATCH_DELAY", 0.5)),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await sender.start()
+    yield
+    await sender.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 class BorrowingData(BaseModel):
@@ -80,10 +103,6 @@ class BorrowingData(BaseModel):
     expected_return_date: str
 
 
-async def send_telegram_message(message: str):
-    await bot.send_message(CHAT_ID, message)
-
-
 @app.post("/notify/")
 async def notify_borrowing(data: BorrowingData):
     message = random.choice(MESSAGES).format(
@@ -92,8 +111,8 @@ async def notify_borrowing(data: BorrowingData):
         data.borrow_date,
         data.expected_return_date
     )
-    await send_telegram_message(message)
-    return {"status": "success", "message": message}
+    sender.enqueue(CHAT_ID, message)
+    return {"status": "queued", "message": message}
 
 
 class MessageData(BaseModel):
@@ -102,5 +121,5 @@ class MessageData(BaseModel):
 
 @app.post("/overdue/")
 async def notify_overdue_borrowing(message_data: MessageData):
-    await send_telegram_message(message_data.message)
-    return {"status": "success", "message": message_data.message}
+    sender.enqueue(CHAT_ID, message_data.message)
+    return {"status": "queued", "message": message_data.message}
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Awaitable, Callable
+
+from telegram.error import (
+    BadRequest,
+    NetworkError,
+    RetryAfter,
+    TelegramError,
+    TimedOut,
+)
+
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+MESSAGE_SEPARATOR = "\n\n"
+
+
+def split_message(message: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> list:
+    """Cut a message into pieces of at most ``limit`` characters,
+    preferring line breaks as cut points"""
+    pieces = []
+
+    while len(message) > limit:
+        cut = message.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+
+        pieces.append(message[:cut])
+        message = message[cut:].lstrip("\n")
+
+    if message:
+        pieces.append(message)
+
+    return pieces
+
+
+def pack_messages(
+    messages: list,
+    limit: int = TELEGRAM_MESSAGE_LIMIT,
+    separator: str = MESSAGE_SEPARATOR,
+) -> list:
+    """Coalesce messages into as few Telegram messages as the limit allows"""
+    packed = []
+    current = ""
+
+    for message in messages:
+        for piece in split_message(message.strip(), limit):
+            fits = len(current) + len(separator) + len(piece) <= limit
+            if current and fits:
+                current = f"{current}{separator}{piece}"
+                continue
+
+            if current:
+                packed.append(current)
+            current = piece
+
+    if current:
+        packed.append(current)
+
+    return packed
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        self._refill()
+
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+
+        self.tokens -= 1
+
+
+class BatchingSender:
+    """Queue of outgoing messages drained by a single background worker.
+
+    Messages waiting for the same chat are merged into combined messages,
+    each chat is throttled by its own token bucket and Telegram flood
+    control (429) is honoured through ``retry_after``.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, str], Awaitable],
+        rate: float = 1.0,
+        burst: int = 3,
+        linger: float = 0.5,
+        max_retries: int = 5,
+    ) -> None:
+        self.send = send
+        self.rate = rate
+        self.burst = burst
+        self.linger = linger
+        self.max_retries = max_retries
+        self.queue: asyncio.Queue | None = None
+        self.buckets: dict = {}
+        self.worker: asyncio.Task | None = None
+
+    def enqueue(self, chat_id: str, message: str) -> None:
+        if self.queue is None:
+            raise RuntimeError("Sender is not started")
+
+        self.queue.put_nowait((chat_id, message))
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.worker is None:
+            return
+
+        await self.queue.join()
+        self.worker.cancel()
+        try:
+            await self.worker
+        except asyncio.CancelledError:
+            pass
+        self.worker = None
+
+    async def collect(self) -> list:
+        batch = [await self.queue.get()]
+
+        if self.linger:
+            await asyncio.sleep(self.linger)
+
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+        return batch
+
+    async def run(self) -> None:
+        while True:
+            batch = await self.collect()
+
+            try:
+                await self.flush(batch)
+            except Exception:
+                logger.exception("Failed to deliver %s messages", len(batch))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def flush(self, batch: list) -> None:
+        by_chat = defaultdict(list)
+        for chat_id, message in batch:
+            by_chat[chat_id].append(message)
+
+        for chat_id, messages in by_chat.items():
+            for text in pack_messages(messages):
+                await self.get_bucket(chat_id).acquire()
+                await self.send_with_retry(chat_id, text)
+
+    def get_bucket(self, chat_id: str) -> TokenBucket:
+        if chat_id not in self.buckets:
+            self.buckets[chat_id] = TokenBucket(self.rate, self.burst)
+
+        return self.buckets[chat_id]
+
+    async def send_with_retry(self, chat_id: str, text: str) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.send(chat_id, text)
+                return True
+            except RetryAfter as error:
+                delay = error.retry_after
+                if isinstance(delay, timedelta):
+                    delay = delay.total_seconds()
+            except BadRequest:
+                logger.exception("Telegram rejected a message to %s", chat_id)
+                return False
+            except (TimedOut, NetworkError):
+                delay = min(2 ** attempt, 30)
+            except TelegramError:
+                logger.exception("Telegram rejected a message to %s", chat_id)
+                return False
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay)
+
+        logger.error("Giving up on a message to %s", chat_id)
+        return False
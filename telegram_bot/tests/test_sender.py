@@ -0,0 +1,81 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import AsyncMock
+
+from telegram.error import BadRequest, RetryAfter
+
+from telegram_bot.sender import (
+    BatchingSender,
+    TokenBucket,
+    pack_messages,
+    split_message,
+)
+
+
+class PackMessagesTests(TestCase):
+    def test_messages_are_coalesced(self):
+        self.assertEqual(
+            pack_messages(["first", "  second\n"], limit=20),
+            ["first\n\nsecond"],
+        )
+
+    def test_limit_starts_new_message(self):
+        self.assertEqual(
+            pack_messages(["a" * 6, "b" * 6], limit=10),
+            ["a" * 6, "b" * 6],
+        )
+
+    def test_long_message_is_split_on_lines(self):
+        message = "line one\nline two\nline three"
+
+        pieces = split_message(message, limit=18)
+
+        self.assertEqual(pieces, ["line one\nline two", "line three"])
+        self.assertTrue(all(len(piece) <= 18 for piece in pieces))
+        self.assertEqual(split_message("x" * 25, limit=10), [
+            "x" * 10, "x" * 10, "x" * 5
+        ])
+
+
+class TokenBucketTests(IsolatedAsyncioTestCase):
+    async def test_burst_is_available_immediately(self):
+        bucket = TokenBucket(rate=1000, capacity=2)
+
+        await bucket.acquire()
+        await bucket.acquire()
+
+        self.assertLess(bucket.tokens, 1)
+
+
+class BatchingSenderTests(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.send = AsyncMock()
+        self.sender = BatchingSender(
+            self.send, rate=1000, burst=10, linger=0.01
+        )
+        await self.sender.start()
+
+    async def asyncTearDown(self):
+        await self.sender.stop()
+
+    async def test_messages_for_same_chat_are_combined(self):
+        self.sender.enqueue("chat", "first")
+        self.sender.enqueue("chat", "second")
+        self.sender.enqueue("other", "third")
+
+        await self.sender.queue.join()
+
+        self.send.assert_any_await("chat", "first\n\nsecond")
+        self.send.assert_any_await("other", "third")
+        self.assertEqual(self.send.await_count, 2)
+
+    async def test_retry_after_is_honoured(self):
+        self.send.side_effect = [RetryAfter(0), None]
+
+        self.assertTrue(await self.sender.send_with_retry("chat", "text"))
+        self.assertEqual(self.send.await_count, 2)
+
+    async def test_rejected_message_is_dropped(self):
+        self.send.side_effect = BadRequest("Chat not found")
+
+        self.assertFalse(await self.sender.send_with_retry("chat", "text"))
+        self.assertEqual(self.send.await_count, 1)
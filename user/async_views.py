@@ -0,0 +1,9 @@
+from common.async_views import async_read_view, json_response
+from user.serializers import UserSerializer
+
+
+@async_read_view()
+async def manage_user(request):
+    """Async twin of ``ManageUserView.get``"""
+    serializer = UserSerializer(request.user, context={"request": request})
+    return json_response(serializer.data)
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from common.testing import jwt_headers
+
+
+ASYNC_MANAGE_URL = reverse("async:user-manage")
+
+
+class AsyncManageUserTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "reader@test.com", "testpass"
+        )
+
+    def test_me_matches_sync_view(self):
+        headers = jwt_headers(self.user)
+
+        response = self.client.get(ASYNC_MANAGE_URL, **headers)
+        expected = self.client.get(reverse("user:manage"), **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected.json())
+
+    def test_inactive_user_is_rejected(self):
+        headers = jwt_headers(self.user)
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(ASYNC_MANAGE_URL, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()["code"], "user_inactive")
@@ -1,7 +1,9 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
+
+from common.testing import QueryBudgetTestMixin, jwt_headers
 from user.serializers import UserSerializer
 
 
@@ -93,3 +95,33 @@ class UserTests(TestCase):
             response.data["email"],
             self.updated_user_data["email"]
         )
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class UserQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_register(self):
+        response = self.client.post(
+            reverse("user:create"),
+            {"email": "test@test.com", "password": "testpass"},
+        )
+
+        self.assertWithinQueryBudget(response)
+
+    def test_manage_with_token(self):
+        user = User.objects.create_user(
+            email="test@test.com", password="testpass"
+        )
+        self.client.credentials(**jwt_headers(user))
+
+        response = self.client.get(reverse("user:manage"))
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+        response = self.client.patch(
+            reverse("user:manage"), {"email": "new@test.com"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
@@ -1,17 +1,20 @@
 from rest_framework import generics
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from common.query_budget import QueryBudgetMixin
 from user.serializers import UserSerializer
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(QueryBudgetMixin, generics.CreateAPIView):
     serializer_class = UserSerializer
     permission_classes = ()
+    query_budgets = {"post": 4}
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(QueryBudgetMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     authentication_classes = (JWTAuthentication,)
+    query_budgets = {"get": 0, "put": 2, "patch": 2}
 
     def get_object(self):
         return self.request.user